@@ -0,0 +1,112 @@
+# action/access_policy.py
+# =======================
+# Compiled Access Policy
+# =======================
+# - the authorization-relevant part of a profile, derived once per
+#   profile version (cached by action.profile_store next to the profile)
+# - allowed / denied / temporary actions as frozensets, valid_until parsed
+#   once, malformed access -> deny-all (same rules as the gate always had)
+# - shared between threads and requests: read-only once built
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Optional
+
+
+def _action_set(values: Any) -> FrozenSet[Any]:
+    # unhashable entries can never equal an action_type string
+    out = set()
+    for value in values:
+        try:
+            out.add(value)
+        except TypeError:
+            continue
+    return frozenset(out)
+
+
+def _parse_expiry(valid_until: Any) -> Optional[datetime]:
+    if not isinstance(valid_until, str) or not valid_until:
+        return None
+    try:
+        return datetime.fromisoformat(valid_until.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+_NO_ACTION = object()
+
+
+class AccessPolicy:
+    __slots__ = ("active", "allowed", "denied", "allow_all", "deny_all", "temporary", "expires", "daily_limit")
+
+    def __init__(
+        self,
+        *,
+        active: bool,
+        allowed: FrozenSet[Any] = frozenset(),
+        denied: FrozenSet[Any] = frozenset(),
+        temporary: FrozenSet[Any] = frozenset(),
+        expires: Optional[datetime] = None,
+        daily_limit: Optional[int] = None,
+    ) -> None:
+        self.active = active
+        self.allowed = allowed
+        self.denied = denied
+        self.allow_all = "*" in allowed
+        self.deny_all = "*" in denied
+        self.temporary = temporary
+        self.expires = expires
+        self.daily_limit = daily_limit
+
+    def permits(self, action_type: Any, now: datetime) -> bool:
+        """Role/ACL/temporal decision (daily_limit is the caller's part)."""
+        if not self.active:
+            return False
+        try:
+            hash(action_type)
+        except TypeError:
+            action_type = _NO_ACTION  # cannot be listed; "*" still applies
+        if self.deny_all or action_type in self.denied:
+            return False
+        if self.allow_all or action_type in self.allowed:
+            return True
+        # temporary allow until valid_until (no / unparsable expiry = no end)
+        return action_type in self.temporary and (self.expires is None or now <= self.expires)
+
+
+DENY_ALL = AccessPolicy(active=False)
+
+
+def compile_policy(profile: Dict[str, Any]) -> AccessPolicy:
+    identity = profile.get("identity") or {}
+    if not isinstance(identity, dict) or identity.get("status", "active") != "active":
+        return DENY_ALL
+
+    access = profile.get("access") or {}
+    if not isinstance(access, dict):
+        return DENY_ALL
+    allowed = access.get("allowed_actions", [])
+    denied = access.get("denied_actions", [])
+    # default deny if access missing or malformed
+    if not isinstance(allowed, list) or not isinstance(denied, list):
+        return DENY_ALL
+
+    temporary: FrozenSet[Any] = frozenset()
+    expires = None
+    temporal = profile.get("temporal")
+    if isinstance(temporal, dict):
+        temp_actions = temporal.get("temporary_actions", [])
+        if isinstance(temp_actions, list):
+            temporary = _action_set(temp_actions)
+        expires = _parse_expiry(temporal.get("valid_until"))
+
+    daily_limit = access.get("daily_limit", -1)
+    return AccessPolicy(
+        active=True,
+        allowed=_action_set(allowed),
+        denied=_action_set(denied),
+        temporary=temporary,
+        expires=expires,
+        daily_limit=daily_limit if isinstance(daily_limit, int) and daily_limit >= 0 else None,
+    )
@@ -7,14 +7,30 @@
 # - registry -> handler
 # - append execution log
 # - STOP on first error
+# - dispatch_many: ordered actions of one user as one batch (one gate
+#   snapshot, one profile write, one log write)
+# - dispatch_async: handler runs on a bounded worker pool, caller gets a
+#   "pending" result at once; get_status(request_id) polls
+# - single-flight per request_id: a concurrent duplicate waits for the
+#   running execution and gets its result (no second handler run)
 
 from __future__ import annotations
 
-from typing import Any, Dict
+import contextvars
+import copy
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from action.execution_log import append_record
-from action.gate import authorize
+from action.execution_log import append_record, append_records, find_result_by_request_id, make_record
+from action.gate import BatchGate, authorize
+from action.log_segments import PHASE_FINAL, PHASE_PENDING
+from action.profile_store import get_repository, profile_batch
 from action.registry import get_handler
+from turn_clock import use_clock
 
 
 def _blocked_unknown() -> dict:
@@ -26,7 +42,85 @@ def _blocked_unknown() -> dict:
     }
 
 
+# -------------------------------------------------
+# SINGLE-FLIGHT (per request_id, this process)
+# -------------------------------------------------
+# Duplicates racing each other would all pass the idempotence check before
+# the first record is logged. The first one runs; the others wait for it
+# and share its result. A flight ends after its log record is written, so
+# later duplicates are answered by the gate as before. Other worker
+# processes are only covered once the record is on disk.
+class _Flight:
+    __slots__ = ("done", "result")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[dict] = None
+
+
+_FLIGHTS: Dict[str, _Flight] = {}
+_FLIGHTS_LOCK = threading.Lock()
+
+
+def _claim(request_id: str) -> Tuple[bool, _Flight]:
+    """(True, flight): caller runs it and must _land() it; (False, flight): wait on it."""
+    with _FLIGHTS_LOCK:
+        flight = _FLIGHTS.get(request_id)
+        if flight is not None:
+            return False, flight
+        flight = _FLIGHTS[request_id] = _Flight()
+        return True, flight
+
+
+def _land(request_id: str, flight: _Flight, result: Optional[dict]) -> None:
+    with _FLIGHTS_LOCK:
+        if _FLIGHTS.get(request_id) is flight:
+            del _FLIGHTS[request_id]
+    flight.result = result
+    flight.done.set()
+
+
+def _single_flight(request_id: Any, run: Callable[[], dict]) -> dict:
+    if not isinstance(request_id, str) or not request_id:
+        return run()
+
+    while True:
+        owner, flight = _claim(request_id)
+        if owner:
+            break
+        flight.done.wait()
+        if flight.result is not None:
+            return copy.deepcopy(flight.result)  # callers may mutate their result
+        # the running one raised: try ourselves
+
+    result: Optional[dict] = None
+    try:
+        result = run()
+        return result
+    finally:
+        _land(request_id, flight, result)
+
+
+def _claim_all(request_ids: List[str]) -> Dict[str, _Flight]:
+    # sorted: two batches sharing ids cannot wait on each other in a cycle
+    claimed: Dict[str, _Flight] = {}
+    for request_id in sorted(set(request_ids)):
+        while True:
+            owner, flight = _claim(request_id)
+            if owner:
+                claimed[request_id] = flight
+                break
+            flight.done.wait()  # its record is logged now; our gate replays it
+    return claimed
+
+
 def dispatch(action: dict, user_id: str, context: dict) -> dict:
+    # one clock for gate + handler + log record
+    with use_clock():
+        return _single_flight((context or {}).get("request_id"), lambda: _dispatch(action, user_id, context))
+
+
+def _dispatch(action: dict, user_id: str, context: dict) -> dict:
     enriched = {
         "action_type": action.get("action_type"),
         "params": action.get("params", {}),
@@ -57,3 +151,248 @@ def dispatch(action: dict, user_id: str, context: dict) -> dict:
         )
 
     return result
+
+
+def dispatch_many(actions: List[dict], user_id: str, context: dict) -> List[dict]:
+    """
+    Runs actions in order like dispatch() and STOPS on the first error; the
+    returned list ends with that error. Per-action "context" entries
+    (request_id, trace_id) extend the shared context.
+    """
+    request_ids = []
+    for action in actions:
+        req_id = {**(context or {}), **(action.get("context") or {})}.get("request_id")
+        if isinstance(req_id, str) and req_id:
+            request_ids.append(req_id)
+
+    flights = _claim_all(request_ids)
+    results_by_id: Dict[str, dict] = {}
+    try:
+        with use_clock():
+            return _dispatch_many(actions, user_id, context, results_by_id)
+    finally:
+        for req_id, flight in flights.items():
+            _land(req_id, flight, results_by_id.get(req_id))
+
+
+def _dispatch_many(
+    actions: List[dict], user_id: str, context: dict, results_by_id: Dict[str, dict]
+) -> List[dict]:
+    snapshot = get_repository().snapshot(user_id)
+    gate = BatchGate(user_id, snapshot[1] if snapshot is not None else None)
+    results: List[dict] = []
+    records: List[Dict[str, Any]] = []
+    handler_error: Optional[BaseException] = None
+
+    try:
+        # handlers read / update the snapshot; written back once on exit
+        with profile_batch(user_id, snapshot[0]) if snapshot is not None else nullcontext():
+            try:
+                _run_batch(actions, user_id, context, gate, results, records)
+            except BaseException as e:
+                handler_error = e
+                raise
+    except BaseException as e:
+        # a failing handler still leaves the earlier actions written back ->
+        # log them; a failed profile write logs nothing (as in dispatch)
+        if e is handler_error:
+            _log_batch(records, results_by_id)
+        raise
+
+    # Log for idempotence/audit (one write for the whole batch)
+    _log_batch(records, results_by_id)
+    return results
+
+
+def _log_batch(records: List[Dict[str, Any]], results_by_id: Dict[str, dict]) -> None:
+    append_records(records)
+    for rec in records:
+        results_by_id.setdefault(rec["request_id"], rec["result"])  # for waiting duplicates
+
+
+def _run_batch(
+    actions: List[dict],
+    user_id: str,
+    context: dict,
+    gate: BatchGate,
+    results: List[dict],
+    records: List[Dict[str, Any]],
+) -> None:
+    for action in actions:
+        action_context = {**(context or {}), **(action.get("context") or {})}
+        enriched = {
+            "action_type": action.get("action_type"),
+            "params": action.get("params", {}),
+            "user_id": user_id,
+            "context": action_context,
+        }
+
+        result = gate.authorize(enriched)
+        if result.get("status") == "allow":
+            handler = get_handler(enriched["action_type"])
+            result = handler(enriched) if handler is not None else _blocked_unknown()
+            req_id = action_context.get("request_id", "")
+            if handler is not None and isinstance(req_id, str) and req_id:
+                records.append(
+                    make_record(
+                        user_id=user_id,
+                        request_id=req_id,
+                        trace_id=str(action_context.get("trace_id", "")),
+                        action_type=str(enriched.get("action_type")),
+                        result=result,
+                    )
+                )
+                gate.note_logged(req_id, result)
+
+        results.append(result)
+        if result.get("status") == "error":
+            break
+
+
+# -------------------------------------------------
+# ASYNC EXECUTION
+# -------------------------------------------------
+# Threads, not processes: handlers share this process's profile cache,
+# log writer and index. The pending record goes to the log before the
+# handler starts (idempotent retries answer "pending"), the final record
+# supersedes it on completion; only the pending one counts for daily_limit.
+ASYNC_WORKERS = max(1, int(os.getenv("MIRABASE_ACTION_WORKERS", "4")))
+ASYNC_MAX_PENDING = max(1, int(os.getenv("MIRABASE_ACTION_MAX_PENDING", "256")))
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_PID = 0
+_ASYNC_LOCK = threading.Lock()
+_IN_FLIGHT: Dict[str, dict] = {}  # request_id -> pending result (this process)
+
+
+def _pending(request_id: str, action_type: Any) -> dict:
+    return {
+        "status": "pending",
+        "message": "Action accepted",
+        "payload": {"request_id": request_id, "action_type": action_type},
+        "retryable": False,
+    }
+
+
+def _busy() -> dict:
+    return {
+        "status": "error",
+        "message": "Too many pending actions",
+        "payload": {"error_type": "busy"},
+        "retryable": True,
+    }
+
+
+def _failed() -> dict:
+    return {
+        "status": "error",
+        "message": "Action failed",
+        "payload": {"error_type": "failed"},
+        "retryable": False,
+    }
+
+
+def _pool() -> ThreadPoolExecutor:
+    # caller holds _ASYNC_LOCK; a forked worker does not inherit the threads
+    global _POOL, _POOL_PID
+    if _POOL is None or _POOL_PID != os.getpid():
+        _POOL = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix="mirabase-action")
+        _POOL_PID = os.getpid()
+        _IN_FLIGHT.clear()
+    return _POOL
+
+
+def dispatch_async(action: dict, user_id: str, context: dict) -> dict:
+    """
+    Gate now, handler later: returns the gate's answer (block / stored
+    result) or a "pending" result whose payload carries the request_id
+    (generated when the context has none).
+    """
+    with use_clock():
+        return _single_flight(
+            (context or {}).get("request_id"), lambda: _dispatch_async(action, user_id, context)
+        )
+
+
+def _dispatch_async(action: dict, user_id: str, context: dict) -> dict:
+    context = dict(context or {})
+    req_id = context.get("request_id")
+    if not isinstance(req_id, str) or not req_id:
+        req_id = context["request_id"] = uuid.uuid4().hex
+
+    enriched = {
+        "action_type": action.get("action_type"),
+        "params": action.get("params", {}),
+        "user_id": user_id,
+        "context": context,
+    }
+
+    gate_result = authorize(enriched)
+    if gate_result.get("status") != "allow":
+        return gate_result
+
+    handler = get_handler(enriched["action_type"])
+    if handler is None:
+        return _blocked_unknown()
+
+    pending = _pending(req_id, enriched["action_type"])
+    with _ASYNC_LOCK:
+        pool = _pool()
+        if req_id in _IN_FLIGHT:
+            return _IN_FLIGHT[req_id]
+        if len(_IN_FLIGHT) >= ASYNC_MAX_PENDING:
+            return _busy()
+        _IN_FLIGHT[req_id] = pending
+
+    log = {
+        "user_id": user_id,
+        "request_id": req_id,
+        "trace_id": str(context.get("trace_id", "")),
+        "action_type": str(enriched.get("action_type")),
+    }
+    try:
+        append_record(result=pending, phase=PHASE_PENDING, **log)
+    except BaseException:
+        with _ASYNC_LOCK:
+            _IN_FLIGHT.pop(req_id, None)
+        raise
+
+    try:
+        # the handler sees this turn's clock (copied context)
+        pool.submit(contextvars.copy_context().run, _complete, handler, enriched, log)
+    except RuntimeError:
+        # pool shut down (interpreter exit): finish here
+        _complete(handler, enriched, log)
+        return get_status(req_id) or pending
+    return pending
+
+
+def _complete(handler: Callable[[dict], dict], enriched: dict, log: Dict[str, str]) -> None:
+    try:
+        try:
+            result = handler(enriched)
+        except Exception:
+            result = _failed()
+        except BaseException:
+            # SystemExit / KeyboardInterrupt out of the handler: close the
+            # request first, or the log keeps answering "pending" for it
+            append_record(result=_failed(), phase=PHASE_FINAL, **log)
+            raise
+        append_record(result=result, phase=PHASE_FINAL, **log)
+    finally:
+        with _ASYNC_LOCK:
+            _IN_FLIGHT.pop(log["request_id"], None)
+
+
+def get_status(request_id: str) -> Optional[dict]:
+    """
+    Current result for a request_id: "pending" while its handler runs, then
+    the final result (also for plain dispatch() calls). None if unknown.
+    """
+    if not isinstance(request_id, str) or not request_id:
+        return None
+    with _ASYNC_LOCK:
+        pending = _IN_FLIGHT.get(request_id)
+    if pending is not None:
+        return pending
+    return find_result_by_request_id(request_id)
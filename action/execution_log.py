@@ -2,88 +2,609 @@
 # =======================
 # Execution Log (jsonl) for idempotence & audit
 # =======================
+# - storage via storage.backend (jsonl file by default)
+# - _json_* = file implementation used by storage.json_backend
+# - request_id lookups and daily_limit counts use an in-memory index
+#   (no full-file scans per action)
+# - the jsonl log is segmented / rotated / compacted by action.log_segments
+#   and written in group-committed batches by action.log_writer
+# - query_records(since, until, user_id, action_type): time-range reads
+#   (binary search into segments instead of reading from the start)
 
 from __future__ import annotations
 
 import json
-from datetime import datetime, timezone
-from pathlib import Path
-from typing import Any, Dict, Optional
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, BinaryIO, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
 
-LOG_FILE = Path("execution_log.jsonl")
+from action import log_segments as segments
+from action import log_writer
+from action.request_filter import BloomFilter
+from storage.backend import get_storage
+from storage.files import file_lock
+from turn_clock import TurnClock, current_clock
 
+LOG_FILE = segments.LOG_FILE
 
-def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
 
+# -------------------------------------------------
+# IN-MEMORY INDEX (jsonl)
+# -------------------------------------------------
+# Built by one scan on first use (segments inside the retention window),
+# then only the new tail is read (appends from this or other processes).
+# - request_id -> byte offset of its first record (a "final" record replaces
+#   a "pending" one, see log_segments.PHASE_*). Bounded: entries older
+#   than MIRABASE_LOG_INDEX_RETENTION seconds or beyond MIRABASE_LOG_INDEX_MAX
+#   are dropped; idempotence is guaranteed within that window.
+# - per-user minute buckets over the last COUNTER_WINDOW seconds for
+#   daily_limit (a bucket counts whole: a cutoff inside a minute counts
+#   that entire minute, i.e. errs on the strict side).
+LOG_INDEX_RETENTION = float(os.getenv("MIRABASE_LOG_INDEX_RETENTION", str(7 * 24 * 3600)))
+LOG_INDEX_MAX = int(os.getenv("MIRABASE_LOG_INDEX_MAX", "200000"))
+COUNTER_WINDOW = 24 * 3600
+_SWEEP_EVERY = 60.0
+_ABSENT_MAX = 4096
+FILTER_FILE = segments.LOG_DIR / "request_ids.bloom"
 
-def find_result_by_request_id(request_id: str) -> Optional[Dict[str, Any]]:
-    if not request_id or not LOG_FILE.exists():
-        return None
 
-    with LOG_FILE.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
+class _UserBuckets:
+    __slots__ = ("buckets", "total")
+
+    def __init__(self) -> None:
+        self.buckets: Deque[List[int]] = deque()  # [minute, count], ascending
+        self.total = 0
+
+    def add(self, minute: int) -> None:
+        if self.buckets and self.buckets[-1][0] == minute:
+            self.buckets[-1][1] += 1
+        elif not self.buckets or self.buckets[-1][0] < minute:
+            self.buckets.append([minute, 1])
+        else:
+            # out-of-order timestamp (clock skew between workers)
+            for bucket in self.buckets:
+                if bucket[0] == minute:
+                    bucket[1] += 1
+                    break
+                if bucket[0] > minute:
+                    self.buckets.insert(self.buckets.index(bucket), [minute, 1])
+                    break
+        self.total += 1
+
+    def expire(self, before_minute: int) -> None:
+        while self.buckets and self.buckets[0][0] < before_minute:
+            self.total -= self.buckets.popleft()[1]
+
+    def count_from(self, minute: int) -> int:
+        # window already expired -> only the first bucket or two fall below
+        n = self.total
+        for bucket_minute, count in self.buckets:
+            if bucket_minute >= minute:
+                break
+            n -= count
+        return n
+
+
+class _LogIndex:
+    """
+    Follows the segmented log (action.log_segments). Locations are
+    (segment seq, byte offset); the active segment is tracked by inode so a
+    rotation by any process is noticed and its unread tail consumed.
+    """
+
+    def __init__(self) -> None:
+        # request_id -> (seq, offset, ts, pending)
+        self.offsets: "OrderedDict[str, Tuple[int, int, float, bool]]" = OrderedDict()
+        self.counters: Dict[str, _UserBuckets] = {}
+        self.built = False
+        self.seq = 0
+        self.inode: Optional[int] = None
+        self.pos = 0
+        self.swept = 0.0
+        self.lock = threading.Lock()
+
+        # bloom filter over every request_id inside the retention window;
+        # offsets only cover (indexed_from, indexed_offset) onwards (older: filter only)
+        self.filter = BloomFilter()
+        self.indexed_from = 0
+        self.indexed_offset = 0
+        self.definite_misses = 0
+        self.maybe_hits = 0
+        self.false_positives = 0
+        # filter hits confirmed absent by a scan of the unindexed segments
+        # (those never change, so the answer holds until the next _reset)
+        self.absent: "OrderedDict[str, None]" = OrderedDict()
+        self.generation = 0
+
+    def _reset(self) -> None:
+        self.offsets.clear()
+        self.counters.clear()
+        self.built = False
+        self.seq = 0
+        self.inode = None
+        self.pos = 0
+        self.filter = BloomFilter()
+        self.indexed_from = 0
+        self.indexed_offset = 0
+        self.absent.clear()
+        self.generation += 1
+
+    def _index(self, rec: Dict[str, Any], seq: int, offset: int) -> None:
+        ts = rec.get("ts")
+        self._add(rec.get("request_id"), seq, offset, ts, segments.is_pending(rec))
+
+        user_id = rec.get("user_id")
+        if not segments.counts_toward_limit(rec):
+            return
+        if isinstance(user_id, str) and isinstance(ts, (int, float)) and ts >= time.time() - COUNTER_WINDOW - 60:
+            buckets = self.counters.get(user_id)
+            if buckets is None:
+                buckets = self.counters[user_id] = _UserBuckets()
+            buckets.add(int(ts // 60))
+
+    def _add(self, request_id: Any, seq: int, offset: int, ts: Any, pending: bool = False) -> None:
+        if not isinstance(request_id, str) or not request_id:
+            return
+        known = self.offsets.get(request_id)
+        if known is not None:
+            if known[3] and not pending:
+                # completion of an async action; keep the slot (and age) of the pending one
+                self.offsets[request_id] = (seq, offset, known[2], False)
+            return  # otherwise first record wins
+        self.filter.add(request_id)
+        self.absent.pop(request_id, None)
+        self.offsets[request_id] = (seq, offset, ts if isinstance(ts, (int, float)) else time.time(), pending)
+
+    def _trim(self) -> None:
+        now = time.time()
+        cutoff = now - LOG_INDEX_RETENTION
+        while self.offsets:
+            _, (_, _, ts, _) = next(iter(self.offsets.items()))
+            if len(self.offsets) <= LOG_INDEX_MAX and ts >= cutoff:
+                break
+            self.offsets.popitem(last=False)
+
+        # idle users: drop buckets that fell out of the window
+        if now - self.swept >= _SWEEP_EVERY:
+            self.swept = now
+            horizon = int((now - COUNTER_WINDOW) // 60) - 1
+            for user_id in list(self.counters):
+                buckets = self.counters[user_id]
+                buckets.expire(horizon)
+                if not buckets.total:
+                    del self.counters[user_id]
+
+    def _consume(
+        self, f: BinaryIO, seq: int, start: int, *, ids_only: bool = False, stop: Optional[int] = None
+    ) -> int:
+        end = start
+        for offset, raw in segments.iter_lines(f, start, stop):
+            end = offset + len(raw)
+            if ids_only and b'"request_id"' not in raw:
                 continue
-            try:
-                rec = json.loads(line)
-            except json.JSONDecodeError:
+            rec = segments._parse(raw)
+            if rec is None:
                 continue
-            if rec.get("request_id") == request_id:
-                return rec.get("result")
-    return None
+            if ids_only:
+                request_id = rec.get("request_id")
+                if isinstance(request_id, str) and request_id:
+                    self.filter.add(request_id)
+            else:
+                self._index(rec, seq, offset)
+        return end
 
+    def _save_filter(self) -> None:
+        # snapshot covers every rotated segment (< self.seq)
+        try:
+            self.filter.save(FILTER_FILE, covers_seq=self.seq - 1)
+        except OSError:
+            pass
 
-def count_actions_last_24h(user_id: str) -> int:
-    if not LOG_FILE.exists():
-        return 0
+    def _open_active(self) -> Tuple[Optional[BinaryIO], int, Optional[int]]:
+        # under the log lock: no rotation between manifest read and open
+        with file_lock(segments.LOG_LOCK):
+            manifest = segments.load_manifest()
+            try:
+                f: Optional[BinaryIO] = segments.LOG_FILE.open("rb")
+            except FileNotFoundError:
+                f = None
+        inode = os.fstat(f.fileno()).st_ino if f is not None else None
+        return f, int(manifest.get("active_seq") or 1), inode
+
+    def _build(self, *, use_snapshot: bool = True) -> None:
+        self._reset()
+        f, active_seq, inode = self._open_active()
 
-    cutoff = datetime.now(timezone.utc).timestamp() - 24 * 3600
-    count = 0
+        covered = 0
+        snapshot = BloomFilter.load(FILTER_FILE) if use_snapshot else None
+        if snapshot is not None and snapshot[1] < active_seq and snapshot[0].items <= snapshot[0].capacity:
+            self.filter, covered = snapshot
 
-    with LOG_FILE.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
+        # full index for the counter window, request_ids only (into the filter)
+        # for older segments the snapshot does not cover yet
+        now = time.time()
+        retention_horizon = now - LOG_INDEX_RETENTION
+        index_horizon = now - COUNTER_WINDOW - 60
+        self.indexed_from = active_seq
+        for seg in list(segments.load_manifest()["segments"]):
+            seq = seg.get("seq")
+            last_ts = seg.get("last_ts")
+            if not isinstance(seq, int) or seq >= active_seq:
                 continue
-            try:
-                rec = json.loads(line)
-            except json.JSONDecodeError:
+            old = isinstance(last_ts, (int, float)) and last_ts < index_horizon
+            if old and (seq <= covered or last_ts < retention_horizon):
                 continue
-
-            if rec.get("user_id") != user_id:
+            sf = segments.open_segment(seg)
+            if sf is None:
                 continue
+            with sf:
+                split = 0
+                first_ts = seg.get("first_ts")
+                if not old and self.indexed_from == active_seq and segments._seekable(sf):
+                    if isinstance(first_ts, (int, float)) and first_ts < index_horizon:
+                        # segment straddles the window: seek to its start instead of
+                        # indexing the whole segment
+                        split = segments.seek_ts(sf, index_horizon, os.fstat(sf.fileno()).st_size)
+                        if split and seq > covered:
+                            self._consume(sf, seq, 0, ids_only=True, stop=split)
+                self._consume(sf, seq, split, ids_only=old)
+            if not old and self.indexed_from == active_seq:
+                self.indexed_from, self.indexed_offset = seq, split
 
-            ts = rec.get("ts")
-            if not isinstance(ts, (int, float)):
+        self.built, self.seq, self.inode = True, active_seq, inode
+        if f is not None:
+            with f:
+                self.pos = self._consume(f, active_seq, 0)
+        if covered != active_seq - 1:
+            self._save_filter()
+        self._trim()
+
+    def _follow_rotation(self) -> bool:
+        """Active segment changed inode: finish the rotated ones, switch over."""
+        f, active_seq, inode = self._open_active()
+        manifest = segments.load_manifest()
+        if active_seq <= self.seq or segments.find_segment(self.seq, manifest) is None:
+            if f is not None:
+                f.close()
+            return False  # replaced / truncated by hand -> rebuild
+
+        for seq in range(self.seq, active_seq):
+            seg = segments.find_segment(seq, manifest)
+            sf = segments.open_segment(seg) if seg is not None else None
+            if sf is not None:
+                with sf:
+                    self._consume(sf, seq, self.pos if seq == self.seq else 0)
+
+        self.seq, self.inode = active_seq, inode
+        self.pos = 0
+        if f is not None:
+            with f:
+                self.pos = self._consume(f, active_seq, 0)
+
+        if self.filter.items > self.filter.capacity:
+            # compaction leaves dead ids behind: start over from the live segments
+            self._build(use_snapshot=False)
+        else:
+            self._save_filter()
+        return True
+
+    def refresh(self) -> None:
+        # caller holds self.lock
+        if not self.built:
+            self._build()
+            return
+
+        try:
+            st = segments.LOG_FILE.stat()
+        except OSError:
+            st = None
+
+        if st is None or st.st_ino != self.inode:
+            if st is None and self.inode is None and segments.load_manifest().get("active_seq", 1) == self.seq:
+                return  # still no log at all
+            if not self._follow_rotation():
+                self._build()
+            self._trim()
+            return
+
+        if st.st_size < self.pos:
+            self._build()
+            return
+        if st.st_size == self.pos:
+            return
+
+        with segments.LOG_FILE.open("rb") as f:
+            if os.fstat(f.fileno()).st_ino != self.inode:
+                return  # rotated right now; next refresh follows it
+            self.pos = self._consume(f, self.seq, self.pos)
+        self._trim()
+
+    def note_append(self, rec: Dict[str, Any], seq: int, offset: int, size: int) -> None:
+        with self.lock:
+            # contiguous with what we already indexed -> no re-read needed
+            if self.built and seq == self.seq and offset == self.pos and self.inode is not None:
+                self._index(rec, seq, offset)
+                self.pos = offset + size
+                self._trim()
+
+    def lookup(self, request_id: str) -> Optional[Tuple[int, int]]:
+        with self.lock:
+            self.refresh()
+            if request_id not in self.filter:
+                self.definite_misses += 1
+                return None
+
+            self.maybe_hits += 1
+            hit = self.offsets.get(request_id)
+            if hit is not None:
+                return (hit[0], hit[1])
+            if request_id in self.absent:
+                self.false_positives += 1
+                return None
+            generation = self.generation
+            indexed_from, indexed_offset = self.indexed_from, self.indexed_offset
+
+        # the scan may read (and gunzip) old segments: keep the writer's
+        # note_append and other lookups out of its way
+        hits = self._scan_unindexed(request_id, indexed_from, indexed_offset)
+
+        with self.lock:
+            if generation == self.generation:
+                for seq, offset, ts, pending in hits:
+                    self._add(request_id, seq, offset, ts, pending)
+            hit = self.offsets.get(request_id)
+            if hit is not None:
+                return (hit[0], hit[1])
+            if hits:
+                seq, offset = hits[-1][:2] if not hits[-1][3] else hits[0][:2]
+                return seq, offset
+            self.false_positives += 1
+            if generation == self.generation:
+                self.absent[request_id] = None
+                while len(self.absent) > _ABSENT_MAX:
+                    self.absent.popitem(last=False)
+            return None
+
+    def _scan_unindexed(
+        self, request_id: str, indexed_from: int, indexed_offset: int
+    ) -> List[Tuple[int, int, Any, bool]]:
+        # rare: filter hit for an id older than the offset index; runs
+        # without self.lock, only reads segments that are no longer written
+        needle = json.dumps(request_id, ensure_ascii=False).encode("utf-8")
+        horizon = time.time() - LOG_INDEX_RETENTION
+        hits: List[Tuple[int, int, Any, bool]] = []
+        for seg in list(segments.load_manifest()["segments"]):
+            seq = seg.get("seq")
+            last_ts = seg.get("last_ts")
+            if not isinstance(seq, int) or seq > indexed_from:
+                continue
+            stop = indexed_offset if seq == indexed_from else None
+            if stop == 0 or (isinstance(last_ts, (int, float)) and last_ts < horizon):
+                continue
+            sf = segments.open_segment(seg)
+            if sf is None:
                 continue
+            with sf:
+                for offset, raw in segments.iter_lines(sf, 0, stop):
+                    if needle not in raw:
+                        continue
+                    rec = segments._parse(raw)
+                    if rec is not None and rec.get("request_id") == request_id:
+                        pending = segments.is_pending(rec)
+                        hits.append((seq, offset, rec.get("ts"), pending))
+                        if not pending:
+                            return hits
+                        # keep looking for its completion
+        return hits
+
+    def filter_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = self.filter.stats()
+            maybe = self.maybe_hits
+            stats.update(
+                {
+                    "definite_misses": self.definite_misses,
+                    "maybe_hits": maybe,
+                    "false_positives": self.false_positives,
+                    "observed_fp_rate": self.false_positives / max(1, self.definite_misses + self.false_positives),
+                }
+            )
+            return stats
+
+    def count_since(self, user_id: str, cutoff: float, queued: Sequence[Any] = ()) -> Optional[int]:
+        """
+        None -> cutoff lies outside the counter window (caller scans).
+        queued: writer items (log_writer.pending_items) taken *before* this
+        call; the ones this refresh already indexed are not counted twice.
+        """
+        with self.lock:
+            self.refresh()
+            if cutoff < time.time() - COUNTER_WINDOW - 60:
+                return None
+            extra = sum(1 for item in queued if not self._covers(item.loc))
+            buckets = self.counters.get(user_id)
+            if buckets is None:
+                return extra
+            buckets.expire(int((time.time() - COUNTER_WINDOW) // 60) - 1)
+            return buckets.count_from(int(cutoff // 60)) + extra
+
+    def _covers(self, loc: Optional[Tuple[int, int]]) -> bool:
+        # caller holds self.lock
+        if loc is None:
+            return False
+        seq, offset = loc
+        return seq < self.seq or (seq == self.seq and offset < self.pos)
+
+    def clear(self) -> None:
+        with self.lock:
+            self._reset()
+
 
-            if ts >= cutoff:
-                count += 1
+_INDEX = _LogIndex()
+log_writer.set_listener(_INDEX.note_append)
 
+
+# -------------------------------------------------
+# JSON FILE STORAGE
+# -------------------------------------------------
+def _pending_writer() -> Optional[log_writer.LogWriter]:
+    return log_writer.peek_writer()
+
+
+def _json_find_result(request_id: str) -> Optional[Dict[str, Any]]:
+    # writer queue first: the writer indexes a record before it leaves the
+    # queue, so it is always in one of the two when looked up in this order
+    writer = _pending_writer()
+    queued = writer.find_pending(request_id) if writer is not None else None
+
+    loc = _INDEX.lookup(request_id)
+    if loc is None:
+        # queued but not written yet (interval durability)
+        return queued.get("result") if queued is not None else None
+
+    rec = segments.read_record_at(*loc)
+    if rec is None or rec.get("request_id") != request_id:
+        # log changed under us: drop the index, answer from a fresh one
+        _INDEX.clear()
+        loc = _INDEX.lookup(request_id)
+        rec = segments.read_record_at(*loc) if loc is not None else None
+        if rec is None or rec.get("request_id") != request_id:
+            return None
+    if segments.is_pending(rec):
+        # its completion may still be queued
+        if writer is not None and (queued is None or segments.is_pending(queued)):
+            queued = writer.find_pending(request_id)
+        if queued is not None and not segments.is_pending(queued):
+            return queued.get("result")
+    return rec.get("result")
+
+
+def _json_count_since(user_id: str, cutoff: float) -> int:
+    # queue snapshot before the index refresh: a record written in between
+    # is either indexed (and skipped by location) or still counted as queued
+    writer = _pending_writer()
+    queued = writer.pending_items(user_id, cutoff) if writer is not None else []
+    count = _INDEX.count_since(user_id, cutoff, queued)
+    if count is None:
+        # outside the counter window (not the gate's 24h path): approximate
+        count = _scan_count_since(user_id, cutoff) + len(queued)
     return count
 
 
-def append_record(
+def _scan_count_since(user_id: str, cutoff: float) -> int:
+    return sum(1 for rec in segments.query(since=cutoff, user_id=user_id) if segments.counts_toward_limit(rec))
+
+
+def _json_append(rec: Dict[str, Any]) -> None:
+    # group-committed by the background writer (action.log_writer)
+    log_writer.get_writer().submit(rec, json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+def _json_append_many(records: List[Dict[str, Any]]) -> None:
+    log_writer.get_writer().submit_many([(rec, json.dumps(rec, ensure_ascii=False) + "\n") for rec in records])
+
+
+def _json_query(
+    since: Optional[float], until: Optional[float], user_id: Optional[str], action_type: Optional[str]
+) -> Iterator[Dict[str, Any]]:
+    writer = _pending_writer()
+    if writer is not None:
+        writer.flush()  # queued records belong to the range too
+    return segments.query(since, until, user_id=user_id, action_type=action_type)
+
+
+def request_filter_stats() -> Dict[str, Any]:
+    """Bloom filter in front of the idempotence index (size, fill, fp rates)."""
+    return _INDEX.filter_stats()
+
+
+def iter_records(since: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """The whole JSON log (all segments) as one stream, oldest first."""
+    return segments.iter_records(since=since)
+
+
+# -------------------------------------------------
+# PUBLIC API
+# -------------------------------------------------
+def find_result_by_request_id(request_id: str) -> Optional[Dict[str, Any]]:
+    if not request_id:
+        return None
+    return get_storage().find_log_result(request_id)
+
+
+def count_actions_last_24h(user_id: str) -> int:
+    cutoff = current_clock().timestamp() - 24 * 3600
+    return get_storage().count_user_actions_since(user_id, cutoff)
+
+
+def query_records(
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    *,
+    user_id: Optional[str] = None,
+    action_type: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Log records with since <= ts <= until (unix seconds, either bound
+    optional), oldest first, streamed. For audits / reports; the action
+    path uses the index.
+    """
+    return get_storage().query_log(since, until, user_id=user_id, action_type=action_type)
+
+
+def make_record(
     *,
     user_id: str,
     request_id: str,
     trace_id: str,
     action_type: str,
     result: Dict[str, Any],
-) -> None:
-    LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-
+    phase: Optional[str] = None,
+) -> Dict[str, Any]:
+    # time / ts are set by append_record(s), see _stamped()
     rec = {
-        "time": _now_iso(),
-        "ts": datetime.now(timezone.utc).timestamp(),
         "user_id": user_id,
         "request_id": request_id,
         "trace_id": trace_id,
         "action_type": action_type,
         "result": result,
     }
+    if phase is not None:
+        rec["phase"] = phase  # async actions: segments.PHASE_PENDING / PHASE_FINAL
+    return rec
+
+
+def append_record(
+    *,
+    user_id: str,
+    request_id: str,
+    trace_id: str,
+    action_type: str,
+    result: Dict[str, Any],
+    phase: Optional[str] = None,
+) -> None:
+    rec = make_record(
+        user_id=user_id,
+        request_id=request_id,
+        trace_id=trace_id,
+        action_type=action_type,
+        result=result,
+        phase=phase,
+    )
+    get_storage().append_log(_stamped(rec, TurnClock()))
+
+
+def append_records(records: List[Dict[str, Any]]) -> None:
+    """Records built with make_record(), written in one go."""
+    if records:
+        clock = TurnClock()
+        get_storage().append_logs([_stamped(rec, clock) for rec in records])
+
 
-    with LOG_FILE.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+def _stamped(rec: Dict[str, Any], clock: TurnClock) -> Dict[str, Any]:
+    # append time, not the turn's instant: a slow handler would otherwise
+    # write a record far behind its neighbours, and time-range reads
+    # (log_segments.query) rely on ts order within MIRABASE_LOG_TS_SLACK
+    return {"time": clock.iso(), "ts": clock.timestamp(), **rec}
@@ -4,15 +4,17 @@
 # ===========================
 # - role / ACL / temporal / daily_limit (24h)
 # - idempotence via request_id (execution_log.jsonl)
+# - BatchGate: the same checks for dispatch_many (one policy, one count)
 # - NEVER executes actions
 
 from __future__ import annotations
 
-from datetime import datetime, timezone
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional
 
+from action.access_policy import AccessPolicy
 from action.execution_log import count_actions_last_24h, find_result_by_request_id
-from action.profile_store import load_profile, get_cached_profile
+from action.profile_store import load_access_policy
+from turn_clock import current_clock
 
 
 def _blocked(message: str) -> dict:
@@ -24,95 +26,76 @@ def _blocked(message: str) -> dict:
     }
 
 
-def authorize(action: dict) -> dict:
-    action_type = action.get("action_type")
-    user_id = action.get("user_id")
-    context = action.get("context") or {}
-    request_id = context.get("request_id")
-
+def _replayed(request_id: Any) -> Optional[dict]:
     # Idempotence: if already executed, return stored result immediately
     if isinstance(request_id, str) and request_id:
         prev = find_result_by_request_id(request_id)
         if isinstance(prev, dict) and prev.get("status") in ("success", "error", "pending"):
             return prev
+    return None
 
-    # Load profile (prefer cache)
-    profile = get_cached_profile(user_id)
-    if profile is None:
-        try:
-            profile = load_profile(user_id)
-        except FileNotFoundError:
-            return _blocked("Action blocked by authorization")
-
-    identity = profile.get("identity") or {}
-    status = identity.get("status", "active")
-    if status != "active":
-        return _blocked("Action blocked by authorization")
-
-    access = profile.get("access") or {}
-    allowed = access.get("allowed_actions", [])
-    denied = access.get("denied_actions", [])
 
-    # Default deny if access missing or malformed
-    if not isinstance(allowed, list) or not isinstance(denied, list):
+def _check(action_type: Any, policy: Optional[AccessPolicy], used: Callable[[], int]) -> dict:
+    if policy is None:
         return _blocked("Action blocked by authorization")
 
-    # Temporal constraints (optional)
-    temporal = profile.get("temporal")
-    if isinstance(temporal, dict):
-        valid_until = temporal.get("valid_until")
-        temp_actions = temporal.get("temporary_actions", [])
-        now = datetime.now(timezone.utc)
-
-        if isinstance(valid_until, str) and valid_until:
-            try:
-                until_dt = datetime.fromisoformat(valid_until.replace("Z", "+00:00"))
-            except ValueError:
-                until_dt = None
-
-            if until_dt and now > until_dt:
-                # expired → treat as no temporary permissions
-                temp_actions = []
-
-        if isinstance(temp_actions, list) and action_type in temp_actions:
-            # temporary allow for this action_type even if not in allowed
-            pass
-        else:
-            # normal allowlist path
-            pass
-
-    # Allow/deny evaluation (explicit)
-    is_allowed = ("*" in allowed) or (action_type in allowed)
-    is_denied = ("*" in denied) or (action_type in denied)
-
-    # Apply temporary allow if present and valid
-    if isinstance(profile.get("temporal"), dict):
-        temporal = profile["temporal"]
-        temp_actions = temporal.get("temporary_actions", [])
-        valid_until = temporal.get("valid_until")
-        now = datetime.now(timezone.utc)
-
-        if isinstance(valid_until, str) and valid_until:
-            try:
-                until_dt = datetime.fromisoformat(valid_until.replace("Z", "+00:00"))
-            except ValueError:
-                until_dt = None
-        else:
-            until_dt = None
-
-        temp_valid = (until_dt is None) or (now <= until_dt)
-
-        if temp_valid and isinstance(temp_actions, list) and action_type in temp_actions:
-            is_allowed = True
-
-    if (not is_allowed) or is_denied:
+    # Role / ACL / temporal: deny wins, then allow-list, then temporary allow
+    if not policy.permits(action_type, current_clock().utc):
         return _blocked("Action blocked by authorization")
 
     # Daily limit (24h) — optional
-    daily_limit = access.get("daily_limit", -1)
-    if isinstance(daily_limit, int) and daily_limit >= 0:
-        used = count_actions_last_24h(user_id)
-        if used >= daily_limit:
-            return _blocked("Action blocked by authorization")
+    if policy.daily_limit is not None and used() >= policy.daily_limit:
+        return _blocked("Action blocked by authorization")
 
     return {"status": "allow"}
+
+
+def authorize(action: dict) -> dict:
+    user_id = action.get("user_id")
+    context = action.get("context") or {}
+
+    prev = _replayed(context.get("request_id"))
+    if prev is not None:
+        return prev
+
+    # Compiled access policy (cached with the profile, rebuilt when it changes)
+    try:
+        policy: Optional[AccessPolicy] = load_access_policy(user_id)
+    except FileNotFoundError:
+        policy = None
+
+    return _check(action.get("action_type"), policy, lambda: count_actions_last_24h(user_id))
+
+
+class BatchGate:
+    """
+    authorize() for an ordered run of actions from one user: one policy
+    (from the batch's profile snapshot), one daily_limit count. Results the
+    batch logs itself are not on disk yet; note_logged() keeps idempotence
+    and the daily count right for the actions after them.
+    """
+
+    def __init__(self, user_id: str, policy: Optional[AccessPolicy]) -> None:
+        self.user_id = user_id
+        self.policy = policy
+        self._logged: Dict[str, dict] = {}
+        self._used: Optional[int] = None
+        self._logged_count = 0
+
+    def _used_now(self) -> int:
+        if self._used is None:
+            self._used = count_actions_last_24h(self.user_id)
+        return self._used + self._logged_count
+
+    def authorize(self, action: dict) -> dict:
+        request_id = (action.get("context") or {}).get("request_id")
+        prev = self._logged.get(request_id) if isinstance(request_id, str) else None
+        if prev is None:
+            prev = _replayed(request_id)
+        if isinstance(prev, dict) and prev.get("status") in ("success", "error", "pending"):
+            return prev
+        return _check(action.get("action_type"), self.policy, self._used_now)
+
+    def note_logged(self, request_id: str, result: dict) -> None:
+        self._logged.setdefault(request_id, result)  # first record wins
+        self._logged_count += 1
@@ -7,7 +7,7 @@ from __future__ import annotations
 
 from typing import Any, Dict, Tuple
 
-from action.profile_store import load_profile, save_profile_atomic
+from action.profile_store import load_profile, update_profile
 
 
 # Allowlist: key -> (type, optional range tuple (min,max) or None)
@@ -39,11 +39,8 @@ def handle(action: dict) -> dict:
     if not isinstance(params, dict) or not params:
         return _error("Missing params", field="params")
 
-    profile = load_profile(user_id)
-    prefs = profile.get("preferences")
-    if not isinstance(prefs, dict):
-        prefs = {}
-        profile["preferences"] = prefs
+    # missing profile -> FileNotFoundError before any validation (as before)
+    load_profile(user_id)
 
     for key, value in params.items():
         if key not in PREFERENCE_SCHEMA:
@@ -63,11 +60,16 @@ def handle(action: dict) -> dict:
             if not (lo <= value <= hi):
                 return _error("Invalid preference value", field=key, expected=f"{lo}-{hi}")
 
-    # Apply updates
-    for key, value in params.items():
-        prefs[key] = value
+    # Apply updates (locked read-modify-write: concurrent workers cannot drop each other's keys)
+    def apply(profile: Dict[str, Any]) -> None:
+        prefs = profile.get("preferences")
+        if not isinstance(prefs, dict):
+            prefs = {}
+            profile["preferences"] = prefs
+        for key, value in params.items():
+            prefs[key] = value
 
-    save_profile_atomic(user_id, profile)
+    profile = update_profile(user_id, apply)
 
     return {
         "status": "success",
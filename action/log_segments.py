@@ -0,0 +1,479 @@
+# action/log_segments.py
+# =======================
+# Execution Log Segments (rotation + manifest + compaction)
+# =======================
+# Layout:
+#   execution_log.jsonl               active segment (appends go here, as before)
+#   execution_log.d/manifest.json     rotated segments, oldest first
+#   execution_log.d/00000001.jsonl.gz rotated segment (gzip optional)
+#
+# - rotate when the active segment reaches MIRABASE_LOG_SEGMENT_BYTES or is
+#   older than MIRABASE_LOG_SEGMENT_SECONDS (0 disables either trigger)
+# - rotated segments are gzip-compressed unless MIRABASE_LOG_GZIP=0
+# - compaction is opt-in: with MIRABASE_LOG_RETENTION seconds set it drops
+#   segments whose newest record is older than that (unset / 0 = keep
+#   everything, as the single-file log did). The log is the idempotence and
+#   audit store: a request_id whose record was dropped is no longer
+#   recognized, so a retry older than the retention window runs again.
+# - iter_records(): the whole log as one stream, oldest first
+# - query(since, until, user_id, action_type): time-range reads that seek
+# - appends, rotation and manifest writes share one advisory lock
+#   (storage.files), so several worker processes can log safely
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from storage.files import append_line, atomic_write_json, file_lock
+
+LOG_FILE = Path("execution_log.jsonl")
+LOG_DIR = Path("execution_log.d")
+MANIFEST_FILE = LOG_DIR / "manifest.json"
+LOG_LOCK = "execution_log"
+
+SEGMENT_BYTES = int(os.getenv("MIRABASE_LOG_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+SEGMENT_SECONDS = float(os.getenv("MIRABASE_LOG_SEGMENT_SECONDS", str(24 * 3600)))
+GZIP_SEGMENTS = os.getenv("MIRABASE_LOG_GZIP", "1").strip().lower() not in ("0", "false", "no", "off")
+RETENTION = float(os.getenv("MIRABASE_LOG_RETENTION", "0") or 0)
+
+
+# -------------------------------------------------
+# MANIFEST
+# -------------------------------------------------
+_MANIFEST_CACHE: Dict[str, Any] = {"stamp": None, "data": None}
+_MANIFEST_LOCK = threading.Lock()
+
+
+def _empty_manifest() -> Dict[str, Any]:
+    return {"version": 1, "active_seq": 1, "active_started": None, "segments": []}
+
+
+def load_manifest() -> Dict[str, Any]:
+    """Current manifest (stat-validated cache; treat as read-only)."""
+    try:
+        st = MANIFEST_FILE.stat()
+        stamp: Optional[Tuple[int, int, int]] = (st.st_mtime_ns, st.st_size, st.st_ino)
+    except OSError:
+        return _empty_manifest()
+
+    with _MANIFEST_LOCK:
+        if _MANIFEST_CACHE["stamp"] == stamp:
+            return _MANIFEST_CACHE["data"]
+
+    try:
+        with MANIFEST_FILE.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or not isinstance(data.get("segments"), list):
+            data = _empty_manifest()
+    except Exception:
+        data = _empty_manifest()
+
+    with _MANIFEST_LOCK:
+        _MANIFEST_CACHE["stamp"], _MANIFEST_CACHE["data"] = stamp, data
+    return data
+
+
+def _save_manifest(data: Dict[str, Any]) -> None:
+    # caller holds LOG_LOCK
+    atomic_write_json(MANIFEST_FILE, data)
+
+
+def find_segment(seq: int, manifest: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    for seg in (manifest or load_manifest())["segments"]:
+        if seg.get("seq") == seq:
+            return seg
+    return None
+
+
+# -------------------------------------------------
+# READING
+# -------------------------------------------------
+def open_segment(seg: Dict[str, Any]) -> Optional[BinaryIO]:
+    name = seg.get("name") or ""
+    candidates = [name]
+    # compression may have renamed it since the manifest was read
+    if name.endswith(".jsonl"):
+        candidates.append(name + ".gz")
+    for candidate in candidates:
+        path = LOG_DIR / candidate
+        try:
+            if candidate.endswith(".gz"):
+                return gzip.open(path, "rb")  # type: ignore[return-value]
+            return path.open("rb")
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def iter_lines(f: BinaryIO, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+    """(offset, raw line) for complete lines only; a partial tail is left for later."""
+    if start or f.tell():
+        f.seek(start)
+    offset = start
+    for raw in f:
+        if not raw.endswith(b"\n") or (stop is not None and offset >= stop):
+            return
+        yield offset, raw
+        offset += len(raw)
+
+
+def _parse(raw: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        rec = json.loads(raw)
+    except ValueError:
+        return None
+    return rec if isinstance(rec, dict) else None
+
+
+# Asynchronous actions log twice under one request_id: a "pending" record
+# at dispatch and a "final" one on completion. The final record answers
+# idempotence lookups; only the pending one counts toward daily_limit.
+PHASE_PENDING = "pending"
+PHASE_FINAL = "final"
+
+
+def is_pending(rec: Dict[str, Any]) -> bool:
+    return rec.get("phase") == PHASE_PENDING
+
+
+def counts_toward_limit(rec: Dict[str, Any]) -> bool:
+    return rec.get("phase") != PHASE_FINAL
+
+
+def iter_records(since: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    All records, oldest first: rotated segments, then the active one.
+    since -> skip whole segments whose newest record is older.
+    """
+    for seg in list(load_manifest()["segments"]):
+        last_ts = seg.get("last_ts")
+        if since is not None and isinstance(last_ts, (int, float)) and last_ts < since:
+            continue
+        f = open_segment(seg)
+        if f is None:
+            continue  # compacted meanwhile
+        with f:
+            for _, raw in iter_lines(f):
+                rec = _parse(raw)
+                if rec is not None:
+                    yield rec
+
+    try:
+        f = LOG_FILE.open("rb")
+    except FileNotFoundError:
+        return
+    with f:
+        for _, raw in iter_lines(f):
+            rec = _parse(raw)
+            if rec is not None:
+                yield rec
+
+
+def read_record_at(seq: int, offset: int) -> Optional[Dict[str, Any]]:
+    seg = find_segment(seq)
+    try:
+        f = open_segment(seg) if seg is not None else LOG_FILE.open("rb")
+    except OSError:
+        return None
+    if f is None:
+        return None
+    with f:
+        try:
+            f.seek(offset)
+            return _parse(f.readline())
+        except (OSError, EOFError):
+            return None
+
+
+# -------------------------------------------------
+# TIME-RANGE QUERIES
+# -------------------------------------------------
+# Records are stamped when they are appended (execution_log._stamped), so
+# they are in ts order up to small skew between workers and writer queueing
+# (MIRABASE_LOG_TS_SLACK seconds): searches start that much earlier and
+# stop that much later, exact bounds are applied per record.
+TS_SLACK = float(os.getenv("MIRABASE_LOG_TS_SLACK", "5"))
+
+
+def _line_ts(raw: bytes) -> Optional[float]:
+    rec = _parse(raw)
+    ts = rec.get("ts") if rec else None
+    return ts if isinstance(ts, (int, float)) else None
+
+
+def seek_ts(f: BinaryIO, target: float, size: int) -> int:
+    """
+    Offset of the first line with ts >= target in an uncompressed segment,
+    by binary search over byte offsets (O(log size) line reads).
+    """
+
+    def line_at(pos: int) -> Tuple[int, bytes]:
+        # first line starting at or after pos
+        if pos:
+            f.seek(pos - 1)
+            f.readline()
+        else:
+            f.seek(0)
+        start = f.tell()
+        return start, f.readline()
+
+    lo, hi = 0, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        start, raw = line_at(mid)
+        ts = _line_ts(raw) if raw.endswith(b"\n") else None
+        if not raw or not raw.endswith(b"\n") or (ts is not None and ts >= target):
+            hi = mid
+        else:
+            lo = start + len(raw)
+    offset = line_at(lo)[0]
+    f.seek(offset)  # callers continue reading from here
+    return offset
+
+
+def _seekable(f: BinaryIO) -> bool:
+    return not isinstance(f, gzip.GzipFile)
+
+
+def query(
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    *,
+    user_id: Optional[str] = None,
+    action_type: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Records with since <= ts <= until (either bound optional), oldest first,
+    optionally for one user / action type. Segments outside the range are
+    skipped via the manifest, the start inside a segment is found by
+    binary search (gzip segments are streamed), reading stops past `until`.
+    """
+    manifest = load_manifest()
+    sources: List[Optional[Dict[str, Any]]] = []
+    for seg in manifest["segments"]:
+        first_ts, last_ts = seg.get("first_ts"), seg.get("last_ts")
+        if since is not None and isinstance(last_ts, (int, float)) and last_ts < since - TS_SLACK:
+            continue
+        if until is not None and isinstance(first_ts, (int, float)) and first_ts > until + TS_SLACK:
+            break
+        sources.append(seg)
+    sources.append(None)  # active segment
+
+    for seg in sources:
+        if seg is None:
+            try:
+                f: Optional[BinaryIO] = LOG_FILE.open("rb")
+            except FileNotFoundError:
+                f = None
+        else:
+            f = open_segment(seg)
+        if f is None:
+            continue
+
+        with f:
+            start = 0
+            if since is not None and _seekable(f):
+                start = seek_ts(f, since - TS_SLACK, os.fstat(f.fileno()).st_size)
+            for _, raw in iter_lines(f, start):
+                rec = _parse(raw)
+                if rec is None:
+                    continue
+                ts = rec.get("ts")
+                if not isinstance(ts, (int, float)):
+                    continue
+                if until is not None and ts > until + TS_SLACK:
+                    return
+                if since is not None and ts < since:
+                    continue
+                if until is not None and ts > until:
+                    continue
+                if user_id is not None and rec.get("user_id") != user_id:
+                    continue
+                if action_type is not None and rec.get("action_type") != action_type:
+                    continue
+                yield rec
+
+
+# -------------------------------------------------
+# APPEND + ROTATION
+# -------------------------------------------------
+def _begin_locked() -> Dict[str, Any]:
+    # caller holds LOG_LOCK; manifest for the append that follows
+    manifest = load_manifest()
+    if not isinstance(manifest.get("active_started"), (int, float)):
+        # first append (or a legacy log): remember when this segment started
+        manifest = {**manifest, "active_started": _first_ts(LOG_FILE) or time.time()}
+        _save_manifest(manifest)
+    return manifest
+
+
+def _finish_locked(manifest: Dict[str, Any], size: int) -> Optional[int]:
+    # caller holds LOG_LOCK; rotates when due, returns the rotated seq
+    if _rotation_due(manifest, size):
+        return _rotate_locked()
+    return None
+
+
+def _after_rotation(rotated: Optional[int]) -> None:
+    # outside LOG_LOCK (compression may take a while)
+    if rotated is not None and GZIP_SEGMENTS:
+        _compress(rotated)
+
+
+def append(line: str) -> Tuple[int, int]:
+    """
+    Appends one record line; returns (segment seq, byte offset).
+    Rotates the active segment afterwards when it is due.
+    (Unbuffered; action.log_writer batches appends on a persistent handle.)
+    """
+    with file_lock(LOG_LOCK):
+        manifest = _begin_locked()
+        seq = int(manifest.get("active_seq") or 1)
+        offset = append_line(LOG_FILE, line)
+        rotated = _finish_locked(manifest, offset + len(line.encode("utf-8")))
+
+    _after_rotation(rotated)
+    return seq, offset
+
+
+def _first_ts(path: Path) -> Optional[float]:
+    try:
+        with path.open("rb") as f:
+            rec = _parse(f.readline())
+    except OSError:
+        return None
+    ts = rec.get("ts") if rec else None
+    return ts if isinstance(ts, (int, float)) else None
+
+
+def _rotation_due(manifest: Dict[str, Any], size: int) -> bool:
+    if SEGMENT_BYTES > 0 and size >= SEGMENT_BYTES:
+        return True
+    if SEGMENT_SECONDS > 0:
+        started = manifest.get("active_started")
+        if isinstance(started, (int, float)) and time.time() - started >= SEGMENT_SECONDS:
+            return True
+    return False
+
+
+def _segment_stats(path: Path) -> Dict[str, Any]:
+    first_ts: Optional[float] = None
+    last_ts: Optional[float] = None
+    records = 0
+    with path.open("rb") as f:
+        for _, raw in iter_lines(f):
+            rec = _parse(raw)
+            if rec is None:
+                continue
+            records += 1
+            ts = rec.get("ts")
+            if isinstance(ts, (int, float)):
+                first_ts = ts if first_ts is None else min(first_ts, ts)
+                last_ts = ts if last_ts is None else max(last_ts, ts)
+    return {"first_ts": first_ts, "last_ts": last_ts, "records": records, "bytes": path.stat().st_size}
+
+
+def _rotate_locked() -> Optional[int]:
+    # caller holds LOG_LOCK
+    if not LOG_FILE.exists() or LOG_FILE.stat().st_size == 0:
+        return None
+
+    manifest = dict(load_manifest())
+    seq = int(manifest.get("active_seq") or 1)
+    name = f"{seq:08d}.jsonl"
+
+    stats = _segment_stats(LOG_FILE)
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    os.replace(LOG_FILE, LOG_DIR / name)
+
+    manifest["segments"] = list(manifest["segments"]) + [{"seq": seq, "name": name, **stats}]
+    manifest["active_seq"] = seq + 1
+    manifest["active_started"] = time.time()
+    manifest["segments"] = _compact_segments(manifest["segments"])
+    _save_manifest(manifest)
+    return seq
+
+
+def _compress(seq: int) -> None:
+    seg = find_segment(seq)
+    if seg is None or not str(seg.get("name", "")).endswith(".jsonl"):
+        return
+
+    src = LOG_DIR / seg["name"]
+    gz_name = seg["name"] + ".gz"
+    tmp = LOG_DIR / (gz_name + ".tmp")
+    try:
+        with src.open("rb") as fin, gzip.open(tmp, "wb") as fout:
+            shutil.copyfileobj(fin, fout)
+        os.replace(tmp, LOG_DIR / gz_name)
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        return
+
+    with file_lock(LOG_LOCK):
+        manifest = dict(load_manifest())
+        segments = []
+        for entry in manifest["segments"]:
+            if entry.get("seq") == seq:
+                entry = {**entry, "name": gz_name, "compressed_bytes": (LOG_DIR / gz_name).stat().st_size}
+            segments.append(entry)
+        manifest["segments"] = segments
+        _save_manifest(manifest)
+    try:
+        src.unlink()
+    except OSError:
+        pass
+
+
+def rotate() -> Optional[int]:
+    """Force a rotation of the active segment; returns the new segment seq."""
+    with file_lock(LOG_LOCK):
+        seq = _rotate_locked()
+    if seq is not None and GZIP_SEGMENTS:
+        _compress(seq)
+    return seq
+
+
+# -------------------------------------------------
+# COMPACTION
+# -------------------------------------------------
+def _compact_segments(segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # caller holds LOG_LOCK; deletes expired segment files, returns the rest
+    if RETENTION <= 0:
+        return segments
+
+    cutoff = time.time() - RETENTION
+    keep = []
+    for seg in segments:
+        last_ts = seg.get("last_ts")
+        if isinstance(last_ts, (int, float)) and last_ts < cutoff:
+            for name in (seg.get("name", ""), str(seg.get("name", "")) + ".gz"):
+                try:
+                    (LOG_DIR / name).unlink()
+                except OSError:
+                    pass
+            continue
+        keep.append(seg)
+    return keep
+
+
+def compact() -> int:
+    """Drops rotated segments past MIRABASE_LOG_RETENTION (if set); returns how many."""
+    with file_lock(LOG_LOCK):
+        manifest = dict(load_manifest())
+        before = len(manifest["segments"])
+        manifest["segments"] = _compact_segments(list(manifest["segments"]))
+        dropped = before - len(manifest["segments"])
+        if dropped:
+            _save_manifest(manifest)
+    return dropped
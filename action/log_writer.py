@@ -0,0 +1,312 @@
+# action/log_writer.py
+# =======================
+# Execution Log Writer (group commit)
+# =======================
+# - one background thread owns a persistent append handle on the active
+#   segment; callers only enqueue
+# - queued records are written in batches: one lock + one write burst
+#   (+ one fsync) per batch instead of open/write/close per record
+# - durability policy (MIRABASE_LOG_DURABILITY):
+#     record   -> caller returns once its record is flushed to the OS (default)
+#     interval -> caller returns at once; batches flush every
+#                 MIRABASE_LOG_FLUSH_INTERVAL seconds
+#     fsync    -> caller returns once its batch is fsync'ed
+# - queued (not yet written) records stay visible: find_pending /
+#   count_pending are consulted by the idempotence index
+#
+# Rotation (action.log_segments) happens on the writer thread between batches.
+
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, BinaryIO, Callable, Deque, Dict, List, Optional, Tuple
+
+from action import log_segments as segments
+from storage.files import file_lock
+
+POLICIES = ("record", "interval", "fsync")
+
+# listener(rec, seq, offset, size) after a record hit the file
+WrittenListener = Callable[[Dict[str, Any], int, int, int], None]
+
+
+class _Item:
+    __slots__ = ("rec", "data", "done", "error", "loc")
+
+    def __init__(self, rec: Dict[str, Any], data: bytes, wait: bool) -> None:
+        self.rec = rec
+        self.data = data
+        self.done: Optional[threading.Event] = threading.Event() if wait else None
+        self.error: Optional[BaseException] = None
+        # (seq, offset), set before the bytes hit the file: a reader that
+        # already indexed that position must not count the item again
+        self.loc: Optional[Tuple[int, int]] = None
+
+
+class LogWriter:
+    def __init__(
+        self,
+        policy: str = "record",
+        *,
+        interval: float = 0.05,
+        batch_max: int = 512,
+        listener: Optional[WrittenListener] = None,
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown log durability policy: {policy}")
+        self.policy = policy
+        self.interval = max(0.001, float(interval))
+        self.batch_max = max(1, int(batch_max))
+        self.listener = listener
+
+        self._cond = threading.Condition()
+        self._queue: Deque[_Item] = deque()
+        self._in_flight: List[_Item] = []
+        self._pending_ids: Dict[str, Dict[str, Any]] = {}
+        self._stopped = False
+        self._flush_requested = False
+        self._fh: Optional[BinaryIO] = None
+        self.batches = 0
+        self.records = 0
+
+        self._thread = threading.Thread(target=self._run, name="mirabase-log-writer", daemon=True)
+        self._thread.start()
+
+    # -------------------------------------------------
+    # CALLER SIDE
+    # -------------------------------------------------
+    def submit(self, rec: Dict[str, Any], line: str) -> None:
+        self.submit_many([(rec, line)])
+
+    def submit_many(self, entries: List[Tuple[Dict[str, Any], str]]) -> None:
+        """Records queued together land in the same batch (up to batch_max)."""
+        wait = self.policy != "interval"
+        items = [_Item(rec, line.encode("utf-8"), wait=wait) for rec, line in entries]
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("log writer is closed")
+            for item in items:
+                self._queue.append(item)
+                request_id = item.rec.get("request_id")
+                if isinstance(request_id, str) and request_id:
+                    # first wins; a final record replaces a "pending" one
+                    queued = self._pending_ids.get(request_id)
+                    if queued is None or (segments.is_pending(queued) and not segments.is_pending(item.rec)):
+                        self._pending_ids[request_id] = item.rec
+            self._cond.notify()
+
+        for item in items:
+            if item.done is not None:
+                item.done.wait()
+                if item.error is not None:
+                    raise item.error
+
+    def find_pending(self, request_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            return self._pending_ids.get(request_id)
+
+    def pending_items(self, user_id: str, cutoff: float) -> List[_Item]:
+        """Queued / in-flight records of user_id that count toward daily_limit since cutoff."""
+        with self._cond:
+            items = list(self._queue) + self._in_flight
+        out = []
+        for item in items:
+            ts = item.rec.get("ts")
+            if item.rec.get("user_id") != user_id or not segments.counts_toward_limit(item.rec):
+                continue
+            if isinstance(ts, (int, float)) and ts >= cutoff:
+                out.append(item)
+        return out
+
+    def count_pending(self, user_id: str, cutoff: float) -> int:
+        return len(self.pending_items(user_id, cutoff))
+
+    def flush(self) -> None:
+        """Blocks until everything queued so far is written."""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while (self._queue or self._in_flight) and self._thread.is_alive():
+                self._cond.wait(0.05)
+
+    def close(self) -> None:
+        with self._cond:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=5.0)
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            except OSError:
+                pass
+            self._fh = None
+
+    # -------------------------------------------------
+    # WRITER THREAD
+    # -------------------------------------------------
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped:
+                    self._cond.wait()
+                if not self._queue and self._stopped:
+                    self._cond.notify_all()
+                    return
+                if self.policy == "interval":
+                    # let the batch fill up for one interval
+                    deadline = time.monotonic() + self.interval
+                    while not (self._stopped or self._flush_requested or len(self._queue) >= self.batch_max):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                self._flush_requested = False
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.batch_max))]
+                self._in_flight = batch
+
+            self._commit(batch)
+
+            with self._cond:
+                self._in_flight = []
+                self._cond.notify_all()
+
+    def _handle(self) -> BinaryIO:
+        # caller holds LOG_LOCK; reopen when the active segment was rotated away
+        fh = self._fh
+        if fh is not None:
+            try:
+                if os.stat(segments.LOG_FILE).st_ino == os.fstat(fh.fileno()).st_ino:
+                    return fh
+            except OSError:
+                pass
+            fh.close()
+        segments.LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = fh = open(segments.LOG_FILE, "ab")
+        return fh
+
+    def _commit(self, batch: List[_Item]) -> None:
+        written: List[tuple] = []
+        error: Optional[BaseException] = None
+        rotated: Optional[int] = None
+        try:
+            with file_lock(segments.LOG_LOCK):
+                manifest = segments._begin_locked()
+                seq = int(manifest.get("active_seq") or 1)
+                fh = self._handle()
+                fh.seek(0, os.SEEK_END)
+                offset = fh.tell()
+                for item in batch:
+                    item.loc = (seq, offset)
+                    fh.write(item.data)
+                    written.append((item, seq, offset))
+                    offset += len(item.data)
+                fh.flush()
+                if self.policy == "fsync":
+                    os.fsync(fh.fileno())
+                rotated = segments._finish_locked(manifest, offset)
+                if rotated is not None:
+                    fh.close()
+                    self._fh = None
+        except BaseException as e:  # noqa: BLE001 - handed to the callers
+            error = e
+            for item in batch:
+                item.loc = None
+            if self._fh is not None:
+                try:
+                    self._fh.close()
+                except OSError:
+                    pass
+                self._fh = None
+
+        if error is None:
+            self.batches += 1
+            self.records += len(batch)
+            if self.listener is not None:
+                for item, seq, offset in written:
+                    try:
+                        self.listener(item.rec, seq, offset, len(item.data))
+                    except Exception:
+                        pass
+
+        with self._cond:
+            retry: List[_Item] = []
+            for item in batch:
+                if error is not None and item.done is None and not self._stopped:
+                    retry.append(item)  # fire-and-forget record: keep it for the next batch
+                    continue
+                request_id = item.rec.get("request_id")
+                if isinstance(request_id, str) and self._pending_ids.get(request_id) is item.rec:
+                    del self._pending_ids[request_id]
+            self._queue.extendleft(reversed(retry))
+
+        for item in batch:
+            if item.done is not None:
+                item.error = error
+                item.done.set()
+
+        try:
+            segments._after_rotation(rotated)
+        except Exception:
+            pass
+        if error is not None and retry:
+            # do not spin on a failing disk
+            with self._cond:
+                self._cond.wait(self.interval)
+
+
+# -------------------------------------------------
+# PROCESS-WIDE WRITER
+# -------------------------------------------------
+_WRITER: Optional[LogWriter] = None
+_WRITER_PID = 0
+_WRITER_LOCK = threading.Lock()
+_LISTENER: Optional[WrittenListener] = None
+
+
+def set_listener(listener: Optional[WrittenListener]) -> None:
+    global _LISTENER
+    _LISTENER = listener
+    if _WRITER is not None:
+        _WRITER.listener = listener
+
+
+def get_writer() -> LogWriter:
+    global _WRITER, _WRITER_PID
+    writer = _WRITER
+    # a forked worker does not inherit the writer thread
+    if writer is None or _WRITER_PID != os.getpid():
+        with _WRITER_LOCK:
+            if _WRITER is None or _WRITER_PID != os.getpid():
+                _WRITER = LogWriter(
+                    os.getenv("MIRABASE_LOG_DURABILITY", "record").strip().lower() or "record",
+                    interval=float(os.getenv("MIRABASE_LOG_FLUSH_INTERVAL", "0.05")),
+                    batch_max=int(os.getenv("MIRABASE_LOG_BATCH_MAX", "512")),
+                    listener=_LISTENER,
+                )
+                _WRITER_PID = os.getpid()
+            writer = _WRITER
+    return writer
+
+
+def peek_writer() -> Optional[LogWriter]:
+    """The writer of this process if one is running (no start-up)."""
+    writer = _WRITER
+    return writer if writer is not None and _WRITER_PID == os.getpid() else None
+
+
+def shutdown() -> None:
+    global _WRITER
+    with _WRITER_LOCK:
+        writer, _WRITER = _WRITER, None
+    if writer is not None and _WRITER_PID == os.getpid():
+        writer.close()
+
+
+atexit.register(shutdown)
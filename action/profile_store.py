@@ -1,16 +1,38 @@
 # action/profile_store.py
 # =======================
-# Profile Store (load/save + simple cache)
+# Profile Store (load/save + shared cache)
 # =======================
+# - ProfileRepository = the one place profiles are read and written
+#   (gate, action handlers, social, ltm.load_profile / set_preference)
+# - bounded LRU cache, validated per read with the backend's version stamp
+#   (JSON: one stat() of profile.json), writes go through and refresh it
+# - cached profiles are shared: read-only for callers, change them through
+#   save_profile_atomic / update_profile
+# - each cached profile carries its compiled AccessPolicy (built on first
+#   use, dropped with the entry when the stamp changes)
+# - profile_batch(): load_profile / update_profile of one user work on a
+#   private snapshot, written back once at the end (action.dispatcher.dispatch_many)
+# - storage via storage.backend (JSON files by default)
+# - _json_* = file implementation used by storage.json_backend
+#   (atomic temp+rename writes under a per-user advisory lock)
 
 from __future__ import annotations
 
+import copy
 import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from action.access_policy import AccessPolicy, compile_policy
+from storage.backend import get_storage
+from storage.files import atomic_write_json, file_lock
 
 _USERS_DIR = Path("users")
-_CACHE: Dict[str, Dict[str, Any]] = {}
 
 
 def _profile_path(user_id: str) -> Path:
@@ -19,33 +41,255 @@ def _profile_path(user_id: str) -> Path:
     return _USERS_DIR / user_id / "profile.json"
 
 
-def load_profile(user_id: str) -> Dict[str, Any]:
+# -------------------------------------------------
+# JSON FILE STORAGE
+# -------------------------------------------------
+def _json_load_profile(user_id: str) -> Dict[str, Any] | None:
     path = _profile_path(user_id)
     if not path.exists():
-        raise FileNotFoundError(f"Profile not found: {path}")
+        return None
 
     with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+        return json.load(f)
+
+
+def _json_profile_stamp(user_id: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = _profile_path(user_id).stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _profile_lock(user_id: str) -> str:
+    return f"profile:{user_id}"
+
+
+def _json_save_profile(user_id: str, profile: Dict[str, Any]) -> None:
+    with file_lock(_profile_lock(user_id)):
+        atomic_write_json(_profile_path(user_id), profile, trailing_newline=True)
+
+
+def _json_update_profile(user_id: str, mutate: Callable[[Dict[str, Any]], None]) -> Dict[str, Any] | None:
+    # read-modify-write under one lock: concurrent updates cannot drop each other
+    with file_lock(_profile_lock(user_id)):
+        profile = _json_load_profile(user_id)
+        if profile is None:
+            return None
+        mutate(profile)
+        atomic_write_json(_profile_path(user_id), profile, trailing_newline=True)
+        return profile
+
+
+# -------------------------------------------------
+# REPOSITORY
+# -------------------------------------------------
+class ProfileRepository:
+    """
+    Process-wide profile cache in front of the configured storage backend.
+    Entry = [backend, stamp, profile, policy]; a hit needs an unchanged
+    stamp, policy is compiled on first use. Missing profiles are not cached
+    (a stat() per miss).
+    """
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, store: Any, user_id: str, profile: Dict[str, Any], stamp: Optional[Hashable]) -> None:
+        # stamp must not be newer than profile: taken before the read, or
+        # under the profile lock after the write (else a stale profile would
+        # be cached under the new stamp)
+        if not store.profile_stamps:
+            return
+        with self._lock:
+            if stamp is None:
+                self._entries.pop(user_id, None)
+                return
+            self._entries[user_id] = [store, stamp, profile, None]
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _valid_entry(self, user_id: str) -> Optional[List[Any]]:
+        store = get_storage()
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None or entry[0] is not store or not store.profile_stamps:
+            return None
+        if store.profile_stamp(user_id) != entry[1]:
+            with self._lock:
+                if self._entries.get(user_id) is entry:
+                    del self._entries[user_id]
+            return None
+        with self._lock:
+            if user_id in self._entries:
+                self._entries.move_to_end(user_id)
+        return entry
+
+    def peek(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Validated cache hit or None (never reads the profile itself)."""
+        entry = self._valid_entry(user_id)
+        return entry[2] if entry is not None else None
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Profile or None if the user has none."""
+        profile = self.peek(user_id)
+        if profile is not None:
+            self.hits += 1
+            return profile
+
+        self.misses += 1
+        store = get_storage()
+        stamp = store.profile_stamp(user_id) if store.profile_stamps else None
+        profile = store.load_profile(user_id)
+        if profile is not None:
+            self._remember(store, user_id, profile, stamp)
+        return profile
+
+    def snapshot(self, user_id: str) -> Optional[Tuple[Dict[str, Any], AccessPolicy]]:
+        """Current profile + its compiled access policy, None if there is none."""
+        profile = self.get(user_id)
+        if profile is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None or entry[2] is not profile:
+            return profile, compile_policy(profile)  # not cacheable (backend without stamps)
+
+        policy = entry[3]
+        if policy is None:
+            # racing compiles produce equal policies; last one stays
+            policy = entry[3] = compile_policy(profile)
+        return profile, policy
+
+    def policy(self, user_id: str) -> Optional[AccessPolicy]:
+        snap = self.snapshot(user_id)
+        return snap[1] if snap is not None else None
+
+    def save(self, user_id: str, profile: Dict[str, Any]) -> None:
+        store = get_storage()
+        # reentrant: the backend's own write lock is the same stripe
+        with file_lock(_profile_lock(user_id)):
+            store.save_profile(user_id, profile)
+            stamp = store.profile_stamp(user_id) if store.profile_stamps else None
+        self._remember(store, user_id, profile, stamp)
+
+    def update(self, user_id: str, mutate: Callable[[Dict[str, Any]], None]) -> Optional[Dict[str, Any]]:
+        store = get_storage()
+        with file_lock(_profile_lock(user_id)):
+            profile = store.update_profile(user_id, mutate)
+            stamp = store.profile_stamp(user_id) if store.profile_stamps and profile is not None else None
+        if profile is not None:
+            self._remember(store, user_id, profile, stamp)
+        return profile
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
 
-    # cache refresh
-    _CACHE[user_id] = data
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            size = len(self._entries)
+        return {"entries": size, "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+_REPOSITORY = ProfileRepository(int(os.getenv("MIRABASE_PROFILE_CACHE", "1024")))
+
+
+def get_repository() -> ProfileRepository:
+    return _REPOSITORY
+
+
+# -------------------------------------------------
+# PROFILE BATCH
+# -------------------------------------------------
+class _ProfileBatch:
+    __slots__ = ("user_id", "profile", "mutations")
+
+    def __init__(self, user_id: str, profile: Dict[str, Any]) -> None:
+        self.user_id = user_id
+        self.profile = profile
+        self.mutations: List[Callable[[Dict[str, Any]], None]] = []
+
+
+_BATCH: ContextVar[Optional[_ProfileBatch]] = ContextVar("mirabase_profile_batch", default=None)
+
+
+def _batch_for(user_id: str) -> Optional[_ProfileBatch]:
+    batch = _BATCH.get()
+    return batch if batch is not None and batch.user_id == user_id else None
+
+
+@contextmanager
+def profile_batch(user_id: str, profile: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Inside the block load_profile / update_profile for user_id use a private
+    copy of `profile`. On exit (also on error) the recorded mutations are
+    replayed onto the stored profile in one locked update, so concurrent
+    writers of other keys are not overwritten.
+    """
+    batch = _ProfileBatch(user_id, copy.deepcopy(profile))
+    token = _BATCH.set(batch)
+    try:
+        yield batch.profile
+    finally:
+        _BATCH.reset(token)
+        if batch.mutations:
+
+            def replay(stored: Dict[str, Any]) -> None:
+                for mutate in batch.mutations:
+                    mutate(stored)
+
+            update_profile(user_id, replay)
+
+
+# -------------------------------------------------
+# PUBLIC API
+# -------------------------------------------------
+def load_profile(user_id: str) -> Dict[str, Any]:
+    batch = _batch_for(user_id)
+    if batch is not None:
+        return batch.profile
+    data = _REPOSITORY.get(user_id)
+    if data is None:
+        raise FileNotFoundError(f"Profile not found: {_profile_path(user_id)}")
     return data
 
 
+def load_access_policy(user_id: str) -> AccessPolicy:
+    policy = _REPOSITORY.policy(user_id)
+    if policy is None:
+        raise FileNotFoundError(f"Profile not found: {_profile_path(user_id)}")
+    return policy
+
+
 def get_cached_profile(user_id: str) -> Dict[str, Any] | None:
-    return _CACHE.get(user_id)
+    return _REPOSITORY.peek(user_id)
 
 
 def save_profile_atomic(user_id: str, profile: Dict[str, Any]) -> None:
-    path = _profile_path(user_id)
-    path.parent.mkdir(parents=True, exist_ok=True)
+    _REPOSITORY.save(user_id, profile)
 
-    tmp_path = path.with_suffix(".json.tmp")
-    with tmp_path.open("w", encoding="utf-8") as f:
-        json.dump(profile, f, ensure_ascii=False, indent=2)
-        f.write("\n")
 
-    tmp_path.replace(path)
-
-    # cache refresh
-    _CACHE[user_id] = profile
+def update_profile(user_id: str, mutate: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+    """
+    Locked read-modify-write: mutate(profile) runs on the current stored
+    profile, the result is saved. Missing profile -> FileNotFoundError.
+    Inside profile_batch() only the snapshot changes (saved at the end).
+    """
+    batch = _batch_for(user_id)
+    if batch is not None:
+        mutate(batch.profile)
+        batch.mutations.append(mutate)
+        return batch.profile
+    data = _REPOSITORY.update(user_id, mutate)
+    if data is None:
+        raise FileNotFoundError(f"Profile not found: {_profile_path(user_id)}")
+    return data
@@ -2,16 +2,135 @@
 # ==================
 # Action Registry
 # ==================
+# - action_type -> "module:function" (declarative, nothing imported here)
+# - a handler module is imported on first use of its action_type, the
+#   resolved callable is cached
+# - installed packages can add action types through the
+#   "mirabase.actions" entry-point group (built-in names win)
+# - register(name, handler) for code-defined handlers (tests, plugins)
+# - a target that fails to import is logged once and then treated like an
+#   unknown action_type (the dispatcher blocks it) until re-registered
 
-from action.handlers.noop import handle as noop_handler
-from action.handlers.set_preference import handle as set_preference_handler
-from action.handlers.get_profile import handle as get_profile_handler
+from __future__ import annotations
 
-REGISTRY = {
-    "noop": noop_handler,
-    "set_preference": set_preference_handler,
-    "get_profile": get_profile_handler,
+import importlib
+import logging
+import threading
+from typing import Callable, Dict, Iterator, MutableMapping, Optional
+
+Handler = Callable[[dict], dict]
+
+log = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "mirabase.actions"
+
+HANDLERS: Dict[str, str] = {
+    "noop": "action.handlers.noop:handle",
+    "set_preference": "action.handlers.set_preference:handle",
+    "get_profile": "action.handlers.get_profile:handle",
 }
 
-def get_handler(action_type: str):
+
+def _entry_points() -> Dict[str, str]:
+    # metadata only; the target modules are not imported here
+    try:
+        from importlib.metadata import entry_points
+    except Exception:  # pragma: no cover
+        return {}
+    try:
+        found = entry_points()
+        group = found.select(group=ENTRY_POINT_GROUP) if hasattr(found, "select") else found.get(ENTRY_POINT_GROUP, ())
+        return {ep.name: ep.value for ep in group}
+    except Exception:
+        return {}
+
+
+def _resolve(target: str) -> Handler:
+    module_name, _, attr = target.partition(":")
+    obj = importlib.import_module(module_name.strip())
+    for part in (attr.strip() or "handle").split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+class _LazyRegistry(MutableMapping):
+    """action_type -> handler; resolves targets on first lookup."""
+
+    def __init__(self, table: Dict[str, str]) -> None:
+        self._table = dict(table)
+        self._resolved: Dict[str, Handler] = {}
+        self._broken: Dict[str, str] = {}  # action_type -> failed target
+        self._plugins: Optional[Dict[str, str]] = None
+        self._lock = threading.Lock()
+
+    def _targets(self) -> Dict[str, str]:
+        if self._plugins is None:
+            self._plugins = _entry_points()
+        return {**self._plugins, **self._table}
+
+    def __getitem__(self, action_type: str) -> Handler:
+        handler = self._resolved.get(action_type)
+        if handler is not None:
+            return handler
+        if action_type in self._broken:
+            raise KeyError(action_type)
+
+        target = self._table.get(action_type)
+        if target is None:
+            target = self._targets().get(action_type)  # entry points: read on first unknown name
+        if target is None:
+            raise KeyError(action_type)
+
+        with self._lock:
+            handler = self._resolved.get(action_type)
+            if handler is None:
+                if action_type in self._broken:
+                    raise KeyError(action_type)
+                try:
+                    handler = self._resolved[action_type] = _resolve(target)
+                except Exception:
+                    self._broken[action_type] = target
+                    log.exception("action %r: cannot load handler %r", action_type, target)
+                    raise KeyError(action_type) from None
+        return handler
+
+    def __setitem__(self, action_type: str, handler: Handler) -> None:
+        with self._lock:
+            self._resolved[action_type] = handler
+            self._broken.pop(action_type, None)
+
+    def __delitem__(self, action_type: str) -> None:
+        with self._lock:
+            found = self._resolved.pop(action_type, None) is not None
+            self._broken.pop(action_type, None)
+            found = self._table.pop(action_type, None) is not None or found
+            if self._plugins is not None:
+                found = self._plugins.pop(action_type, None) is not None or found
+        if not found:
+            raise KeyError(action_type)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(set(self._targets()) | set(self._resolved))
+
+    def __len__(self) -> int:
+        return len(set(self._targets()) | set(self._resolved))
+
+    def __contains__(self, action_type: object) -> bool:
+        return action_type in self._resolved or action_type in self._table or action_type in self._targets()
+
+    def loaded(self) -> Dict[str, Handler]:
+        """Handlers imported so far."""
+        return dict(self._resolved)
+
+
+REGISTRY = _LazyRegistry(HANDLERS)
+
+
+def register(action_type: str, handler: Handler) -> None:
+    REGISTRY[action_type] = handler
+
+
+def get_handler(action_type: str) -> Optional[Handler]:
+    if not isinstance(action_type, str):
+        return None
     return REGISTRY.get(action_type)
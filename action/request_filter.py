@@ -0,0 +1,116 @@
+# action/request_filter.py
+# =======================
+# Request-ID Bloom Filter
+# =======================
+# - "definitely never logged" answers for request_ids without touching the
+#   log index (most request_ids the gate sees are new)
+# - sized for MIRABASE_REQUEST_FILTER_CAPACITY ids at
+#   MIRABASE_REQUEST_FILTER_FP false-positive rate
+# - persisted next to the log segments; a snapshot records the last rotated
+#   segment it covers, so a restart only re-reads newer segments
+# - no deletes: when compaction leaves it over capacity it is rebuilt
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from storage.files import atomic_write_bytes
+
+CAPACITY = int(os.getenv("MIRABASE_REQUEST_FILTER_CAPACITY", "1000000"))
+FP_RATE = float(os.getenv("MIRABASE_REQUEST_FILTER_FP", "0.01"))
+
+_MAGIC = b"MIRABLOOM1\n"
+
+
+class BloomFilter:
+    __slots__ = ("bits", "hashes", "items", "_array")
+
+    def __init__(self, capacity: int = CAPACITY, fp_rate: float = FP_RATE) -> None:
+        capacity = max(1, int(capacity))
+        fp_rate = min(max(float(fp_rate), 1e-9), 0.5)
+        bits = int(math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.bits = max(64, (bits + 7) // 8 * 8)
+        self.hashes = max(1, int(round(self.bits / capacity * math.log(2))))
+        self.items = 0
+        self._array = bytearray(self.bits // 8)
+
+    def _positions(self, key: str) -> Tuple[int, ...]:
+        # double hashing over one 128-bit digest (Kirsch-Mitzenmacher)
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.bits
+        return tuple((h1 + i * h2) % m for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        array = self._array
+        new = False
+        for pos in self._positions(key):
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not array[byte] & mask:
+                array[byte] |= mask
+                new = True
+        if new:
+            self.items += 1
+
+    def __contains__(self, key: str) -> bool:
+        array = self._array
+        for pos in self._positions(key):
+            if not array[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    @property
+    def capacity(self) -> int:
+        return int(self.bits * math.log(2) / self.hashes)
+
+    def memory_bytes(self) -> int:
+        return len(self._array)
+
+    def estimated_fp_rate(self) -> float:
+        return (1.0 - math.exp(-self.hashes * self.items / self.bits)) ** self.hashes
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "bits": self.bits,
+            "hashes": self.hashes,
+            "items": self.items,
+            "capacity": self.capacity,
+            "memory_bytes": self.memory_bytes(),
+            "estimated_fp_rate": self.estimated_fp_rate(),
+        }
+
+    # -------------------------------------------------
+    # PERSISTENCE
+    # -------------------------------------------------
+    def save(self, path: Path, *, covers_seq: int) -> None:
+        header = {"bits": self.bits, "hashes": self.hashes, "items": self.items, "covers_seq": covers_seq}
+        atomic_write_bytes(
+            path,
+            _MAGIC + json.dumps(header).encode("utf-8") + b"\n" + bytes(self._array),
+            fsync=False,  # rebuildable from the log
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> Optional[Tuple["BloomFilter", int]]:
+        """(filter, covers_seq) or None if missing / unreadable / other sizing."""
+        try:
+            with open(path, "rb") as f:
+                if f.readline() != _MAGIC:
+                    return None
+                header = json.loads(f.readline())
+                array = f.read()
+        except (OSError, ValueError):
+            return None
+
+        bloom = cls()
+        if header.get("bits") != bloom.bits or header.get("hashes") != bloom.hashes or len(array) != len(bloom._array):
+            return None  # configuration changed -> rebuild
+        bloom._array[:] = array
+        bloom.items = int(header.get("items") or 0)
+        return bloom, int(header.get("covers_seq") or 0)
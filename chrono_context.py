@@ -21,6 +21,8 @@ try:
 except Exception:  # pragma: no cover
     ZoneInfo = None  # type: ignore
 
+from turn_clock import current_clock
+
 
 DEFAULT_TZ = "Europe/Prague"
 
@@ -50,13 +52,17 @@ def _parse_time_hhmm(s: Any) -> tuple[Optional[int], Optional[int]]:
     return h, m
 
 
-def _now_local(tz_name: str) -> datetime:
+def _now_local(tz_name: str) -> tuple[datetime, str]:
+    # (lokální čas, použitá tz): neznámá tz -> DEFAULT_TZ pro hodinu i label
+    clock = current_clock()
     if ZoneInfo is None:
-        return datetime.now()
-    try:
-        return datetime.now(ZoneInfo(tz_name))
-    except Exception:
-        return datetime.now()
+        return clock.system_local(), tz_name
+    for name in (tz_name, DEFAULT_TZ):
+        try:
+            return clock.local(name), name
+        except Exception:
+            continue
+    return clock.system_local(), tz_name
 
 
 def _part_of_day_from_hour(h: int) -> str:
@@ -90,47 +96,95 @@ def _flags_from_hour(h: int) -> List[str]:
     return sorted(set(flags))
 
 
-def build_chrono_context(
-    facts: Dict[str, Any],
-    *,
-    tz_name: str = DEFAULT_TZ,
-) -> Dict[str, Any]:
-    """
-    Vstup:
-      facts může obsahovat:
-        - time_now: "HH:MM"
-    Výstup:
-      dict pro context["chrono"]
-    """
-    time_now = facts.get("time_now")
+# -------------------------------------------------
+# PRECOMPUTED TABLES (hour -> part_of_day / flags)
+# -------------------------------------------------
+_PART_BY_HOUR: tuple[str, ...] = tuple(_part_of_day_from_hour(h) for h in range(24))
+
+# (hour, is_workday) -> flags incl. WORK_HOURS
+_FLAGS_BY_HOUR: Dict[tuple[int, bool], tuple[str, ...]] = {
+    (h, workday): tuple(sorted(set(_flags_from_hour(h) + (["WORK_HOURS"] if workday and 9 <= h <= 17 else []))))
+    for h in range(24)
+    for workday in (False, True)
+}
+
+
+# -------------------------------------------------
+# CACHE (tz_name, minute bucket, fact time_now) -> snapshot
+# -------------------------------------------------
+# snapshots stay private (flags as a tuple); callers get their own copy
+_CACHE: Dict[tuple[str, int, Optional[str]], Dict[str, Any]] = {}
+_CACHE_MAX = 256
+_cache_minute: Optional[int] = None
+
+
+def clear_chrono_cache() -> None:
+    global _cache_minute
+    _CACHE.clear()
+    _cache_minute = None
+
+
+def _build(time_now: Any, tz_name: str) -> Dict[str, Any]:
     h, m = _parse_time_hhmm(time_now)
+    now_local, tz_used = _now_local(tz_name)
 
     # fallback na systémový čas, když fact_engine čas nedodal
     if h is None:
-        now = _now_local(tz_name)
-        h, m = now.hour, now.minute
+        h, m = now_local.hour, now_local.minute
         source = "SYSTEM_NOW"
     else:
         source = "FACT_TIME_NOW"
 
-    part = _part_of_day_from_hour(h)
-    flags = _flags_from_hour(h)
-
     # WORK_HOURS – volitelný užitečný signál (později se hodí)
-    now_local = _now_local(tz_name)
-    weekday = now_local.weekday()  # 0=Mon ... 6=Sun
-    if weekday <= 4 and 9 <= h <= 17:
-        flags.append("WORK_HOURS")
-
-    flags = sorted(set(flags))
+    workday = now_local.weekday() <= 4  # 0=Mon ... 6=Sun
 
-    cc = ChronoContext(hour=h, minute=m, part_of_day=part, flags=flags)
+    cc = ChronoContext(hour=h, minute=m, part_of_day=_PART_BY_HOUR[h], flags=list(_FLAGS_BY_HOUR[(h, workday)]))
 
     return {
         "hour": cc.hour,
         "minute": cc.minute,
         "part_of_day": cc.part_of_day,
-        "flags": cc.flags,
+        "flags": tuple(cc.flags),
         "source": source,
-        "tz": tz_name,
+        "tz": tz_used,
     }
+
+
+def _handout(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(snapshot)
+    out["flags"] = list(snapshot["flags"])
+    return out
+
+
+def build_chrono_context(
+    facts: Dict[str, Any],
+    *,
+    tz_name: str = DEFAULT_TZ,
+) -> Dict[str, Any]:
+    """
+    Vstup:
+      facts může obsahovat:
+        - time_now: "HH:MM"
+    Výstup:
+      dict pro context["chrono"] (vlastní kopie, flags jako list)
+
+    Výstup se mění jen jednou za minutu (per timezone) -> memoizováno.
+    """
+    global _cache_minute
+
+    time_now = facts.get("time_now")
+    key_time = time_now if isinstance(time_now, str) else None
+
+    minute = current_clock().minute()
+    if minute != _cache_minute:
+        _CACHE.clear()
+        _cache_minute = minute
+
+    key = (tz_name, minute, key_time)
+    snapshot = _CACHE.get(key)
+    if snapshot is None:
+        snapshot = _build(key_time, tz_name)
+        if len(_CACHE) >= _CACHE_MAX:
+            _CACHE.clear()
+        _CACHE[key] = snapshot
+    return _handout(snapshot)
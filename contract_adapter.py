@@ -7,7 +7,6 @@
 
 from __future__ import annotations
 
-from datetime import datetime, timezone
 from typing import Any, Dict, Optional, List
 
 from response_contract import (
@@ -18,6 +17,7 @@ from response_contract import (
     Confidence,
     Constraint,
 )
+from turn_clock import current_clock
 
 
 def to_contract(legacy: Dict[str, Any]) -> ResponseContract:
@@ -116,4 +116,4 @@ def _facts_to_payload(facts: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def _new_decision_id() -> str:
-    return datetime.now(timezone.utc).strftime("D%Y%m%d%H%M%S%f")
+    return current_clock().utc.strftime("D%Y%m%d%H%M%S%f")
@@ -11,10 +11,11 @@ from __future__ import annotations
 
 from typing import Dict, Any, Optional
 from datetime import datetime
-from zoneinfo import ZoneInfo
 import ast
 import operator as op
 
+from turn_clock import current_clock
+
 
 _CZ_DAY_NAMES = {
     0: "pondělí",
@@ -37,7 +38,7 @@ def _require_timezone(context: Optional[Dict[str, Any]]) -> Optional[str]:
 
 
 def _now_in_tz(tz_name: str) -> datetime:
-    return datetime.now(ZoneInfo(tz_name))
+    return current_clock().local(tz_name)
 
 
 def _format_time_24h(dt: datetime) -> str:
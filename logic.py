@@ -3,28 +3,31 @@
 # MIRA BASE – BRAIN (v7)
 # =========================
 
-from typing import Dict, Optional, Any, List
-from datetime import datetime, timezone
+from typing import Dict, Optional, Any, List, Sequence, Tuple
+from dataclasses import dataclass, field
 import uuid
 import re
 
 from sensor import sense
 from attention_engine import resolve_attention
 from disambiguation_engine import resolve_disambiguation
-from emotion_engine import resolve_emotion_signal
+from emotion_engine import resolve_emotion_from_signals
 from personal_fact_engine import resolve_personal_fact
 from epistemic_engine import resolve_epistemic
 from security_engine import resolve_security
 from response_planner import plan_actions
 from fact_engine import resolve_facts
-from stm import get_last, append_entry
-from ltm import load_ltm, set_preference
-from chrono_context import build_chrono_context
+from stm import append_entry
+from ltm import load_ltm, load_profile, set_preference
+from chrono_context import DEFAULT_TZ, build_chrono_context
 from homeostasis_engine import resolve_homeostasis
 from social import handle as social_handle
 from meta_engine import resolve_meta
 from prediction_guard import resolve_prediction_guard
 from response_source_router import resolve_response_source
+from stage_hooks import StageRunner, start_turn
+from turn_context import TurnContext
+from turn_clock import clock_from_context, current_clock, use_clock
 
 from contract_adapter import to_contract
 from response_contract import ResponseContract
@@ -32,7 +35,7 @@ from response_contract import ResponseContract
 
 # ---------- helpers ----------
 def _now() -> str:
-    return datetime.now(timezone.utc).isoformat()
+    return current_clock().iso()
 
 
 def _mk_result(
@@ -72,6 +75,36 @@ def _mk_result(
     return out
 
 
+@dataclass
+class _BatchShared:
+    """
+    Read-once state shared by all turns of one run_pipeline_batch call.
+    """
+    personals: Dict[str, Any] = field(default_factory=dict)
+    profiles: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def personal(self, user_id: str) -> Any:
+        view = self.personals.get(user_id)
+        if view is None:
+            view = load_ltm(user_id)
+            self.personals[user_id] = view
+        return view
+
+    def profile(self, user_id: str) -> Dict[str, Any]:
+        prof = self.profiles.get(user_id)
+        if prof is None:
+            prof = load_profile(user_id)
+            self.profiles[user_id] = prof
+        return prof
+
+
+def _batch_loaders(shared: _BatchShared) -> Dict[str, Any]:
+    return {
+        "personal": lambda ctx: shared.personal(ctx["user_id"]),
+        "profile": lambda ctx: shared.profile(ctx["user_id"]),
+    }
+
+
 def _append_stm(result: Dict[str, Any], ctx: Dict[str, Any]) -> None:
     entry = {
         "turn_id": str(uuid.uuid4()),
@@ -88,6 +121,13 @@ def _append_stm(result: Dict[str, Any], ctx: Dict[str, Any]) -> None:
     append_entry(entry)
 
 
+def _finish(result: Dict[str, Any], ctx: Dict[str, Any], stages: StageRunner) -> Dict[str, Any]:
+    stages.run("append_stm", _append_stm, result, ctx)
+    if stages.timings is not None:
+        result["timings"] = stages.timings
+    return result
+
+
 def _social_payload_text(text: str) -> Dict[str, Any]:
     return {"kind": "SOCIAL", "value": {"text": text}}
 
@@ -100,7 +140,11 @@ CMD_PATTERNS = {
 }
 
 
-def _try_command(user_text: str, user_id: str) -> Optional[Dict[str, Any]]:
+def _try_command(
+    user_text: str,
+    user_id: str,
+    tz_name: str = DEFAULT_TZ,
+) -> Optional[Dict[str, Any]]:
     for key, rx in CMD_PATTERNS.items():
         m = rx.match(user_text)
         if m:
@@ -123,7 +167,7 @@ def _try_command(user_text: str, user_id: str) -> Optional[Dict[str, Any]]:
                 constraints=["NO_MEMORY_WRITE"],
                 payload=_social_payload_text("OK."),
                 facts={},
-                chrono=build_chrono_context({}),
+                chrono=build_chrono_context({}, tz_name=tz_name),
                 entities={},
             )
     return None
@@ -133,28 +177,76 @@ def _try_command(user_text: str, user_id: str) -> Optional[Dict[str, Any]]:
 # PIPELINE
 # =========================================================
 def run_pipeline(user_text: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    ctx: Dict[str, Any] = {}
+    # one clock instant for the whole turn (context["clock"] may freeze it)
+    with use_clock(clock_from_context(context)):
+        return _run_turn(user_text, context)
+
+
+def run_pipeline_batch(
+    items: Sequence[Tuple[str, str, Optional[Dict[str, Any]]]],
+) -> List[Dict[str, Any]]:
+    """
+    Runs many (user_id, text, context) turns in one call.
+    - results in input order
+    - turns run sequentially -> per-user STM order is the same as N x run_pipeline
+    - LTM and profile of each distinct user are read once per batch
+    - one clock snapshot for all turns (chrono is then a cache hit per timezone)
+    """
+    if not items:
+        return []
+
+    results: List[Dict[str, Any]] = []
+    with use_clock():
+        shared = _BatchShared()
+        for user_id, text, context in items:
+            seed = dict(context or {})
+            seed["user_id"] = user_id
+            results.append(_run_turn(text, seed, shared=shared))
+    return results
+
+
+def _run_turn(
+    user_text: str,
+    context: Optional[Dict[str, Any]] = None,
+    *,
+    shared: Optional[_BatchShared] = None,
+) -> Dict[str, Any]:
     seed = context or {}
+    ctx = TurnContext(loaders=_batch_loaders(shared) if shared is not None else None)
 
     # identity
     ctx["user_id"] = seed.get("user_id", "default")
-    ctx["timezone"] = seed.get("timezone", "Europe/Prague")
+    ctx["timezone"] = seed.get("timezone", DEFAULT_TZ)
     ctx["metrics"] = {"turn_count": seed.get("metrics", {}).get("turn_count", 0) + 1}
 
+    stages = start_turn(ctx, seed)
+    stage = stages.run
+
+    def chrono(facts: Dict[str, Any]) -> Dict[str, Any]:
+        if not facts:
+            return stage("build_chrono_context", ctx.load, "chrono")
+        return stage("build_chrono_context", build_chrono_context, facts, tz_name=ctx["timezone"])
+
+    def finish(result: Dict[str, Any]) -> Dict[str, Any]:
+        return _finish(result, ctx, stages)
+
     # ---- COMMAND short-circuit (A) ----
-    cmd = _try_command(user_text, ctx["user_id"])
+    cmd = stage("command", _try_command, user_text, ctx["user_id"], ctx["timezone"])
     if cmd:
-        _append_stm(cmd, ctx)
-        return cmd
+        if shared is not None:
+            # the command rewrote the profile -> next turn of this user re-reads it
+            shared.profiles.pop(ctx["user_id"], None)
+        return finish(cmd)
 
-    # memory snapshot
-    ctx["personal"] = load_ltm(ctx["user_id"])
+    # memory snapshot: ctx["personal"] / ctx["profile"] load lazily on first read
 
     # SENSOR
-    sensor = sense(user_text, ctx)
+    sensor = stage("sense", sense, user_text, ctx)
 
     # ATTENTION
-    attention = resolve_attention(
+    attention = stage(
+        "resolve_attention",
+        resolve_attention,
         {"signals": sensor.signals, "entities": sensor.entities, "confidence": sensor.confidence},
         user_text,
     )
@@ -163,14 +255,14 @@ def run_pipeline(user_text: str, context: Optional[Dict[str, Any]] = None) -> Di
     secondary_intents = attention.get("secondary_intents", [])
 
     # DISAMBIGUATION
-    disamb = resolve_disambiguation(attention)
+    disamb = stage("resolve_disambiguation", resolve_disambiguation, attention)
     primary_intent = disamb.get("resolved_intent") or attention.get("primary_intent")
 
     # PERSONAL FACTS
-    resolve_personal_fact(primary_intent, entities, user_text, ctx)
+    stage("resolve_personal_fact", resolve_personal_fact, primary_intent, entities, user_text, ctx)
 
     # EPISTEMIC
-    epistemic = resolve_epistemic(attention, user_text)
+    epistemic = stage("resolve_epistemic", resolve_epistemic, attention, user_text)
     if epistemic.get("epistemic_state") not in ("OK", "PASS"):
         result = _mk_result(
             pipeline="EPISTEMIC",
@@ -180,14 +272,13 @@ def run_pipeline(user_text: str, context: Optional[Dict[str, Any]] = None) -> Di
             constraints=["NO_GENERATION", "NO_MEMORY_WRITE"],
             payload={},
             facts={},
-            chrono=build_chrono_context({}),
+            chrono=chrono({}),
             entities=entities,
         )
-        _append_stm(result, ctx)
-        return result
+        return finish(result)
 
     # SECURITY
-    security = resolve_security(attention, user_text)
+    security = stage("resolve_security", resolve_security, attention, user_text)
     if security.get("security_state") == "BLOCKED":
         result = _mk_result(
             pipeline="SECURITY",
@@ -197,24 +288,25 @@ def run_pipeline(user_text: str, context: Optional[Dict[str, Any]] = None) -> Di
             constraints=["NO_GENERATION", "NO_MEMORY_WRITE"],
             payload={},
             facts={},
-            chrono=build_chrono_context({}),
+            chrono=chrono({}),
             entities=entities,
         )
-        _append_stm(result, ctx)
-        return result
+        return finish(result)
 
     # EMOTION (from STM)
-    recent_stm = get_last(ctx["user_id"], 5)
-    ctx["emotion"] = resolve_emotion_signal(recent_stm)
+    stm_signals = stage("get_signals", ctx.load, "stm_signals")
+    ctx["emotion"] = stage("resolve_emotion_signal", resolve_emotion_from_signals, stm_signals)
 
     # HOMEOSTASIS
-    ctx["homeostasis"] = resolve_homeostasis(
+    ctx["homeostasis"] = stage(
+        "resolve_homeostasis",
+        resolve_homeostasis,
         turn_count=ctx["metrics"]["turn_count"],
-        recent_intents=[e.get("intent") for e in recent_stm],
+        recent_intents=list(stm_signals.raw_intents),
     )
 
     # SOCIAL (deterministic)
-    social = social_handle(user_text, ctx)
+    social = stage("social_handle", social_handle, user_text, ctx)
     if isinstance(social, dict):
         result = _mk_result(
             pipeline="SOCIAL",
@@ -226,18 +318,19 @@ def run_pipeline(user_text: str, context: Optional[Dict[str, Any]] = None) -> Di
             constraints=["NO_MEMORY_WRITE"],
             payload={"kind": "SOCIAL", "value": {"text": social.get("text")}},
             facts={},
-            chrono=build_chrono_context({}),
+            chrono=chrono({}),
             entities=entities,
         )
-        _append_stm(result, ctx)
-        return result
+        return finish(result)
 
     # ACTIONS
-    actions = plan_actions(primary_intent, secondary_intents, entities)
+    actions = stage("plan_actions", plan_actions, primary_intent, secondary_intents, entities)
 
     # META / GUARD
-    ctx["meta"] = resolve_meta(last_results=recent_stm)
-    guard = resolve_prediction_guard(
+    ctx["meta"] = stage("resolve_meta", resolve_meta, last_results=list(stm_signals.last2))
+    guard = stage(
+        "resolve_prediction_guard",
+        resolve_prediction_guard,
         attention=attention,
         epistemic=epistemic,
         meta=ctx["meta"],
@@ -254,18 +347,24 @@ def run_pipeline(user_text: str, context: Optional[Dict[str, Any]] = None) -> Di
             constraints=flags,
             payload={},
             facts={},
-            chrono=build_chrono_context({}),
+            chrono=chrono({}),
             entities=entities,
         )
-        _append_stm(result, ctx)
-        return result
+        return finish(result)
 
     # ROUTER
-    route = resolve_response_source(actions=actions, attention=attention, entities=entities, context=ctx)
+    route = stage(
+        "resolve_response_source",
+        resolve_response_source,
+        actions=actions,
+        attention=attention,
+        entities=entities,
+        context=ctx,
+    )
     source = route.get("source")
 
     if source == "DETERMINISTIC":
-        facts = resolve_facts(actions, entities, ctx)
+        facts = stage("resolve_facts", resolve_facts, actions, entities, ctx)
         result = _mk_result(
             pipeline="FACT",
             intent=primary_intent,
@@ -274,11 +373,10 @@ def run_pipeline(user_text: str, context: Optional[Dict[str, Any]] = None) -> Di
             source="DETERMINISTIC",
             payload={},
             facts=facts,
-            chrono=build_chrono_context(facts),
+            chrono=chrono(facts),
             entities=entities,
         )
-        _append_stm(result, ctx)
-        return result
+        return finish(result)
 
     result = _mk_result(
         pipeline="FALLBACK",
@@ -289,12 +387,12 @@ def run_pipeline(user_text: str, context: Optional[Dict[str, Any]] = None) -> Di
         constraints=["NO_GENERATION"],
         payload={},
         facts={},
-        chrono=build_chrono_context({}),
+        chrono=chrono({}),
         entities=entities,
     )
-    _append_stm(result, ctx)
-    return result
+    return finish(result)
 
 
 def run(user_text: str, context: Optional[Dict[str, Any]] = None) -> ResponseContract:
-    return to_contract(run_pipeline(user_text, context))
+    with use_clock(clock_from_context(context)):
+        return to_contract(run_pipeline(user_text, context))
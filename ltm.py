@@ -2,22 +2,257 @@
 # =========================
 # MIRA BASE – LTM v2.2 (BACKWARD COMPATIBLE)
 # =========================
+#
+# - memory.json parsed once per change (stat-validated in-process cache)
+# - reads hand out copies (callers may edit them; the cache stays intact)
+# - writes go through save_ltm / upsert_fact and update the cache directly
+# - storage goes through storage.backend (MIRABASE_STORAGE=json|sqlite);
+#   the functions below marked JSON implement the file layout
+# - optional sharded layout (MIRABASE_LTM_LAYOUT=sharded): one file per user,
+#   atomic replace per shard; `python ltm.py migrate` splits memory.json
+# - every write is temp file + rename under an advisory lock (safe with
+#   several worker processes; readers never see a truncated file)
+#
 
 from __future__ import annotations
 
+import copy
 import json
+import os
+import sys
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from action.profile_store import get_repository
+from storage.backend import get_storage
+from storage.files import atomic_write_json, file_lock
 
 
 # -------------------------------------------------
-# PATHS
+# PATHS / LAYOUT
 # -------------------------------------------------
 MEMORY_FILE = Path("memory.json")
+USERS_DIR = Path("users")
+
+# "single"  -> everything in memory.json["ltm"][user_id] (legacy)
+# "sharded" -> users/<user_id>/ltm.json, one file per user
+#              (users not migrated yet are still read from memory.json)
+LTM_LAYOUT = os.getenv("MIRABASE_LTM_LAYOUT", "single").strip().lower()
+
+
+def _shard_path(user_id: str) -> Path:
+    return USERS_DIR / user_id / "ltm.json"
+
+
+def _sharded() -> bool:
+    return LTM_LAYOUT == "sharded"
 
 
-def _profile_path(user_id: str) -> Path:
-    return Path("users") / user_id / "profile.json"
+# advisory file locks (storage.files): memory.json has one lock,
+# shards are locked per user so writers of different users run in parallel
+_DOC_LOCK = "ltm:memory.json"
+
+
+def _user_lock(user_id: str) -> str:
+    return f"ltm:{user_id}"
+
+
+# -------------------------------------------------
+# FILE CACHE
+# -------------------------------------------------
+# Every JSON file (memory.json, shards) is parsed once per change, not once
+# per turn. Validation = one stat(): (mtime_ns, size, inode).
+_CACHE: "OrderedDict[Path, Tuple[Tuple[int, int, int], Dict[str, Any]]]" = OrderedDict()
+_CACHE_MAX = 4096
+_LOCK = threading.RLock()
+
+
+def _stamp(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _remember(path: Path, stamp: Optional[Tuple[int, int, int]], data: Dict[str, Any]) -> None:
+    if stamp is None:
+        _CACHE.pop(path, None)
+        return
+    _CACHE[path] = (stamp, data)
+    _CACHE.move_to_end(path)
+    while len(_CACHE) > _CACHE_MAX:
+        _CACHE.popitem(last=False)
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Cached parse of a JSON object file.
+    Missing file -> None, broken / non-object file -> {}
+    """
+    stamp = _stamp(path)
+    if stamp is None:
+        _CACHE.pop(path, None)
+        return None
+
+    with _LOCK:
+        hit = _CACHE.get(path)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+
+    # parse outside the cache lock (other users' reads keep going)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            data = {}
+    except Exception:
+        data = {}
+
+    with _LOCK:
+        _remember(path, stamp, data)
+    return data
+
+
+def _write_json_atomic(path: Path, data: Dict[str, Any]) -> None:
+    # caller holds the file lock of `path`
+    atomic_write_json(path, data)
+
+    # write-through: our own write must not trigger a re-parse
+    with _LOCK:
+        _remember(path, _stamp(path), data)
+
+
+def _read_document() -> Dict[str, Any]:
+    data = _read_json(MEMORY_FILE)
+    if not data:
+        return {"ltm": {}}
+    return data
+
+
+def clear_cache() -> None:
+    with _LOCK:
+        _CACHE.clear()
+
+
+def _user_dict(data: Dict[str, Any], user_id: str) -> Optional[Dict[str, Any]]:
+    ltm = data.get("ltm")
+    user = ltm.get(user_id) if isinstance(ltm, dict) else None
+    return user if isinstance(user, dict) else None
+
+
+def _load_user(user_id: str) -> Optional[Dict[str, Any]]:
+    if _sharded():
+        shard = _read_json(_shard_path(user_id))
+        if shard is not None:
+            return shard
+    # single layout, or a user not migrated to a shard yet
+    return _user_dict(_read_document(), user_id)
+
+
+def _iter_shards() -> Iterator[Tuple[str, Dict[str, Any]]]:
+    if not USERS_DIR.is_dir():
+        return
+    for path in sorted(USERS_DIR.glob("*/ltm.json")):
+        shard = _read_json(path)
+        if shard is not None:
+            yield path.parent.name, shard
+
+
+# -------------------------------------------------
+# JSON FILE STORAGE (used by storage.json_backend.JsonStorage)
+# -------------------------------------------------
+def _json_load_user(user_id: str) -> Optional[Dict[str, Any]]:
+    # a copy, like _json_load_document: load_ltm(user_id) returns a plain dict
+    user = _load_user(user_id)
+    return copy.deepcopy(user) if user is not None else None
+
+
+def _json_load_document() -> Dict[str, Any]:
+    # a copy: callers edit the document and hand it to save_ltm(); edits on
+    # the cached dicts would make the shard comparison below see no change
+    data = _read_document()
+    if not _sharded():
+        return copy.deepcopy(data)
+
+    ltm = dict(data.get("ltm") or {}) if isinstance(data.get("ltm"), dict) else {}
+    ltm.update(_iter_shards())
+    full = dict(data)
+    full["ltm"] = ltm
+    return copy.deepcopy(full)
+
+
+def _json_save_document(data: Dict[str, Any]) -> None:
+    # the cache keeps what was written; the caller may go on editing `data`
+    _save_document(copy.deepcopy(data))
+
+
+def _save_document(data: Dict[str, Any]) -> None:
+    # `data` is not shared with any caller
+    with file_lock(_DOC_LOCK):
+        if not _sharded():
+            _write_json_atomic(MEMORY_FILE, data)
+            return
+
+        # sharded: user facts -> shards, everything else stays in memory.json
+        ltm = data.get("ltm")
+        if not isinstance(ltm, dict):
+            ltm = {}
+        for user_id, facts in ltm.items():
+            if not isinstance(facts, dict):
+                continue
+            with file_lock(_user_lock(user_id)):
+                if _read_json(_shard_path(user_id)) != facts:
+                    _write_json_atomic(_shard_path(user_id), facts)
+
+        # the document is the whole LTM: users left out of it are deleted
+        # (a stale shard would bring them back on the next load)
+        if USERS_DIR.is_dir():
+            for path in sorted(USERS_DIR.glob("*/ltm.json")):
+                user_id = path.parent.name
+                if user_id in ltm:
+                    continue
+                with file_lock(_user_lock(user_id)):
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
+                    with _LOCK:
+                        _CACHE.pop(path, None)
+
+        rest = {k: v for k, v in data.items() if k != "ltm"}
+        _write_json_atomic(MEMORY_FILE, rest)
+
+
+def _json_upsert_fact(user_id: str, key: str, value: Any) -> None:
+    _json_upsert_facts(user_id, {key: value})
+
+
+def _json_upsert_facts(user_id: str, facts: Dict[str, Any]) -> None:
+    if _sharded():
+        # touches (and locks) only this user's shard
+        with file_lock(_user_lock(user_id)):
+            user = dict(_load_user(user_id) or {})
+            user.update(facts)
+            _write_json_atomic(_shard_path(user_id), user)
+        return
+
+    # single layout: one file for everyone -> read-modify-write under its lock
+    with file_lock(_DOC_LOCK):
+        data = _read_document()
+
+        # copy-on-write: only the touched levels are copied, cached views stay valid
+        ltm = data.get("ltm")
+        ltm = dict(ltm) if isinstance(ltm, dict) else {}
+        user = dict(_user_dict(data, user_id) or {})
+        user.update(facts)
+        ltm[user_id] = user
+
+        new_data = dict(data)
+        new_data["ltm"] = ltm
+        _save_document(new_data)
 
 
 # -------------------------------------------------
@@ -26,72 +261,103 @@ def _profile_path(user_id: str) -> Path:
 def load_ltm(user_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Backward compatible:
-    - load_ltm() -> full LTM
-    - load_ltm(user_id) -> user-specific LTM
+    - load_ltm() -> full LTM (a private copy; change it and save_ltm it,
+      or use upsert_fact). Sharded layout assembles it from all shards.
+    - load_ltm(user_id) -> user-specific LTM (a private copy, {} if none)
     """
-    if not MEMORY_FILE.exists():
-        data = {"ltm": {}}
-    else:
-        try:
-            with open(MEMORY_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            if not isinstance(data, dict):
-                data = {"ltm": {}}
-        except Exception:
-            data = {"ltm": {}}
-
+    store = get_storage()
     if user_id is None:
-        return data
+        return store.load_ltm_document()
 
-    return data.get("ltm", {}).get(user_id, {})
+    user = store.load_user_ltm(user_id)
+    return user if user is not None else {}
 
 
 def save_ltm(data: Dict[str, Any]) -> None:
-    with open(MEMORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    get_storage().save_ltm_document(data)
 
 
-def upsert_fact(user_id: str, key: str, value: Any) -> None:
+def upsert_fact(
+    user_id: str,
+    key: str,
+    value: Any,
+    *,
+    confidence: Optional[str] = None,
+    source: Optional[str] = None,
+    locale: Optional[str] = None,
+) -> None:
     """
     Legacy API – used by personal_fact_engine
+    (confidence/source/locale are accepted; the v2 layout stores the bare value)
     """
-    data = load_ltm()
-    data.setdefault("ltm", {})
-    data["ltm"].setdefault(user_id, {})
-    data["ltm"][user_id][key] = value
-    save_ltm(data)
+    get_storage().upsert_fact(user_id, key, value)
 
 
 # -------------------------------------------------
-# PREFERENCES WRITE (v2)
+# MIGRATION (single -> sharded)
 # -------------------------------------------------
-def set_preference(user_id: str, key: str, value: Any) -> bool:
-    path = _profile_path(user_id)
-
-    if not path.exists():
-        return False
+def migrate_to_shards() -> int:
+    """
+    Splits memory.json["ltm"] into users/<user_id>/ltm.json.
+    - existing shard values win (they are newer)
+    - memory.json keeps everything except "ltm"
+    - idempotent; returns number of users written
+    Run it, then switch MIRABASE_LTM_LAYOUT=sharded.
+    """
+    with file_lock(_DOC_LOCK):
+        data = _read_json(MEMORY_FILE)
+        if not data or not isinstance(data.get("ltm"), dict):
+            return 0
 
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            profile = json.load(f)
-        if not isinstance(profile, dict):
-            return False
+        migrated = 0
+        for user_id, facts in data["ltm"].items():
+            if not isinstance(facts, dict):
+                continue
+            with file_lock(_user_lock(user_id)):
+                shard = _read_json(_shard_path(user_id)) or {}
+                _write_json_atomic(_shard_path(user_id), {**facts, **shard})
+            migrated += 1
 
-        profile[key] = value
+        rest = {k: v for k, v in data.items() if k != "ltm"}
+        _write_json_atomic(MEMORY_FILE, rest)
+        return migrated
 
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(profile, f, ensure_ascii=False, indent=2)
 
-        return True
+# -------------------------------------------------
+# PROFILE READ
+# -------------------------------------------------
+def load_profile(user_id: str) -> Dict[str, Any]:
+    """
+    Tolerant profile read through the shared ProfileRepository
+    (action.profile_store). Missing or broken profile -> {}
+    """
+    try:
+        data = get_repository().get(user_id)
     except Exception:
-        return False
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+# -------------------------------------------------
+# PREFERENCES WRITE (v2)
+# -------------------------------------------------
+def set_preference(user_id: str, key: str, value: Any) -> bool:
+    return set_preferences(user_id, {key: value})
 
 
 def set_preferences(user_id: str, updates: Dict[str, Any]) -> bool:
     if not isinstance(updates, dict):
         return False
 
-    ok = True
-    for k, v in updates.items():
-        ok = ok and set_preference(user_id, k, v)
-    return ok
+    # one locked read-modify-write for all keys
+    try:
+        return get_repository().update(user_id, lambda profile: profile.update(updates)) is not None
+    except Exception:
+        return False
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["migrate"]:
+        print(f"migrated {migrate_to_shards()} user(s) to {USERS_DIR}/<user_id>/ltm.json")
+    else:
+        print("usage: python ltm.py migrate")
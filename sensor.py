@@ -13,7 +13,7 @@
 #  - confidence: float
 
 from dataclasses import dataclass
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 import re
 
 
@@ -36,8 +36,10 @@ def _normalize(text: str) -> str:
     return text.lower().strip()
 
 
-def _has(text_n: str, pattern: str) -> bool:
-    return re.search(pattern, text_n, flags=re.IGNORECASE) is not None
+_ARITH_FULL_RE = re.compile(r"[0-9\+\-\*/\(\)\s\.]+")
+_ARITH_CHUNK_RE = re.compile(r"(\(?\s*\d[\d\s\.\(\)]*(?:[\+\-\*/]\s*\d[\d\s\.\(\)]*)+\)?)")
+_DIGIT_RE = re.compile(r"\d")
+_OPERATOR_RE = re.compile(r"[\+\-\*/]")
 
 
 def _extract_arithmetic_expression(text_n: str) -> Optional[str]:
@@ -47,90 +49,66 @@ def _extract_arithmetic_expression(text_n: str) -> Optional[str]:
     Example: "kolik je (2+3)*4" -> "(2+3)*4"
     """
     # First: whole string looks like expression
-    if re.fullmatch(r"[0-9\+\-\*/\(\)\s\.]+", text_n):
+    if _ARITH_FULL_RE.fullmatch(text_n):
         expr = text_n.strip()
-        return expr if re.search(r"\d", expr) else None
+        return expr if _DIGIT_RE.search(expr) else None
 
     # Otherwise: try to find a chunk that looks like expression
     # Require at least one operator and at least one digit
-    m = re.search(r"(\(?\s*\d[\d\s\.\(\)]*(?:[\+\-\*/]\s*\d[\d\s\.\(\)]*)+\)?)", text_n)
+    m = _ARITH_CHUNK_RE.search(text_n)
     if not m:
         return None
 
     expr = m.group(1).strip()
     # final sanity
-    if re.search(r"\d", expr) and re.search(r"[\+\-\*/]", expr):
+    if _DIGIT_RE.search(expr) and _OPERATOR_RE.search(expr):
         return expr
 
     return None
 
 
 # =========================
-# SENSOR CORE
+# SIGNAL RULES (compiled once, checked in order)
 # =========================
 
-def sense(text: str, context: Optional[Dict[str, Any]] = None) -> SensorResult:
-    text_n = _normalize(text)
-
-    signals: List[str] = []
-    entities: Dict[str, Any] = {}
-    confidence = 0.95
-
-    # -------------------------
+_SIGNAL_RULES: List[Tuple[str, "re.Pattern[str]"]] = [
     # GREETINGS
-    # -------------------------
-    if _has(text_n, r"\b(ahoj|nazdar|čau|cau|zdravím|zdravim|dobrý den|dobry den)\b"):
-        signals.append("GREETING")
-
-    # -------------------------
+    ("GREETING", re.compile(r"\b(ahoj|nazdar|čau|cau|zdravím|zdravim|dobrý den|dobry den)\b", re.IGNORECASE)),
     # THANKS
-    # -------------------------
-    if _has(text_n, r"\b(dík|dik|díky|diky|děkuju|dekuju|děkuji|dekuji)\b"):
-        signals.append("THANKS")
-
-    # -------------------------
+    ("THANKS", re.compile(r"\b(dík|dik|díky|diky|děkuju|dekuju|děkuji|dekuji)\b", re.IGNORECASE)),
     # BYE
-    # -------------------------
-    if _has(text_n, r"\b(zatím|zatim|měj se|mej se|na shledanou|nashle|dobrou)\b"):
-        signals.append("BYE")
-
-    # -------------------------
+    ("BYE", re.compile(r"\b(zatím|zatim|měj se|mej se|na shledanou|nashle|dobrou)\b", re.IGNORECASE)),
     # ACK
-    # -------------------------
-    if _has(text_n, r"\b(ok|okej|okey|jasně|jasne|rozumím|rozumim|chápu|chapu|beru|platí|plati)\b"):
-        signals.append("ACK")
-
-    # -------------------------
+    ("ACK", re.compile(r"\b(ok|okej|okey|jasně|jasne|rozumím|rozumim|chápu|chapu|beru|platí|plati)\b", re.IGNORECASE)),
     # USER-STATE (EPISTEMIC LIMIT)
     # "jak mi je", "jak se cítím" = AI to nemůže vědět bez sdělení uživatele
-    # -------------------------
-    if _has(text_n, r"\b(jak mi je|jak se cítím|jak se citim|jak se teď cítím|jak se ted citim)\b"):
-        signals.append("EPISTEMIC_USER_STATE")
-
-    # -------------------------
+    ("EPISTEMIC_USER_STATE", re.compile(r"\b(jak mi je|jak se cítím|jak se citim|jak se teď cítím|jak se ted citim)\b", re.IGNORECASE)),
     # SMALLTALK – ASSISTANT STATE
     # "jak se máš", "jak ti je" = otázka na asistenta
-    # -------------------------
-    if _has(text_n, r"\b(jak se máš|jak se mas|jak ti je)\b"):
-        signals.append("SMALLTALK_STATE")
-
-    # -------------------------
+    ("SMALLTALK_STATE", re.compile(r"\b(jak se máš|jak se mas|jak ti je)\b", re.IGNORECASE)),
     # TIME
-    # -------------------------
-    if _has(text_n, r"\b(kolik je hodin|kolik je teď hodin|kolik je ted hodin)\b"):
-        signals.append("TIME_NOW")
-
-    # -------------------------
+    ("TIME_NOW", re.compile(r"\b(kolik je hodin|kolik je teď hodin|kolik je ted hodin)\b", re.IGNORECASE)),
     # DATE
-    # -------------------------
-    if _has(text_n, r"\b(kolikátého je|kolikateho je|jaké je datum|jake je datum)\b"):
-        signals.append("DATE_TODAY")
-
-    # -------------------------
+    ("DATE_TODAY", re.compile(r"\b(kolikátého je|kolikateho je|jaké je datum|jake je datum)\b", re.IGNORECASE)),
     # DAY
-    # -------------------------
-    if _has(text_n, r"\b(jaký je dnes den|jaky je dnes den|jaký je den|jaky je den)\b"):
-        signals.append("DAY_TODAY")
+    ("DAY_TODAY", re.compile(r"\b(jaký je dnes den|jaky je dnes den|jaký je den|jaky je den)\b", re.IGNORECASE)),
+]
+
+
+# =========================
+# SENSOR CORE
+# =========================
+
+def sense(text: str, context: Optional[Dict[str, Any]] = None) -> SensorResult:
+    text_n = _normalize(text)
+
+    signals: List[str] = []
+    entities: Dict[str, Any] = {}
+    confidence = 0.95
+
+    for signal, rx in _SIGNAL_RULES:
+        if rx.search(text_n):
+            signals.append(signal)
 
     # -------------------------
     # ARITHMETIC (standalone or embedded)
@@ -5,13 +5,13 @@
 
 from __future__ import annotations
 
-import json
 import os
 import random
 import re
-from pathlib import Path
 from typing import Any, Dict, Optional
 
+from ltm import load_profile
+
 
 # ---------- helpers ----------
 def _n(text: str) -> str:
@@ -45,20 +45,13 @@ def _admin_id() -> Optional[str]:
     return v.strip() if isinstance(v, str) and v.strip() else None
 
 
-def _profile_path(user_id: str) -> Path:
-    return Path("users") / user_id / "profile.json"
-
-
-def _load_profile(user_id: str) -> Dict[str, Any]:
-    p = _profile_path(user_id)
-    if not p.exists():
-        return {}
-    try:
-        with open(p, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data if isinstance(data, dict) else {}
-    except Exception:
-        return {}
+def _get_profile(user_id: str, context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # caller may hand over an already loaded profile (batch / per-turn context)
+    if isinstance(context, dict):
+        prof = context.get("profile")
+        if isinstance(prof, dict):
+            return prof
+    return load_profile(user_id)
 
 
 def _pick(pool: list[str]) -> str:
@@ -144,7 +137,7 @@ def handle(user_text: str, context: Optional[Dict[str, Any]] = None) -> Optional
 
     user_id = _get_user_id(context)
     emotion = _get_emotion(context)
-    profile = _load_profile(user_id)
+    profile = _get_profile(user_id, context)
 
     tone = _resolve_tone(user_id, profile, emotion)
     responses = SOCIAL_PATTERNS[intent]["responses"]
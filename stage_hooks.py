@@ -0,0 +1,111 @@
+# stage_hooks.py
+# =========================
+# MIRA BASE – STAGE HOOKS (v1)
+# =========================
+#
+# Responsibilities:
+# - time every pipeline stage with a monotonic clock
+# - fan out before/after callbacks to registered observers
+# - stay (almost) free when nobody is listening
+#
+# Usage:
+# - logic.run_pipeline wraps each stage call in StageRunner.run(...)
+# - MIRABASE_STAGE_TIMINGS=1 or context["timings"]=True -> result["timings"]
+#
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# before(stage, ctx) / after(stage, elapsed_ms, ctx)
+BeforeHook = Callable[[str, Dict[str, Any]], None]
+AfterHook = Callable[[str, float, Dict[str, Any]], None]
+
+_BEFORE: List[BeforeHook] = []
+_AFTER: List[AfterHook] = []
+
+_TIMINGS_ENABLED = os.getenv("MIRABASE_STAGE_TIMINGS", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+# -------------------------------------------------
+# PUBLIC API
+# -------------------------------------------------
+def add_before_hook(fn: BeforeHook) -> None:
+    if fn not in _BEFORE:
+        _BEFORE.append(fn)
+
+
+def add_after_hook(fn: AfterHook) -> None:
+    if fn not in _AFTER:
+        _AFTER.append(fn)
+
+
+def remove_hook(fn: Callable[..., None]) -> None:
+    if fn in _BEFORE:
+        _BEFORE.remove(fn)
+    if fn in _AFTER:
+        _AFTER.remove(fn)
+
+
+def clear_hooks() -> None:
+    _BEFORE.clear()
+    _AFTER.clear()
+
+
+def set_timings_enabled(enabled: bool) -> None:
+    global _TIMINGS_ENABLED
+    _TIMINGS_ENABLED = bool(enabled)
+
+
+def timings_enabled() -> bool:
+    return _TIMINGS_ENABLED
+
+
+# -------------------------------------------------
+# PER-TURN RUNNER
+# -------------------------------------------------
+class StageRunner:
+    """
+    One instance per turn.
+    Disabled runner = plain function call (no clock reads, no hooks).
+    """
+
+    __slots__ = ("ctx", "timings", "_active")
+
+    def __init__(self, ctx: Dict[str, Any], collect: bool = False) -> None:
+        self.ctx = ctx
+        self.timings: Optional[Dict[str, float]] = {} if collect else None
+        self._active = collect or bool(_BEFORE) or bool(_AFTER)
+
+    def run(self, stage: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        if not self._active:
+            return fn(*args, **kwargs)
+
+        for hook in tuple(_BEFORE):
+            try:
+                hook(stage, self.ctx)
+            except Exception:
+                pass
+
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - t0) * 1000.0
+
+            # a stage may run more than once per turn (e.g. chrono) -> accumulate
+            if self.timings is not None:
+                self.timings[stage] = self.timings.get(stage, 0.0) + elapsed_ms
+
+            for hook in tuple(_AFTER):
+                try:
+                    hook(stage, elapsed_ms, self.ctx)
+                except Exception:
+                    pass
+
+
+def start_turn(ctx: Dict[str, Any], seed: Optional[Dict[str, Any]] = None) -> StageRunner:
+    collect = _TIMINGS_ENABLED or bool((seed or {}).get("timings"))
+    return StageRunner(ctx, collect=collect)
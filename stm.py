@@ -1,69 +1,464 @@
 # =========================
-# MIRA BASE – SHORT TERM MEMORY (STM v2)
+# MIRA BASE – SHORT TERM MEMORY (STM v3)
 # =========================
 #
 # Scope:
 # - per-user isolation
-# - FIFO buffer with fixed limit
+# - FIFO ring buffer with fixed capacity (deque(maxlen), no copying)
 # - meaning-only (no text, no facts, no emotion)
+# - entries stored as compact __slots__ records (read-only mappings)
+# - optional bounds (off by default, opt in per deployment): idle users
+#   expire (TTL), LRU users evicted over the global budget
+# - rolling window signals (flag counts, last intents/pipelines) kept at
+#   append time -> emotion / meta / homeostasis read them in O(1)
+#
+# Config (env, 0 = unlimited; or stm.configure(...)), all 0 by default:
+# - MIRABASE_STM_MAX_USERS, MIRABASE_STM_MAX_ENTRIES, MIRABASE_STM_MAX_BYTES,
+#   MIRABASE_STM_IDLE_TTL seconds
+# - with a limit set, STM history of evicted / expired users is gone
 #
 
 from __future__ import annotations
 
-from typing import Dict, Any, List, Optional
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+_MISSING: Any = object()
+
+_FIELDS = (
+    "turn_id",
+    "user_id",
+    "timestamp",
+    "pipeline",
+    "intent",
+    "actions",
+    "source",
+    "epistemic_state",
+    "flags",
+    "emotion_signal",
+)
+_FIELD_SET = frozenset(_FIELDS)
+
+
+class STMEntry(Mapping):
+    """
+    One STM turn. Behaves like the old entry dict for reads
+    (entry["intent"], entry.get("flags", []), dict(entry)).
+    """
+
+    __slots__ = _FIELDS + ("_extra",)
+
+    def __init__(self, entry: Dict[str, Any]) -> None:
+        for name in _FIELDS:
+            object.__setattr__(self, name, entry.get(name, _MISSING))
+        extra = None
+        if not _FIELD_SET.issuperset(entry):
+            extra = {k: v for k, v in entry.items() if k not in _FIELD_SET}
+        object.__setattr__(self, "_extra", extra)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for name in _FIELDS:
+            if getattr(self, name) is not _MISSING:
+                yield name
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        n = sum(1 for name in _FIELDS if getattr(self, name) is not _MISSING)
+        return n + (len(self._extra) if self._extra is not None else 0)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("STMEntry is read-only")
+
+    def __repr__(self) -> str:
+        return f"STMEntry({dict(self)!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self)
+
+
+def _approx_size(entry: STMEntry) -> int:
+    # shallow estimate: record + its direct values (strings, flag/action lists)
+    size = sys.getsizeof(entry)
+    for name in _FIELDS:
+        value = getattr(entry, name)
+        if value is _MISSING or value is None:
+            continue
+        size += sys.getsizeof(value)
+        if isinstance(value, (list, tuple)):
+            size += sum(sys.getsizeof(v) for v in value)
+    if entry._extra is not None:
+        size += sys.getsizeof(entry._extra)
+    return size
+
+
+# -------------------------------------------------
+# WINDOW SIGNALS (rolling aggregates for emotion / meta / homeostasis)
+# -------------------------------------------------
+SIGNAL_WINDOW = 5
+
+
+class WindowSignals:
+    """
+    Aggregates over the last SIGNAL_WINDOW entries of one user.
+    Immutable snapshot; a new one is built on every append.
+    """
+
+    __slots__ = ("size", "low_signal", "stall_risk", "blocked", "intents", "pipelines", "raw_intents", "last2")
+
+    def __init__(
+        self,
+        size: int = 0,
+        low_signal: int = 0,
+        stall_risk: int = 0,
+        blocked: int = 0,
+        intents: Tuple[str, ...] = (),
+        pipelines: Tuple[str, ...] = (),
+        raw_intents: Tuple[Any, ...] = (),
+        last2: Tuple[Any, ...] = (),
+    ) -> None:
+        self.size = size                # entries in window
+        self.low_signal = low_signal    # LOW_SIGNAL flags in window
+        self.stall_risk = stall_risk    # STALL_RISK flags in window
+        self.blocked = blocked          # entries with epistemic_state BLOCKED
+        self.intents = intents          # last 3 str intents in window
+        self.pipelines = pipelines      # last 3 str pipelines in window
+        self.raw_intents = raw_intents  # intent of the last 3 entries (may be None)
+        self.last2 = last2              # last 2 entries
+
+
+EMPTY_SIGNALS = WindowSignals()
+
+
+def _contrib(entry: Any) -> Tuple[int, int, int]:
+    if not isinstance(entry, Mapping):
+        return 0, 0, 0
+    low = stall = 0
+    flags = entry.get("flags", [])
+    if isinstance(flags, list):
+        for f in flags:
+            if f == "LOW_SIGNAL":
+                low += 1
+            elif f == "STALL_RISK":
+                stall += 1
+    ep = entry.get("epistemic_state")
+    blocked = 1 if isinstance(ep, str) and ep.upper() == "BLOCKED" else 0
+    return low, stall, blocked
+
+
+def _last_str(window: Sequence[Any], key: str) -> Tuple[str, ...]:
+    out: List[str] = []
+    for e in reversed(window):
+        v = e.get(key) if isinstance(e, Mapping) else None
+        if isinstance(v, str):
+            out.append(v)
+            if len(out) == 3:
+                break
+    return tuple(reversed(out))
+
+
+def _with_window(window: Sequence[Any], low: int, stall: int, blocked: int) -> WindowSignals:
+    return WindowSignals(
+        size=len(window),
+        low_signal=low,
+        stall_risk=stall,
+        blocked=blocked,
+        intents=_last_str(window, "intent"),
+        pipelines=_last_str(window, "pipeline"),
+        raw_intents=tuple(e.get("intent") if isinstance(e, Mapping) else None for e in window[-3:]),
+        last2=tuple(window[-2:]),
+    )
+
+
+def summarize(entries: Sequence[Any]) -> WindowSignals:
+    """
+    Full (non-incremental) aggregate of the last SIGNAL_WINDOW entries.
+    """
+    window = list(entries[-SIGNAL_WINDOW:]) if isinstance(entries, (list, tuple)) else []
+    low = stall = blocked = 0
+    for e in window:
+        a, b, c = _contrib(e)
+        low += a
+        stall += b
+        blocked += c
+    return _with_window(window, low, stall, blocked)
+
+
+class _Bucket:
+    """
+    Per-user ring buffer + bookkeeping for eviction + rolling window signals.
+    """
+
+    __slots__ = ("entries", "touched", "nbytes", "signals")
+
+    def __init__(self, capacity: Optional[int]) -> None:
+        self.entries: Deque[STMEntry] = deque(maxlen=capacity)
+        self.touched = 0.0
+        self.nbytes = 0
+        self.signals = EMPTY_SIGNALS
 
-# In-memory store
-_STM: Dict[str, List[Dict[str, Any]]] = {}
+    def push(self, record: STMEntry) -> Optional[STMEntry]:
+        """
+        Appends + updates window signals incrementally.
+        Returns the entry dropped by the ring buffer (if any).
+        """
+        entries = self.entries
+        dropped = entries[0] if entries.maxlen is not None and len(entries) == entries.maxlen else None
+        entries.append(record)
+
+        # entry that just left the window (older than SIGNAL_WINDOW or dropped by the ring)
+        n = len(entries)
+        leaving = entries[n - SIGNAL_WINDOW - 1] if n > SIGNAL_WINDOW else dropped
+
+        sig = self.signals
+        low, stall, blocked = _contrib(record)
+        low += sig.low_signal
+        stall += sig.stall_risk
+        blocked += sig.blocked
+        if leaving is not None:
+            a, b, c = _contrib(leaving)
+            low -= a
+            stall -= b
+            blocked -= c
+
+        window = [entries[i] for i in range(max(0, n - SIGNAL_WINDOW), n)]
+        self.signals = _with_window(window, low, stall, blocked)
+        return dropped
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# -------------------------------------------------
+# LIMITS (0 = unlimited)
+# -------------------------------------------------
+_LIMITS: Dict[str, float] = {
+    "max_users": _env_int("MIRABASE_STM_MAX_USERS", 0),
+    "max_entries": _env_int("MIRABASE_STM_MAX_ENTRIES", 0),
+    "max_bytes": _env_int("MIRABASE_STM_MAX_BYTES", 0),
+    "idle_ttl": _env_int("MIRABASE_STM_IDLE_TTL", 0),
+}
+
+# In-memory store: user_id -> bucket, least recently used first
+_STM: "OrderedDict[str, _Bucket]" = OrderedDict()
+_LOCK = threading.Lock()
+_TOTALS = {"entries": 0, "bytes": 0, "evictions": 0, "expirations": 0}
+
+
+def _capacity(limit: Any) -> Optional[int]:
+    # non-positive / non-int limit = no trim (legacy behaviour)
+    if isinstance(limit, int) and limit > 0:
+        return limit
+    return None
+
+
+def _drop(user_id: str) -> None:
+    bucket = _STM.pop(user_id)
+    _TOTALS["entries"] -= len(bucket.entries)
+    _TOTALS["bytes"] -= bucket.nbytes
+
+
+def _expired(bucket: _Bucket, now: float) -> bool:
+    ttl = _LIMITS["idle_ttl"]
+    return ttl > 0 and now - bucket.touched > ttl
+
+
+def _over_budget() -> bool:
+    max_users = _LIMITS["max_users"]
+    max_entries = _LIMITS["max_entries"]
+    max_bytes = _LIMITS["max_bytes"]
+    return (
+        (max_users > 0 and len(_STM) > max_users)
+        or (max_entries > 0 and _TOTALS["entries"] > max_entries)
+        or (max_bytes > 0 and _TOTALS["bytes"] > max_bytes)
+    )
+
+
+def _evict(now: float, keep: str) -> None:
+    """
+    Walks from the least recently used end only -> O(evicted), not O(users).
+    """
+    while _STM:
+        user_id, bucket = next(iter(_STM.items()))
+        if user_id == keep:
+            return
+        if _expired(bucket, now):
+            _drop(user_id)
+            _TOTALS["expirations"] += 1
+        elif _over_budget():
+            _drop(user_id)
+            _TOTALS["evictions"] += 1
+        else:
+            return
 
 
 # -------------------------------------------------
 # PUBLIC API
 # -------------------------------------------------
+def configure(
+    *,
+    max_users: Optional[int] = None,
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    idle_ttl: Optional[float] = None,
+) -> None:
+    """
+    Global STM budget. 0 disables a limit. Applied on the next write.
+    """
+    for key, value in (
+        ("max_users", max_users),
+        ("max_entries", max_entries),
+        ("max_bytes", max_bytes),
+        ("idle_ttl", idle_ttl),
+    ):
+        if value is not None:
+            _LIMITS[key] = value
+
+
+def stats() -> Dict[str, int]:
+    return {
+        "resident_users": len(_STM),
+        "resident_entries": _TOTALS["entries"],
+        "approx_bytes": _TOTALS["bytes"],
+        "evictions": _TOTALS["evictions"],
+        "expirations": _TOTALS["expirations"],
+    }
+
+
 def clear_all() -> None:
-    _STM.clear()
+    with _LOCK:
+        _STM.clear()
+        _TOTALS["entries"] = 0
+        _TOTALS["bytes"] = 0
 
 
 def clear_user(user_id: str) -> None:
-    if user_id in _STM:
-        _STM[user_id] = []
+    with _LOCK:
+        bucket = _STM.get(user_id)
+        if bucket is not None:
+            _TOTALS["entries"] -= len(bucket.entries)
+            _TOTALS["bytes"] -= bucket.nbytes
+            bucket.entries.clear()
+            bucket.nbytes = 0
+            bucket.signals = EMPTY_SIGNALS
 
 
 def append_entry(entry: Dict[str, Any], limit: int = 10) -> None:
     """
     Appends a single STM entry for a user.
-    Enforces FIFO with fixed limit.
+    Enforces FIFO with fixed limit (ring buffer drops the oldest).
+    Idle / over-budget users are evicted from the LRU end.
     """
     user_id = entry.get("user_id")
     if not isinstance(user_id, str) or not user_id:
         return
 
+    record = entry if isinstance(entry, STMEntry) else STMEntry(entry)
+    size = _approx_size(record)
+    capacity = _capacity(limit)
+    now = time.monotonic()
+
+    with _LOCK:
+        bucket = _STM.get(user_id)
+        if bucket is None or _expired(bucket, now):
+            if bucket is not None:
+                _drop(user_id)
+                _TOTALS["expirations"] += 1
+            bucket = _Bucket(capacity)
+            _STM[user_id] = bucket
+        else:
+            _STM.move_to_end(user_id)
+            if bucket.entries.maxlen != capacity:
+                # limit changed between calls -> re-size once, keep newest entries
+                kept = deque(bucket.entries, maxlen=capacity)
+                for old in list(bucket.entries)[: len(bucket.entries) - len(kept)]:
+                    old_size = _approx_size(old)
+                    bucket.nbytes -= old_size
+                    _TOTALS["bytes"] -= old_size
+                    _TOTALS["entries"] -= 1
+                bucket.entries = kept
+                bucket.signals = summarize(list(kept))
+
+        dropped = bucket.push(record)
+        if dropped is not None:
+            old_size = _approx_size(dropped)
+            bucket.nbytes -= old_size
+            _TOTALS["bytes"] -= old_size
+            _TOTALS["entries"] -= 1
+
+        bucket.nbytes += size
+        bucket.touched = now
+        _TOTALS["bytes"] += size
+        _TOTALS["entries"] += 1
+
+        _evict(now, keep=user_id)
+
+
+def _touch(user_id: str) -> Optional[_Bucket]:
+    # caller holds _LOCK
     bucket = _STM.get(user_id)
-    if not isinstance(bucket, list):
-        bucket = []
+    if bucket is None:
+        return None
 
-    bucket.append(entry)
+    now = time.monotonic()
+    if _expired(bucket, now):
+        _drop(user_id)
+        _TOTALS["expirations"] += 1
+        return None
+
+    bucket.touched = now
+    _STM.move_to_end(user_id)
+    return bucket
 
-    # FIFO trim
-    if isinstance(limit, int) and limit > 0:
-        excess = len(bucket) - limit
-        if excess > 0:
-            bucket = bucket[excess:]
 
-    _STM[user_id] = bucket
+def get_signals(user_id: str) -> WindowSignals:
+    """
+    Precomputed aggregates over the user's last SIGNAL_WINDOW entries. O(1).
+    """
+    if not isinstance(user_id, str) or not user_id:
+        return EMPTY_SIGNALS
 
+    with _LOCK:
+        bucket = _touch(user_id)
+        return bucket.signals if bucket is not None else EMPTY_SIGNALS
 
-def get_last(user_id: str, n: int) -> List[Dict[str, Any]]:
+
+def get_last(user_id: str, n: int) -> List[STMEntry]:
     """
     Returns last n entries for user (chronological order).
     """
     if not isinstance(user_id, str) or not user_id:
         return []
 
-    bucket = _STM.get(user_id)
-    if not isinstance(bucket, list) or not bucket:
-        return []
-
     if not isinstance(n, int) or n <= 0:
         return []
 
-    return bucket[-n:]
+    with _LOCK:
+        bucket = _touch(user_id)
+        if bucket is None:
+            return []
+
+        entries = bucket.entries
+        size = len(entries)
+        if n >= size:
+            return list(entries)
+        return [entries[i] for i in range(size - n, size)]
@@ -0,0 +1,175 @@
+# storage/backend.py
+# ==================
+# Storage Interface
+# ==================
+# - one interface for LTM, user profiles and the execution log
+# - backend chosen by configuration:
+#     MIRABASE_STORAGE=json   (default; files next to the app)
+#     MIRABASE_STORAGE=sqlite (MIRABASE_SQLITE_PATH, default mirabase.db)
+#     MIRABASE_WRITE_BEHIND=1 (buffer fact/profile writes, see storage.write_behind)
+# - ltm.py / action/profile_store.py / action/execution_log.py route through get_storage()
+
+from __future__ import annotations
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+
+
+class StorageBackend(ABC):
+    name = "abstract"
+
+    # ---------- LTM ----------
+    @abstractmethod
+    def load_user_ltm(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """User facts, or None if the user has none."""
+
+    @abstractmethod
+    def load_ltm_document(self) -> Dict[str, Any]:
+        """Full legacy document: {"ltm": {user_id: {...}}, ...other keys}."""
+
+    @abstractmethod
+    def save_ltm_document(self, data: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def upsert_fact(self, user_id: str, key: str, value: Any) -> None:
+        ...
+
+    def upsert_facts(self, user_id: str, facts: Dict[str, Any]) -> None:
+        """Several facts of one user; backends may write them in one go."""
+        for key, value in facts.items():
+            self.upsert_fact(user_id, key, value)
+
+    # ---------- PROFILES ----------
+    # profile_stamp(): cheap version token (changes with every write), None if
+    # the profile does not exist. Backends without one leave
+    # profile_stamps=False and readers must not cache.
+    profile_stamps = False
+
+    def profile_stamp(self, user_id: str) -> Optional[Hashable]:
+        return None
+
+    @abstractmethod
+    def load_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Profile dict, or None if the user has no profile."""
+
+    @abstractmethod
+    def save_profile(self, user_id: str, profile: Dict[str, Any]) -> None:
+        ...
+
+    def update_profile(
+        self, user_id: str, mutate: Callable[[Dict[str, Any]], None]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Read-modify-write of one profile; None if the user has no profile.
+        Backends make it atomic against concurrent writers.
+        """
+        profile = self.load_profile(user_id)
+        if profile is None:
+            return None
+        mutate(profile)
+        self.save_profile(user_id, profile)
+        return profile
+
+    # ---------- EXECUTION LOG ----------
+    @abstractmethod
+    def append_log(self, record: Dict[str, Any]) -> None:
+        ...
+
+    def append_logs(self, records: List[Dict[str, Any]]) -> None:
+        """Several records in order; backends write them in one go."""
+        for record in records:
+            self.append_log(record)
+
+    @abstractmethod
+    def find_log_result(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Result of the first record with this request_id."""
+
+    @abstractmethod
+    def count_user_actions_since(self, user_id: str, since_ts: float) -> int:
+        ...
+
+    @abstractmethod
+    def query_log(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        *,
+        user_id: Optional[str] = None,
+        action_type: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Records with since <= ts <= until (bounds optional), oldest first."""
+
+    def close(self) -> None:
+        pass
+
+
+# -------------------------------------------------
+# CONFIGURED INSTANCE
+# -------------------------------------------------
+_STORAGE: Optional[StorageBackend] = None
+_LOCK = threading.Lock()
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _base_from_config() -> StorageBackend:
+    kind = os.getenv("MIRABASE_STORAGE", "json").strip().lower()
+    if kind == "sqlite":
+        from storage.sqlite_backend import SqliteStorage
+
+        return SqliteStorage(os.getenv("MIRABASE_SQLITE_PATH", "mirabase.db"))
+    if kind not in ("", "json"):
+        raise RuntimeError(f"Unknown MIRABASE_STORAGE: {kind}")
+
+    from storage.json_backend import JsonStorage
+
+    return JsonStorage()
+
+
+def _from_config() -> StorageBackend:
+    store = _base_from_config()
+    if not _env_flag("MIRABASE_WRITE_BEHIND"):
+        return store
+
+    from storage.write_behind import WriteBehindStorage
+
+    return WriteBehindStorage(
+        store,
+        interval=float(os.getenv("MIRABASE_WRITE_BEHIND_INTERVAL", "1.0")),
+        max_pending=int(os.getenv("MIRABASE_WRITE_BEHIND_MAX", "256")),
+    )
+
+
+def flush_storage() -> None:
+    """Push buffered writes of the active backend (no-op without write-behind)."""
+    store = _STORAGE
+    flush = getattr(store, "flush", None)
+    if callable(flush):
+        flush()
+
+
+def get_storage() -> StorageBackend:
+    global _STORAGE
+    store = _STORAGE
+    if store is None:
+        with _LOCK:
+            if _STORAGE is None:
+                _STORAGE = _from_config()
+            store = _STORAGE
+    return store
+
+
+def set_storage(store: Optional[StorageBackend]) -> None:
+    """
+    Swap the active backend (tests, tools). None -> re-read configuration.
+    """
+    global _STORAGE
+    with _LOCK:
+        old, _STORAGE = _STORAGE, store
+    if old is not None and old is not store:
+        old.close()
@@ -0,0 +1,175 @@
+# storage/files.py
+# ================
+# File Persistence Helpers
+# ================
+# - atomic JSON writes: unique temp file in the target dir + fsync + os.replace
+#   (readers see the old or the new file, never a truncated one)
+# - advisory locks that also work across processes (uvicorn --workers N):
+#     file_lock("profile:<user_id>") -> one of MIRABASE_LOCK_STRIPES lock files
+#   different users land on different stripes, so their writers do not
+#   serialize behind each other (collisions only cost some waiting)
+# - reentrant per thread; fcntl.flock on POSIX, in-process lock elsewhere
+#
+# Lock order (avoid deadlocks): document lock before user locks, and never
+# hold two user locks at the same time.
+
+from __future__ import annotations
+
+import json
+import os
+import stat
+import tempfile
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+
+try:
+    import fcntl  # POSIX
+except Exception:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+LOCK_DIR = Path(os.getenv("MIRABASE_LOCK_DIR", ".mirabase_locks"))
+LOCK_STRIPES = max(1, int(os.getenv("MIRABASE_LOCK_STRIPES", "64")))
+
+# read once: os.umask() can only be queried by setting it (process-wide)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+# -------------------------------------------------
+# ATOMIC WRITES
+# -------------------------------------------------
+def _target_mode(path: Path) -> int:
+    # mkstemp creates 0600; keep the mode of the file being replaced, or
+    # what a plain open() would have given a new one
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write_text(path: Path, text: str, *, fsync: bool = True) -> None:
+    atomic_write_bytes(path, text.encode("utf-8"), fsync=fsync)
+
+
+def atomic_write_bytes(path: Path, data: bytes, *, fsync: bool = True) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # unique name: concurrent writers never share (and clobber) a temp file
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if hasattr(os, "fchmod"):
+                os.fchmod(f.fileno(), _target_mode(path))
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(
+    path: Path,
+    data: Any,
+    *,
+    indent: Optional[int] = 2,
+    trailing_newline: bool = False,
+    fsync: bool = True,
+) -> None:
+    text = json.dumps(data, ensure_ascii=False, indent=indent)
+    if trailing_newline:
+        text += "\n"
+    atomic_write_text(path, text, fsync=fsync)
+
+
+def append_line(path: Path, line: str) -> int:
+    """
+    One O_APPEND write per record: concurrent appenders (threads or
+    processes) never interleave inside a line. Returns the byte offset
+    the line was written at.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = (line if line.endswith("\n") else line + "\n").encode("utf-8")
+
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+        return os.lseek(fd, 0, os.SEEK_CUR) - len(data)
+    finally:
+        os.close(fd)
+
+
+# -------------------------------------------------
+# STRIPED ADVISORY LOCKS
+# -------------------------------------------------
+class _Stripe:
+    __slots__ = ("index", "lock", "fd", "pid", "depth")
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.lock = threading.RLock()
+        self.fd: Optional[int] = None
+        self.pid = 0
+        self.depth = 0
+
+    def _open(self) -> Optional[int]:
+        if fcntl is None:
+            return None
+        # after fork the inherited fd would share its lock with the parent
+        if self.fd is None or self.pid != os.getpid():
+            LOCK_DIR.mkdir(parents=True, exist_ok=True)
+            self.fd = os.open(LOCK_DIR / f"stripe-{self.index:03d}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            self.pid = os.getpid()
+        return self.fd
+
+    def acquire(self) -> None:
+        self.lock.acquire()
+        try:
+            if self.depth == 0:
+                fd = self._open()
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+            self.depth += 1
+        except BaseException:
+            self.lock.release()
+            raise
+
+    def release(self) -> None:
+        try:
+            self.depth -= 1
+            if self.depth == 0 and self.fd is not None and fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+        finally:
+            self.lock.release()
+
+
+_STRIPES: List[_Stripe] = [_Stripe(i) for i in range(LOCK_STRIPES)]
+
+
+def stripe_of(name: str) -> int:
+    # stable across processes (hash() is salted per interpreter)
+    return zlib.crc32(name.encode("utf-8")) % LOCK_STRIPES
+
+
+@contextmanager
+def file_lock(name: str) -> Iterator[None]:
+    stripe = _STRIPES[stripe_of(name)]
+    stripe.acquire()
+    try:
+        yield
+    finally:
+        stripe.release()
+
@@ -0,0 +1,102 @@
+# storage/json_backend.py
+# =======================
+# JSON Storage (default)
+# =======================
+# - the original file layout: memory.json (+ optional shards),
+#   users/<user_id>/profile.json, execution_log.jsonl
+# - delegates to the file implementations in ltm / action.profile_store /
+#   action.execution_log so the on-disk format stays defined in one place
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+
+from storage.backend import StorageBackend
+
+
+class JsonStorage(StorageBackend):
+    name = "json"
+
+    # ---------- LTM ----------
+    def load_user_ltm(self, user_id: str) -> Optional[Dict[str, Any]]:
+        import ltm
+
+        return ltm._json_load_user(user_id)
+
+    def load_ltm_document(self) -> Dict[str, Any]:
+        import ltm
+
+        return ltm._json_load_document()
+
+    def save_ltm_document(self, data: Dict[str, Any]) -> None:
+        import ltm
+
+        ltm._json_save_document(data)
+
+    def upsert_fact(self, user_id: str, key: str, value: Any) -> None:
+        import ltm
+
+        ltm._json_upsert_fact(user_id, key, value)
+
+    def upsert_facts(self, user_id: str, facts: Dict[str, Any]) -> None:
+        import ltm
+
+        ltm._json_upsert_facts(user_id, facts)
+
+    # ---------- PROFILES ----------
+    profile_stamps = True
+
+    def profile_stamp(self, user_id: str) -> Optional[Hashable]:
+        from action import profile_store
+
+        return profile_store._json_profile_stamp(user_id)
+
+    def load_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        from action import profile_store
+
+        return profile_store._json_load_profile(user_id)
+
+    def save_profile(self, user_id: str, profile: Dict[str, Any]) -> None:
+        from action import profile_store
+
+        profile_store._json_save_profile(user_id, profile)
+
+    def update_profile(
+        self, user_id: str, mutate: Callable[[Dict[str, Any]], None]
+    ) -> Optional[Dict[str, Any]]:
+        from action import profile_store
+
+        return profile_store._json_update_profile(user_id, mutate)
+
+    # ---------- EXECUTION LOG ----------
+    def append_log(self, record: Dict[str, Any]) -> None:
+        from action import execution_log
+
+        execution_log._json_append(record)
+
+    def append_logs(self, records: List[Dict[str, Any]]) -> None:
+        from action import execution_log
+
+        execution_log._json_append_many(records)
+
+    def find_log_result(self, request_id: str) -> Optional[Dict[str, Any]]:
+        from action import execution_log
+
+        return execution_log._json_find_result(request_id)
+
+    def count_user_actions_since(self, user_id: str, since_ts: float) -> int:
+        from action import execution_log
+
+        return execution_log._json_count_since(user_id, since_ts)
+
+    def query_log(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        *,
+        user_id: Optional[str] = None,
+        action_type: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        from action import execution_log
+
+        return execution_log._json_query(since, until, user_id, action_type)
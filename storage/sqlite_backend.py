@@ -0,0 +1,344 @@
+# storage/sqlite_backend.py
+# =========================
+# SQLite Storage (WAL)
+# =========================
+# - one database file for LTM facts, profiles and the execution log
+# - WAL journal: readers never block the single writer, appends are cheap
+# - indexed lookups instead of full-file scans:
+#     execution_log(request_id), execution_log(user_id, ts)
+# - one connection per thread (sqlite3 connections are not shareable by default)
+#
+# Switch on with MIRABASE_STORAGE=sqlite (MIRABASE_SQLITE_PATH=mirabase.db).
+# Existing JSON data: SqliteStorage(path).import_json()
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+
+from storage.backend import StorageBackend
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ltm_facts (
+    user_id TEXT NOT NULL,
+    key     TEXT NOT NULL,
+    value   TEXT NOT NULL,
+    PRIMARY KEY (user_id, key)
+);
+CREATE TABLE IF NOT EXISTS ltm_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id    TEXT PRIMARY KEY,
+    data       TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS execution_log (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts          REAL,
+    time        TEXT,
+    user_id     TEXT,
+    request_id  TEXT,
+    trace_id    TEXT,
+    action_type TEXT,
+    result      TEXT,
+    record      TEXT NOT NULL,
+    phase       TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_log_request ON execution_log (request_id);
+CREATE INDEX IF NOT EXISTS ix_log_user_ts ON execution_log (user_id, ts);
+CREATE INDEX IF NOT EXISTS ix_log_ts ON execution_log (ts);
+"""
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+class SqliteStorage(StorageBackend):
+    name = "sqlite"
+
+    def __init__(self, path: str = "mirabase.db", *, busy_timeout_ms: int = 5000) -> None:
+        self.path = str(path)
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        # databases created before async actions: add the phase column
+        if "phase" not in {row[1] for row in conn.execute("PRAGMA table_info(execution_log)")}:
+            conn.execute("ALTER TABLE execution_log ADD COLUMN phase TEXT")
+
+    # -------------------------------------------------
+    # CONNECTIONS
+    # -------------------------------------------------
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def close(self) -> None:
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+    # -------------------------------------------------
+    # LTM
+    # -------------------------------------------------
+    def load_user_ltm(self, user_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT key, value FROM ltm_facts WHERE user_id = ?", (user_id,)
+        ).fetchall()
+        if not rows:
+            return None
+        return {k: json.loads(v) for k, v in rows}
+
+    def load_ltm_document(self) -> Dict[str, Any]:
+        conn = self._conn()
+        data: Dict[str, Any] = {k: json.loads(v) for k, v in conn.execute("SELECT key, value FROM ltm_meta")}
+
+        ltm: Dict[str, Dict[str, Any]] = {}
+        for user_id, key, value in conn.execute("SELECT user_id, key, value FROM ltm_facts ORDER BY user_id"):
+            ltm.setdefault(user_id, {})[key] = json.loads(value)
+        data["ltm"] = ltm
+        return data
+
+    def save_ltm_document(self, data: Dict[str, Any]) -> None:
+        ltm = data.get("ltm")
+        facts = [
+            (user_id, key, _dumps(value))
+            for user_id, user in (ltm.items() if isinstance(ltm, dict) else ())
+            if isinstance(user, dict)
+            for key, value in user.items()
+        ]
+        meta = [(k, _dumps(v)) for k, v in data.items() if k != "ltm"]
+
+        conn = self._conn()
+        with _transaction(conn):
+            conn.execute("DELETE FROM ltm_facts")
+            conn.execute("DELETE FROM ltm_meta")
+            conn.executemany("INSERT INTO ltm_facts (user_id, key, value) VALUES (?, ?, ?)", facts)
+            conn.executemany("INSERT INTO ltm_meta (key, value) VALUES (?, ?)", meta)
+
+    def upsert_fact(self, user_id: str, key: str, value: Any) -> None:
+        self.upsert_facts(user_id, {key: value})
+
+    def upsert_facts(self, user_id: str, facts: Dict[str, Any]) -> None:
+        conn = self._conn()
+        with _transaction(conn):
+            conn.executemany(
+                "INSERT INTO ltm_facts (user_id, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id, key) DO UPDATE SET value = excluded.value",
+                [(user_id, key, _dumps(value)) for key, value in facts.items()],
+            )
+
+    # -------------------------------------------------
+    # PROFILES
+    # -------------------------------------------------
+    profile_stamps = True
+
+    def profile_stamp(self, user_id: str) -> Optional[Hashable]:
+        # primary-key lookup, no JSON decode
+        row = self._conn().execute(
+            "SELECT updated_at, length(data) FROM profiles WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def load_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT data FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_profile(self, user_id: str, profile: Dict[str, Any]) -> None:
+        self._conn().execute(
+            "INSERT INTO profiles (user_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (user_id, _dumps(profile), time.time()),
+        )
+
+    def update_profile(
+        self, user_id: str, mutate: Callable[[Dict[str, Any]], None]
+    ) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        with _transaction(conn):
+            profile = self.load_profile(user_id)
+            if profile is None:
+                return None
+            mutate(profile)
+            self.save_profile(user_id, profile)
+        return profile
+
+    # -------------------------------------------------
+    # EXECUTION LOG
+    # -------------------------------------------------
+    def append_log(self, record: Dict[str, Any]) -> None:
+        self._insert_logs(self._conn(), [record])
+
+    def append_logs(self, records: List[Dict[str, Any]]) -> None:
+        conn = self._conn()
+        with _transaction(conn):
+            self._insert_logs(conn, records)
+
+    def find_log_result(self, request_id: str) -> Optional[Dict[str, Any]]:
+        # first record wins, a "final" one over "pending" (same semantics as the jsonl index)
+        row = self._conn().execute(
+            "SELECT result FROM execution_log WHERE request_id = ? "
+            "ORDER BY phase IS 'pending', id LIMIT 1",
+            (request_id,),
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def count_user_actions_since(self, user_id: str, since_ts: float) -> int:
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM execution_log WHERE user_id = ? AND ts >= ? AND (phase IS NULL OR phase != 'final')",
+            (user_id, since_ts),
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def query_log(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        *,
+        user_id: Optional[str] = None,
+        action_type: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        # range on the ts / (user_id, ts) indexes, rows streamed from the cursor
+        where: List[str] = []
+        args: List[Any] = []
+        for clause, value in (
+            ("ts >= ?", since),
+            ("ts <= ?", until),
+            ("user_id = ?", user_id),
+            ("action_type = ?", action_type),
+        ):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        sql = "SELECT record FROM execution_log"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        for (record,) in self._conn().execute(sql + " ORDER BY id", args):
+            try:
+                yield json.loads(record)
+            except (TypeError, ValueError):
+                continue
+
+    @staticmethod
+    def _insert_logs(conn: sqlite3.Connection, records: List[Dict[str, Any]]) -> None:
+        rows = []
+        for rec in records:
+            ts = rec.get("ts")
+            result = rec.get("result")
+            rows.append(
+                (
+                    ts if isinstance(ts, (int, float)) else None,
+                    rec.get("time"),
+                    rec.get("user_id"),
+                    rec.get("request_id"),
+                    rec.get("trace_id"),
+                    rec.get("action_type"),
+                    _dumps(result) if result is not None else None,
+                    _dumps(rec),
+                    rec.get("phase"),
+                )
+            )
+        conn.executemany(
+            "INSERT INTO execution_log (ts, time, user_id, request_id, trace_id, action_type, result, record, phase) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    # -------------------------------------------------
+    # ONE-OFF IMPORT (json files -> sqlite)
+    # -------------------------------------------------
+    def import_json(
+        self,
+        memory_file: str = "memory.json",
+        users_dir: str = "users",
+    ) -> Dict[str, int]:
+        """
+        Copies the JSON layout into this database (LTM replaced, profiles
+        upserted, log records appended). Returns counts per area.
+        """
+        counts = {"ltm_users": 0, "profiles": 0, "log_records": 0}
+
+        memory = Path(memory_file)
+        if memory.exists():
+            with memory.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                data = dict(data)
+                ltm = dict(data.get("ltm") or {}) if isinstance(data.get("ltm"), dict) else {}
+                # sharded layout: users/<user_id>/ltm.json
+                for shard in sorted(Path(users_dir).glob("*/ltm.json")):
+                    try:
+                        with shard.open("r", encoding="utf-8") as f:
+                            facts = json.load(f)
+                    except Exception:
+                        continue
+                    if isinstance(facts, dict):
+                        ltm[shard.parent.name] = {**ltm.get(shard.parent.name, {}), **facts}
+                data["ltm"] = ltm
+                self.save_ltm_document(data)
+                counts["ltm_users"] = len(ltm)
+
+        for path in sorted(Path(users_dir).glob("*/profile.json")):
+            try:
+                with path.open("r", encoding="utf-8") as f:
+                    profile = json.load(f)
+            except Exception:
+                continue
+            if isinstance(profile, dict):
+                self.save_profile(path.parent.name, profile)
+                counts["profiles"] += 1
+
+        # execution log: all segments (rotated + active) of the JSON log
+        from action.log_segments import iter_records
+
+        records = list(iter_records())
+        if records:
+            conn = self._conn()
+            with _transaction(conn):
+                self._insert_logs(conn, records)
+            counts["log_records"] = len(records)
+
+        return counts
+
+
+class _transaction:
+    """BEGIN IMMEDIATE ... COMMIT / ROLLBACK on an autocommit connection."""
+
+    __slots__ = ("conn",)
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.conn.execute("ROLLBACK" if exc_type is not None else "COMMIT")
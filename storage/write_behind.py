@@ -0,0 +1,250 @@
+# storage/write_behind.py
+# =======================
+# Write-Behind Storage (optional)
+# =======================
+# - wraps another backend; personal facts and profile saves are buffered
+#   in memory and return immediately (no disk latency on the turn)
+# - repeated writes coalesce: last value per (user, key) / per profile
+# - background thread flushes every MIRABASE_WRITE_BEHIND_INTERVAL seconds
+#   or as soon as MIRABASE_WRITE_BEHIND_MAX writes are pending
+# - reads see pending writes (read-your-writes)
+# - flush() / close() / interpreter exit write everything out
+#
+# Switch on with MIRABASE_WRITE_BEHIND=1 (any MIRABASE_STORAGE).
+# Execution-log writes stay synchronous (idempotence depends on them).
+
+from __future__ import annotations
+
+import atexit
+import copy
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+from storage.backend import StorageBackend
+
+
+class WriteBehindStorage(StorageBackend):
+    def __init__(self, inner: StorageBackend, *, interval: float = 1.0, max_pending: int = 256) -> None:
+        self.inner = inner
+        self.name = f"write-behind:{inner.name}"
+        self.interval = max(0.01, float(interval))
+        self.max_pending = max(1, int(max_pending))
+
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+
+        # pending = accepted, not yet handed to inner
+        # flushing = handed to inner, write in progress (still visible to reads)
+        self._facts: Dict[str, Dict[str, Any]] = {}
+        # profiles are buffered as (seq, snapshot); seq doubles as version stamp
+        self._profiles: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._flushing_facts: Dict[str, Dict[str, Any]] = {}
+        self._flushing_profiles: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._pending = 0
+        self._seq = 0
+
+        self._thread = threading.Thread(target=self._run, name="mirabase-write-behind", daemon=True)
+        self._thread.start()
+
+        # durable flush on shutdown (weakref: do not keep a swapped-out store alive)
+        ref = weakref.ref(self)
+        self._atexit = lambda: (ref() and ref().close())
+        atexit.register(self._atexit)
+
+    # -------------------------------------------------
+    # BACKGROUND FLUSH
+    # -------------------------------------------------
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # failed batch was re-queued; retry on the next tick
+                pass
+
+    def _note_write(self) -> None:
+        # caller holds self._lock
+        self._pending += 1
+        if self._pending >= self.max_pending:
+            self._wake.set()
+
+    def flush(self) -> None:
+        """Writes all pending mutations to the wrapped backend."""
+        with self._flush_lock:
+            with self._lock:
+                facts, self._facts = self._facts, {}
+                profiles, self._profiles = self._profiles, {}
+                self._flushing_facts, self._flushing_profiles = facts, profiles
+                self._pending = 0
+
+            # facts / profiles are published as _flushing_* (readers iterate
+            # them): never modified here, only swapped out below
+            done: Set[Tuple[str, str]] = set()
+            try:
+                for user_id, user_facts in facts.items():
+                    self.inner.upsert_facts(user_id, user_facts)
+                    done.add(("fact", user_id))
+                for user_id, (_, profile) in profiles.items():
+                    self.inner.save_profile(user_id, profile)
+                    done.add(("profile", user_id))
+            except Exception:
+                # re-queue what did not make it; newer pending writes win
+                with self._lock:
+                    for user_id, user_facts in facts.items():
+                        if ("fact", user_id) not in done:
+                            self._facts[user_id] = {**user_facts, **self._facts.get(user_id, {})}
+                            self._pending += 1
+                    for user_id, buffered in profiles.items():
+                        if ("profile", user_id) not in done:
+                            self._profiles.setdefault(user_id, buffered)
+                            self._pending += 1
+                raise
+            finally:
+                with self._lock:
+                    self._flushing_facts, self._flushing_profiles = {}, {}
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(f) for f in self._facts.values()) + len(self._profiles)
+
+    def close(self) -> None:
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=max(1.0, self.interval * 2))
+        try:
+            self.flush()
+        finally:
+            atexit.unregister(self._atexit)
+            self.inner.close()
+
+    # -------------------------------------------------
+    # LTM
+    # -------------------------------------------------
+    def _overlay_facts(self, user_id: str) -> Dict[str, Any]:
+        # caller holds self._lock
+        flushing = self._flushing_facts.get(user_id)
+        pending = self._facts.get(user_id)
+        if flushing and pending:
+            return {**flushing, **pending}
+        return dict(pending or flushing or {})
+
+    def load_user_ltm(self, user_id: str) -> Optional[Dict[str, Any]]:
+        # overlay first: a flush finishing in between then shows up in base
+        with self._lock:
+            overlay = self._overlay_facts(user_id)
+        base = self.inner.load_user_ltm(user_id)
+        if not overlay:
+            return base
+        return {**(base or {}), **overlay}
+
+    def load_ltm_document(self) -> Dict[str, Any]:
+        with self._lock:
+            users = set(self._facts) | set(self._flushing_facts)
+            overlays = {user_id: self._overlay_facts(user_id) for user_id in users}
+        data = self.inner.load_ltm_document()
+        if not overlays:
+            return data
+
+        ltm = dict(data.get("ltm") or {}) if isinstance(data.get("ltm"), dict) else {}
+        for user_id, facts in overlays.items():
+            ltm[user_id] = {**(ltm.get(user_id) or {}), **facts}
+        full = dict(data)
+        full["ltm"] = ltm
+        return full
+
+    def save_ltm_document(self, data: Dict[str, Any]) -> None:
+        # full rewrite: pending facts must not land on top of it afterwards
+        self.flush()
+        self.inner.save_ltm_document(data)
+
+    def upsert_fact(self, user_id: str, key: str, value: Any) -> None:
+        with self._lock:
+            self._facts.setdefault(user_id, {})[key] = value
+            self._note_write()
+
+    def upsert_facts(self, user_id: str, facts: Dict[str, Any]) -> None:
+        with self._lock:
+            self._facts.setdefault(user_id, {}).update(facts)
+            self._note_write()
+
+    # -------------------------------------------------
+    # PROFILES
+    # -------------------------------------------------
+    @property
+    def profile_stamps(self) -> bool:  # type: ignore[override]
+        return self.inner.profile_stamps
+
+    def _buffered_profile(self, user_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        # caller holds self._lock
+        buffered = self._profiles.get(user_id)
+        if buffered is None:
+            buffered = self._flushing_profiles.get(user_id)
+        return buffered
+
+    def profile_stamp(self, user_id: str) -> Optional[Hashable]:
+        with self._lock:
+            buffered = self._buffered_profile(user_id)
+        if buffered is not None:
+            return ("pending", buffered[0])
+        return self.inner.profile_stamp(user_id)
+
+    def load_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            buffered = self._buffered_profile(user_id)
+            if buffered is not None:
+                # callers mutate and save back; never hand out the buffered dict
+                return copy.deepcopy(buffered[1])
+        return self.inner.load_profile(user_id)
+
+    def save_profile(self, user_id: str, profile: Dict[str, Any]) -> None:
+        snapshot = copy.deepcopy(profile)
+        with self._lock:
+            self._seq += 1
+            self._profiles[user_id] = (self._seq, snapshot)
+            self._note_write()
+
+    def update_profile(
+        self, user_id: str, mutate: Callable[[Dict[str, Any]], None]
+    ) -> Optional[Dict[str, Any]]:
+        # buffered: serialized in this process, not across processes
+        with self._update_lock:
+            profile = self.load_profile(user_id)
+            if profile is None:
+                return None
+            mutate(profile)
+            self.save_profile(user_id, profile)
+            return profile
+
+    # -------------------------------------------------
+    # EXECUTION LOG (pass-through)
+    # -------------------------------------------------
+    def append_log(self, record: Dict[str, Any]) -> None:
+        self.inner.append_log(record)
+
+    def append_logs(self, records: List[Dict[str, Any]]) -> None:
+        self.inner.append_logs(records)
+
+    def find_log_result(self, request_id: str) -> Optional[Dict[str, Any]]:
+        return self.inner.find_log_result(request_id)
+
+    def count_user_actions_since(self, user_id: str, since_ts: float) -> int:
+        return self.inner.count_user_actions_since(user_id, since_ts)
+
+    def query_log(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        *,
+        user_id: Optional[str] = None,
+        action_type: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        return self.inner.query_log(since, until, user_id=user_id, action_type=action_type)
@@ -7,7 +7,24 @@
 # - verify Brain → Contract → Execution wiring
 # - protect against regressions
 # - validate FACT expansions (TIME, DATE, DAY, ARITHMETIC)
+# - concurrency / storage checks for the action layer, the execution log
+#   and the caches (RACE_CHECKS below; one interpreter + temp dir each)
 #
+# Usage:
+#   python test_suite.py                  -> golden tests, then all checks
+#   python test_suite.py --check NAME     -> one check in the current dir
+#
+
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
 
 import logic
 import execution_layer
@@ -104,5 +121,1281 @@ def run_tests():
     print(f"\nRESULT: {passed}/{len(GOLDEN_TESTS)} tests passed\n")
 
 
+# =========================
+# CONCURRENCY / STORAGE CHECKS
+# =========================
+#
+# - every check runs in a fresh interpreter inside an empty temp dir:
+#   users/, memory.json, execution_log.* and the lock files are relative
+#   paths, module caches and MIRABASE_* settings start clean
+# - a check passes when it returns (plain asserts)
+# - randomized checks use fixed seeds
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _profile(user_id, **access):
+    from action.profile_store import save_profile_atomic
+
+    rules = {"allowed_actions": ["*"], "denied_actions": [], "daily_limit": -1}
+    rules.update(access)
+    save_profile_atomic(
+        user_id,
+        {"user_id": user_id, "identity": {"status": "active"}, "access": rules, "temporal": None},
+    )
+
+
+def _ok(message):
+    return {"status": "success", "message": message, "payload": {}, "retryable": False}
+
+
+def _join(threads, timeout=30.0):
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + timeout
+    for t in threads:
+        t.join(max(0.0, deadline - time.monotonic()))
+    assert not any(t.is_alive() for t in threads), "threads still running (deadlock?)"
+
+
+def _wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def _outcome(result):
+    return result.get("status"), result.get("message"), (result.get("payload") or {}).get("error_type")
+
+
+# ---------- PIPELINE ----------
+def check_stage_hooks():
+    import stage_hooks
+
+    events = []
+    elapsed = []
+
+    def before(stage, ctx):
+        events.append(("before", stage))
+
+    def after(stage, elapsed_ms, ctx):
+        events.append(("after", stage))
+        elapsed.append(elapsed_ms)
+
+    stage_hooks.add_before_hook(before)
+    stage_hooks.add_after_hook(after)
+    try:
+        result = logic.run_pipeline("Kolik je hodin?", {"user_id": "sh_user"})
+    finally:
+        stage_hooks.remove_hook(before)
+        stage_hooks.remove_hook(after)
+
+    # before/after around every stage, in pipeline order
+    stages = [stage for _, stage in events[::2]]
+    assert events == [(kind, stage) for stage in stages for kind in ("before", "after")], events
+    assert stages[0] == "command" and stages[-1] == "append_stm" and "sense" in stages, stages
+    assert all(ms >= 0 for ms in elapsed)
+    assert "timings" not in result
+
+    # removed hooks stay silent
+    logic.run_pipeline("Ahoj", {"user_id": "sh_user"})
+    assert len(events) == 2 * len(stages)
+
+    # timings only when asked for: per turn, or globally
+    timed = logic.run_pipeline("Kolik je hodin?", {"user_id": "sh_user", "timings": True})
+    assert set(timed["timings"]) == set(stages), (timed["timings"], stages)
+    assert all(ms >= 0 for ms in timed["timings"].values())
+
+    stage_hooks.set_timings_enabled(True)
+    try:
+        assert {"command", "sense", "append_stm"} <= set(logic.run_pipeline("Gugululu", {"user_id": "sh_user"})["timings"])
+    finally:
+        stage_hooks.set_timings_enabled(False)
+    assert "timings" not in logic.run_pipeline("Gugululu", {"user_id": "sh_user"})
+
+
+def check_pipeline_batch():
+    import stm
+    from turn_clock import TurnClock, use_clock
+
+    rng = random.Random(2)
+    texts = ["Ahoj", "Kolik je 2+3?", "Gugululu", "Kolik je hodin?", "Díky", "Jaký je dnes den?", "?"]
+    turns = [(rng.choice("abc"), rng.choice(texts)) for _ in range(60)]
+    fields = ("pipeline", "intent", "actions", "source", "epistemic_state", "flags", "emotion_signal", "timestamp")
+
+    assert logic.run_pipeline_batch([]) == []
+
+    # batch users bt_*, one-by-one users sq_*; same instant for both
+    with use_clock(TurnClock(datetime(2026, 3, 2, 10, 15, tzinfo=timezone.utc))):
+        batch = logic.run_pipeline_batch([("bt_" + user, text, None) for user, text in turns])
+        single = [logic.run_pipeline(text, {"user_id": "sq_" + user}) for user, text in turns]
+
+    assert len(batch) == len(turns)
+    for n, (got, expected) in enumerate(zip(batch, single)):
+        assert got == expected, (n, turns[n], got, expected)
+
+    for user in "abc":
+        batch_stm = [[entry[f] for f in fields] for entry in stm.get_last("bt_" + user, 100)]
+        single_stm = [[entry[f] for f in fields] for entry in stm.get_last("sq_" + user, 100)]
+        assert batch_stm == single_stm, user
+        # STM keeps the input order of this user's turns
+        intents = [r["intent"] for (u, _), r in zip(turns, batch) if u == user]
+        assert [entry["intent"] for entry in stm.get_last("bt_" + user, 100)] == intents[-10:], user
+
+
+def check_lazy_context():
+    import ltm
+    from storage.backend import get_storage
+    from turn_context import TurnContext
+
+    ltm.upsert_fact("lz_user", "name", "Eva")
+
+    store = get_storage()
+    calls = []
+
+    def spy(name, fn):
+        def wrapper(*args):
+            calls.append(name)
+            return fn(*args)
+        return wrapper
+
+    for name in ("load_user_ltm", "load_ltm_document", "load_profile", "profile_stamp"):
+        setattr(store, name, spy(name, getattr(store, name)))
+
+    # FACT / FALLBACK turns read neither LTM nor the profile
+    for text in ("Kolik je hodin?", "Kolik je 2+3?", "Gugululu"):
+        logic.run_pipeline(text, {"user_id": "lz_user"})
+    assert calls == [], calls
+
+    # membership, iteration and copies do not load
+    ctx = TurnContext(user_id="lz_user")
+    assert "personal" not in ctx and not ctx.is_loaded("profile")
+    assert list(ctx) == ["user_id"] and dict(ctx) == {"user_id": "lz_user"}
+    assert calls == [], calls
+
+    # first read loads, later reads are memoized for the turn
+    assert ctx["personal"] == {"name": "Eva"}
+    assert ctx.get("personal") == {"name": "Eva"} and ctx.is_loaded("personal")
+    assert calls == ["load_user_ltm"], calls
+    assert ctx["profile"] == {} and ctx["profile"] == {}
+    assert calls.count("load_user_ltm") == 1 and len(calls) <= 3, calls
+
+
+def check_chrono_memo():
+    import chrono_context
+    from chrono_context import DEFAULT_TZ, build_chrono_context
+    from turn_clock import TurnClock, use_clock
+
+    builds = []
+    build = chrono_context._build
+
+    def spy(time_now, tz_name):
+        builds.append(tz_name)
+        return build(time_now, tz_name)
+
+    monday = datetime(2026, 3, 2, 10, 15, tzinfo=timezone.utc)
+    chrono_context._build = spy
+    try:
+        with use_clock(TurnClock(monday)):
+            first = build_chrono_context({})
+            assert first == {
+                "hour": 11,
+                "minute": 15,
+                "part_of_day": "MIDDAY",
+                "flags": ["MIDDAY", "WORK_HOURS"],
+                "source": "SYSTEM_NOW",
+                "tz": DEFAULT_TZ,
+            }, first
+            assert build_chrono_context({}) == first and builds == [DEFAULT_TZ]
+
+            # every caller gets its own copy; flags stay a (JSON-able) list
+            mine = build_chrono_context({})
+            mine["flags"].append("X")
+            mine["hour"] = 0
+            assert build_chrono_context({}) == first
+            assert json.loads(json.dumps(first)) == first
+
+            # per timezone / per fact time
+            tokyo = build_chrono_context({}, tz_name="Asia/Tokyo")
+            assert (tokyo["hour"], tokyo["tz"]) == (19, "Asia/Tokyo") and len(builds) == 2, tokyo
+            build_chrono_context({}, tz_name="Asia/Tokyo")
+            assert len(builds) == 2
+            fact = build_chrono_context({"time_now": "07:30"})
+            assert (fact["hour"], fact["source"]) == (7, "FACT_TIME_NOW") and len(builds) == 3, fact
+
+            # unknown timezone: DEFAULT_TZ for the hour and the label
+            mars = build_chrono_context({}, tz_name="Mars/Base")
+            assert (mars["hour"], mars["tz"]) == (11, DEFAULT_TZ), mars
+
+        # next minute: new snapshot
+        with use_clock(TurnClock(monday + timedelta(minutes=1))):
+            n = len(builds)
+            assert build_chrono_context({})["minute"] == 16 and len(builds) == n + 1
+            build_chrono_context({})
+            assert len(builds) == n + 1
+    finally:
+        chrono_context._build = build
+
+
+def check_turn_clock():
+    import stage_hooks
+    import stm
+    from turn_clock import TurnClock, current_clock
+
+    frozen = datetime(2026, 7, 1, 21, 5, tzinfo=timezone.utc)
+    seen = []
+
+    def before(stage, ctx):
+        seen.append(current_clock())
+
+    stage_hooks.add_before_hook(before)
+    try:
+        result = logic.run_pipeline("Kolik je hodin?", {"user_id": "tc_user", "clock": frozen})
+    finally:
+        stage_hooks.remove_hook(before)
+
+    # one clock object for every stage of the turn
+    assert len(seen) > 5 and all(clock is seen[0] for clock in seen)
+    assert seen[0].utc == frozen
+    assert result["facts"]["time_now"] == "23:05" and result["chrono"]["hour"] == 23, result
+    assert stm.get_last("tc_user", 1)[0]["timestamp"] == frozen.isoformat()
+
+    # a TurnClock works too; outside a turn every call is a fresh "now"
+    again = logic.run_pipeline("Kolik je hodin?", {"user_id": "tc_user", "clock": TurnClock(frozen)})
+    assert again["facts"]["time_now"] == "23:05"
+    assert current_clock() is not current_clock()
+
+
+# ---------- STM ----------
+def check_stm_ring():
+    import stm
+
+    for i in range(25):
+        stm.append_entry({"user_id": "ring", "turn_id": str(i)}, limit=10)
+    assert [e["turn_id"] for e in stm.get_last("ring", 100)] == [str(i) for i in range(15, 25)]
+    assert [e["turn_id"] for e in stm.get_last("ring", 3)] == ["22", "23", "24"]
+    stats = stm.stats()
+    assert stats["resident_users"] == 1 and stats["resident_entries"] == 10 and stats["approx_bytes"] > 0, stats
+
+    # a smaller limit keeps the newest entries
+    stm.append_entry({"user_id": "ring", "turn_id": "25"}, limit=4)
+    assert [e["turn_id"] for e in stm.get_last("ring", 100)] == ["22", "23", "24", "25"]
+    assert stm.stats()["resident_entries"] == 4
+
+    stm.clear_user("ring")
+    assert stm.get_last("ring", 10) == []
+    stats = stm.stats()
+    assert stats["resident_entries"] == 0 and stats["approx_bytes"] == 0, stats
+
+
+def check_stm_eviction():
+    import types
+
+    import stm
+
+    now = [1000.0]  # fake monotonic clock
+    real_time = stm.time
+    stm.time = types.SimpleNamespace(monotonic=lambda: now[0])
+    try:
+        # bounds are off by default: no user count limit, nobody idles out
+        for n in range(12000):
+            stm.append_entry({"user_id": "u%d" % n})
+        now[0] += 7 * 24 * 3600
+        assert stm.get_last("u0", 1)
+        stats = stm.stats()
+        assert stats["resident_users"] == 12000 and stats["evictions"] == stats["expirations"] == 0, stats
+
+        # max_users: least recently used goes first, reads count as use
+        stm.clear_all()
+        stm.configure(max_users=3)
+        for user in "abc":
+            stm.append_entry({"user_id": user})
+        stm.get_last("a", 1)
+        stm.append_entry({"user_id": "d"})
+        assert stm.get_last("b", 1) == [] and all(stm.get_last(user, 1) for user in "acd")
+        stats = stm.stats()
+        assert stats["resident_users"] == 3 and stats["evictions"] == 1, stats
+
+        # idle_ttl
+        stm.clear_all()
+        stm.configure(max_users=0, idle_ttl=5)
+        stm.append_entry({"user_id": "idle"})
+        stm.append_entry({"user_id": "busy"})
+        now[0] += 4
+        stm.get_last("busy", 1)
+        now[0] += 4
+        assert stm.get_last("idle", 1) == [] and stm.get_last("busy", 1)
+        stats = stm.stats()
+        assert stats["resident_users"] == 1 and stats["expirations"] == 1, stats
+    finally:
+        stm.time = real_time
+
+    # max_entries: global budget over all users
+    stm.clear_all()
+    stm.configure(idle_ttl=0, max_entries=5)
+    for user in "xyz":
+        for _ in range(2):
+            stm.append_entry({"user_id": user})
+    assert stm.get_last("x", 10) == [] and stm.stats()["resident_entries"] == 4, stm.stats()
+    stm.configure(max_entries=0)
+
+
+def check_stm_signals():
+    import stm
+    from emotion_engine import resolve_emotion_from_signals, resolve_emotion_signal
+
+    fields = ("size", "low_signal", "stall_risk", "blocked", "intents", "pipelines", "raw_intents", "last2")
+    rng = random.Random(8)
+    flag_choices = [[], ["LOW_SIGNAL"], ["STALL_RISK", "LOW_SIGNAL"], ["LOW_SIGNAL", "LOW_SIGNAL"], "LOW_SIGNAL", None, [1]]
+
+    for trial in range(60):
+        stm.clear_all()
+        limit = rng.choice([1, 2, 3, 5, 6, 10, 0, -1, "x"])
+        for i in range(rng.randrange(1, 30)):
+            if rng.random() < 0.1:
+                limit = rng.choice([1, 3, 4, 7, 10])  # resize between calls
+            entry = {"user_id": "stm_user", "turn": i}
+            for key, choices in (
+                ("flags", flag_choices),
+                ("intent", ["GREETING", "UNKNOWN", None, 5]),
+                ("pipeline", ["social", "fact", None]),
+                ("epistemic_state", ["OK", "BLOCKED", "blocked", None, 1]),
+            ):
+                if rng.random() < 0.8:
+                    entry[key] = rng.choice(choices)
+            stm.append_entry(entry, limit=limit)
+
+            rolling = stm.get_signals("stm_user")
+            entries = stm.get_last("stm_user", 1000)
+            full = stm.summarize(entries)
+            for name in fields:
+                assert getattr(rolling, name) == getattr(full, name), (trial, i, name)
+            assert resolve_emotion_from_signals(rolling) == resolve_emotion_signal([dict(e) for e in entries])
+
+
+# ---------- STORAGE / CACHES ----------
+def _replace_json(path, data):
+    tmp = path + ".other"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def check_ltm_cache():
+    import ltm
+
+    ltm.upsert_fact("lc_user", "city", "Brno")
+    ltm.clear_cache()
+
+    parses = []
+    load = ltm.json.load
+
+    def counting(f, *args, **kwargs):
+        parses.append(1)
+        return load(f, *args, **kwargs)
+
+    ltm.json.load = counting
+    try:
+        for _ in range(20):
+            assert ltm.load_ltm("lc_user") == {"city": "Brno"}
+        assert len(parses) == 1, parses
+
+        # replaced by another process
+        _replace_json("memory.json", {"ltm": {"lc_user": {"city": "Praha"}}})
+        assert ltm.load_ltm("lc_user") == {"city": "Praha"} and len(parses) == 2
+
+        # rewritten in place, same size and inode: the mtime tells
+        with open("memory.json", "r+", encoding="utf-8") as f:
+            text = f.read()
+            f.seek(0)
+            f.write(text.replace("Praha", "Plzen"))
+        st = os.stat("memory.json")
+        os.utime("memory.json", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        assert ltm.load_ltm("lc_user") == {"city": "Plzen"} and len(parses) == 3
+    finally:
+        ltm.json.load = load
+
+    # reads are plain dicts the caller owns
+    user = ltm.load_ltm("lc_user")
+    assert type(user) is dict and json.loads(json.dumps(user)) == user
+    user["city"] = "Ostrava"
+    assert ltm.load_ltm("lc_user") == {"city": "Plzen"}
+    assert ltm.load_ltm("nobody") == {}
+
+
+def check_ltm_shards():
+    import ltm
+
+    original = {"m1": {"name": "Eva"}, "m2": {"city": "Brno", "n": 2}}
+    with open("memory.json", "w", encoding="utf-8") as f:
+        json.dump({"ltm": original, "meta": {"v": 2}}, f)
+
+    # not migrated yet: sharded layout still reads memory.json
+    ltm.LTM_LAYOUT = "sharded"
+    assert ltm.load_ltm()["ltm"] == original
+    assert ltm.load_ltm("m2") == original["m2"]
+
+    assert ltm.migrate_to_shards() == 2
+    assert all(os.path.exists(os.path.join("users", user, "ltm.json")) for user in original)
+    assert json.load(open("memory.json", encoding="utf-8")) == {"meta": {"v": 2}}
+    doc = ltm.load_ltm()
+    assert doc == {"ltm": original, "meta": {"v": 2}}, doc
+    ltm.clear_cache()
+    assert ltm.load_ltm() == doc
+    assert ltm.migrate_to_shards() == 0
+
+    # a user left out of the saved document is gone, shard included
+    del doc["ltm"]["m1"]
+    ltm.save_ltm(doc)
+    assert not os.path.exists(os.path.join("users", "m1", "ltm.json"))
+    assert ltm.load_ltm("m1") == {} and "m1" not in ltm.load_ltm()["ltm"]
+    ltm.clear_cache()
+    assert ltm.load_ltm() == doc and ltm.load_ltm("m1") == {}
+
+
+def check_ltm_copies():
+    import ltm
+
+    for layout in ("single", "sharded"):
+        ltm.LTM_LAYOUT = layout
+        ltm.clear_cache()
+        user = "lt_" + layout
+        ltm.upsert_fact(user, "k", 1)
+
+        doc = ltm.load_ltm()
+        doc["ltm"][user]["k"] = 2
+        ltm.save_ltm(doc)
+        assert ltm.load_ltm(user)["k"] == 2, layout
+
+        doc["ltm"][user]["k"] = 3  # edits after save_ltm stay private
+        assert ltm.load_ltm(user)["k"] == 2, layout
+        other = ltm.load_ltm()
+        other["ltm"][user]["k"] = 4
+        assert ltm.load_ltm(user)["k"] == 2 and ltm.load_ltm()["ltm"][user]["k"] == 2, layout
+
+        ltm.clear_cache()
+        assert ltm.load_ltm(user)["k"] == 2, layout
+
+
+def check_sqlite_backend():
+    from storage.json_backend import JsonStorage
+    from storage.sqlite_backend import SqliteStorage
+
+    # the same operations on both backends read back the same
+    json_store, sqlite_store = stores = [JsonStorage(), SqliteStorage("mirabase.db")]
+    rng = random.Random(11)
+    users = ["s1", "s2", "s3"]
+    now = time.time()
+    ts = now - 30 * 3600
+    cutoffs = [60 * ((now - hours * 3600) // 60) for hours in (1, 12, 28)]  # whole minutes
+
+    def bump(profile):
+        profile["n"] = profile.get("n", 0) + 1
+
+    def compare():
+        assert json_store.load_ltm_document() == sqlite_store.load_ltm_document()
+        for user in users + ["nobody"]:
+            assert json_store.load_user_ltm(user) == sqlite_store.load_user_ltm(user), user
+            assert json_store.load_profile(user) == sqlite_store.load_profile(user), user
+            for cutoff in cutoffs:
+                expected = sqlite_store.count_user_actions_since(user, cutoff)
+                assert json_store.count_user_actions_since(user, cutoff) == expected, (user, cutoff)
+        for n in range(0, 60, 3):
+            request_id = "sq-%d" % n
+            assert json_store.find_log_result(request_id) == sqlite_store.find_log_result(request_id), request_id
+        for _ in range(5):
+            since = rng.choice([None, rng.uniform(now - 31 * 3600, now)])
+            until = rng.choice([None, rng.uniform(since or now - 30 * 3600, now + 10)])
+            kwargs = {"user_id": rng.choice([None] + users), "action_type": rng.choice([None, "noop"])}
+            expected = list(sqlite_store.query_log(since, until, **kwargs))
+            assert list(json_store.query_log(since, until, **kwargs)) == expected, (since, until, kwargs)
+
+    for step in range(300):
+        user = rng.choice(users)
+        op = rng.random()
+        if op < 0.2:
+            key, value = rng.choice("abc"), rng.randrange(100)
+            for store in stores:
+                store.upsert_fact(user, key, value)
+        elif op < 0.3:
+            facts = {key: rng.randrange(100) for key in rng.sample("abcd", 2)}
+            for store in stores:
+                store.upsert_facts(user, dict(facts))
+        elif op < 0.38:
+            for store in stores:
+                store.save_profile(user, {"user_id": user, "step": step})
+        elif op < 0.45:
+            assert json_store.update_profile(user, bump) == sqlite_store.update_profile(user, bump)
+        elif op < 0.5:
+            doc = sqlite_store.load_ltm_document()
+            if doc["ltm"] and rng.random() < 0.5:
+                del doc["ltm"][rng.choice(sorted(doc["ltm"]))]
+            else:
+                doc["meta"] = {"step": step}
+            for store in stores:
+                store.save_ltm_document(json.loads(json.dumps(doc)))
+        else:
+            ts = min(now, ts + rng.random() * 1200)
+            rec = {
+                "time": "",
+                "ts": ts,
+                "user_id": user,
+                "request_id": "sq-%d" % rng.randrange(60),
+                "trace_id": "",
+                "action_type": rng.choice(["noop", "get_profile"]),
+                "result": {"step": step},
+            }
+            phase = rng.choice([None, None, "pending", "final"])
+            if phase is not None:
+                rec["phase"] = phase
+            for store in stores:
+                store.append_log(dict(rec))
+        if step % 20 == 19:
+            compare()
+    sqlite_store.close()
+
+
+def check_write_behind_reads():
+    from storage.backend import _base_from_config
+    from storage.write_behind import WriteBehindStorage
+
+    inner = _base_from_config()
+    load = inner.load_user_ltm
+
+    def slow(user_id):
+        data = load(user_id)
+        time.sleep(0.0005)  # lets a flush finish between the inner read and the overlay
+        return data
+
+    inner.load_user_ltm = slow
+    store = WriteBehindStorage(inner, interval=0.001, max_pending=1)
+    try:
+        for i in range(150):
+            store.upsert_fact("wb_user", "k%d" % i, i)
+            for _ in range(3):
+                assert (store.load_user_ltm("wb_user") or {}).get("k%d" % i) == i, i
+                assert store.load_ltm_document()["ltm"]["wb_user"]["k%d" % i] == i, i
+    finally:
+        store.close()
+    assert load("wb_user") == {"k%d" % i: i for i in range(150)}
+
+
+def check_atomic_write_mode():
+    from pathlib import Path
+
+    from storage.files import atomic_write_text
+
+    if not hasattr(os, "fchmod"):
+        return
+    umask = os.umask(0)
+    os.umask(umask)
+    atomic_write_text(Path("mode.json"), "{}")
+    assert os.stat("mode.json").st_mode & 0o777 == 0o666 & ~umask
+    os.chmod("mode.json", 0o640)
+    atomic_write_text(Path("mode.json"), "[]")
+    assert os.stat("mode.json").st_mode & 0o777 == 0o640
+
+
+def check_profile_cache():
+    from action import profile_store
+    from storage.backend import get_storage
+
+    now = datetime.now(timezone.utc)
+    path = os.path.join("users", "pc_user", "profile.json")
+    _profile("pc_user")
+    assert profile_store.load_access_policy("pc_user").permits("noop", now)
+
+    # another process rewrites the file: profile and policy follow
+    data = json.load(open(path, encoding="utf-8"))
+    data["access"]["denied_actions"] = ["noop"]
+    _replace_json(path, data)
+    assert profile_store.load_profile("pc_user")["access"]["denied_actions"] == ["noop"]
+    assert not profile_store.load_access_policy("pc_user").permits("noop", now)
+
+    # ... right after our read: the cache must not keep the older profile
+    store = get_storage()
+    load = store.load_profile
+
+    def racing(user_id):
+        profile = load(user_id)
+        newer = json.load(open(path, encoding="utf-8"))
+        newer["access"]["denied_actions"] = ["*"]
+        _replace_json(path, newer)
+        return profile
+
+    profile_store.get_repository().invalidate()
+    store.load_profile = racing
+    try:
+        profile_store.load_profile("pc_user")
+    finally:
+        store.load_profile = load
+    assert profile_store.load_profile("pc_user")["access"]["denied_actions"] == ["*"]
+    assert not profile_store.load_access_policy("pc_user").permits("get_profile", now)
+
+    # concurrent updates and readers: no lost update, readers end on the last one
+    _profile("pc_count", counter=0)
+
+    def bump(profile):
+        profile["access"]["counter"] += 1
+
+    def update():
+        for _ in range(25):
+            profile_store.update_profile("pc_count", bump)
+
+    def read():
+        for _ in range(200):
+            profile_store.load_profile("pc_count")
+
+    _join([threading.Thread(target=update) for _ in range(4)] + [threading.Thread(target=read) for _ in range(4)])
+    assert profile_store.load_profile("pc_count")["access"]["counter"] == 100
+    assert json.load(open(os.path.join("users", "pc_count", "profile.json")))["access"]["counter"] == 100
+
+
+# ---------- EXECUTION LOG ----------
+def _log_entry(i, ts, rng):
+    return {
+        "time": "",
+        "ts": ts,
+        "user_id": rng.choice(["u1", "u2", "u3"]),
+        "request_id": "sg-%d" % i,
+        "trace_id": "",
+        "action_type": rng.choice(["noop", "get_profile"]),
+        "result": {"status": "success", "i": i},
+    }
+
+
+def check_daily_counts():
+    from action import execution_log, log_writer
+    from action.execution_log import _UserBuckets
+    from storage.backend import get_storage
+
+    # minute buckets against a plain list (late minutes included)
+    rng = random.Random(16)
+    buckets, minutes = _UserBuckets(), []
+    for step in range(3000):
+        minute = 1000 + step // 10 - (rng.randrange(30) if rng.random() < 0.1 else 0)
+        buckets.add(minute)
+        minutes.append(minute)
+        if rng.random() < 0.02:
+            cut = minute - rng.randrange(60)
+            buckets.expire(cut)
+            minutes = [m for m in minutes if m >= cut]
+        since = minute - rng.randrange(80)
+        assert buckets.count_from(since) == sum(1 for m in minutes if m >= since), step
+        assert buckets.total == len(minutes), step
+
+    # per-user daily counts: last 24h only, final records of async actions not counted
+    store = get_storage()
+    users = ["d1", "d2", "d3"]
+    expected = dict.fromkeys(users, 0)
+    now = time.time()
+
+    def compare():
+        for user in users:
+            assert execution_log.count_actions_last_24h(user) == expected[user], user
+        assert execution_log.count_actions_last_24h("nobody") == 0
+
+    for i in range(400):
+        user = rng.choice(users)
+        hours = rng.choice([rng.uniform(0, 23.8), rng.uniform(24.2, 48)])
+        rec = dict(_log_entry(i, now - hours * 3600, rng), user_id=user)
+        phase = rng.choice([None, None, "pending", "final"])
+        if phase is not None:
+            rec["phase"] = phase
+        store.append_log(rec)
+        if hours < 24 and phase != "final":
+            expected[user] += 1
+        if i % 50 == 49:
+            compare()
+    log_writer.get_writer().flush()
+    compare()
+
+
+def check_log_segments():
+    from action import execution_log, log_segments, log_writer
+    from storage.backend import get_storage
+
+    # rotated (gzip) segments + active one read as one log
+    rng = random.Random(17)
+    store = get_storage()
+    now = time.time()
+    ts = now - 3 * 24 * 3600
+    for i in range(600):
+        ts += rng.random() * 850  # ~3 days up to now
+        store.append_log(_log_entry(i, min(ts, now), rng))
+    log_writer.get_writer().flush()
+
+    manifest = log_segments.load_manifest()
+    assert len(manifest["segments"]) > 3, manifest
+    assert any(seg["name"].endswith(".gz") for seg in manifest["segments"]), manifest
+
+    everything = list(execution_log.iter_records())
+    assert [r["request_id"] for r in everything] == ["sg-%d" % i for i in range(600)]
+    assert execution_log.find_result_by_request_id("sg-5") == {"status": "success", "i": 5}
+    assert execution_log.find_result_by_request_id("sg-599") == {"status": "success", "i": 599}
+
+    # no retention configured: compaction keeps everything
+    assert log_segments.RETENTION == 0
+    assert log_segments.compact() == 0
+    assert list(execution_log.iter_records()) == everything
+
+    # opted in: whole segments past retention go, the rest stays readable
+    log_segments.RETENTION = 36 * 3600
+    assert log_segments.compact() > 0
+    cutoff = time.time() - log_segments.RETENTION
+    kept = list(execution_log.iter_records())
+    assert kept == everything[len(everything) - len(kept):]
+    assert all(r in kept for r in everything if r["ts"] >= cutoff + 5)
+    assert execution_log.find_result_by_request_id(kept[0]["request_id"]) == kept[0]["result"]
+    assert execution_log.find_result_by_request_id("sg-0") is None
+
+
+def check_log_durability():
+    from action import execution_log, log_writer
+
+    # record / fsync: the line is in the file when append_record returns,
+    # even if the process dies right after (no atexit flush)
+    code = (
+        "import os\n"
+        "from action.execution_log import append_record\n"
+        "for i in range(40):\n"
+        "    append_record(user_id='gc', request_id='%s-%d' % (os.environ['MIRABASE_LOG_DURABILITY'], i),\n"
+        "                  trace_id='', action_type='noop', result={'status': 'success'})\n"
+        "os._exit(0)\n"
+    )
+    for policy in ("record", "fsync"):
+        env = dict(os.environ, MIRABASE_LOG_DURABILITY=policy, PYTHONPATH=_HERE)
+        subprocess.run([sys.executable, "-c", code], env=env, check=True, timeout=120)
+    on_disk = {rec.get("request_id") for rec in execution_log.iter_records()}
+    for policy in ("record", "fsync"):
+        assert all("%s-%d" % (policy, i) in on_disk for i in range(40)), policy
+
+    # interval: queued records are visible (and counted) before they are written
+    os.environ["MIRABASE_LOG_DURABILITY"] = "interval"
+    os.environ["MIRABASE_LOG_FLUSH_INTERVAL"] = "30"
+    for i in range(5):
+        execution_log.append_record(
+            user_id="iv", request_id="iv-%d" % i, trace_id="", action_type="noop", result={"status": "success"}
+        )
+    on_disk = {rec.get("request_id") for rec in execution_log.iter_records()}
+    assert not any("iv-%d" % i in on_disk for i in range(5))
+    assert execution_log.find_result_by_request_id("iv-3") == {"status": "success"}
+    assert execution_log.count_actions_last_24h("iv") == 5
+
+    log_writer.get_writer().flush()
+    on_disk = {rec.get("request_id") for rec in execution_log.iter_records()}
+    assert all("iv-%d" % i in on_disk for i in range(5))
+    assert execution_log.count_actions_last_24h("iv") == 5
+
+
+def check_log_index_race():
+    from action import execution_log, log_writer
+
+    n = 400
+    counts = []
+    misses = []
+    done = threading.Event()
+
+    def write():
+        rng = random.Random(18)
+        for i in range(n):
+            execution_log.append_record(
+                user_id="race", request_id="q%d" % i, trace_id="", action_type="noop", result={"i": i}
+            )
+            time.sleep(rng.random() * 0.002)
+
+    def find():
+        # right after submission: queued, in flight or indexed, never missing
+        for i in range(n):
+            _wait_for(
+                lambda: (log_writer.peek_writer() is not None and log_writer.peek_writer().find_pending("q%d" % i))
+                or execution_log.find_result_by_request_id("q%d" % i),
+                timeout=30,
+            )
+            for _ in range(3):
+                if execution_log.find_result_by_request_id("q%d" % i) is None:
+                    misses.append(i)
+
+    def count():
+        while not done.is_set():
+            counts.append(execution_log.count_actions_last_24h("race"))
+
+    counter = threading.Thread(target=count)
+    counter.start()
+    try:
+        _join([threading.Thread(target=write), threading.Thread(target=find)], timeout=120)
+    finally:
+        done.set()
+        counter.join()
+    log_writer.get_writer().flush()
+
+    assert not misses, misses[:10]
+    assert all(b >= a for a, b in zip(counts, counts[1:])), "daily count went backwards"
+    assert max(counts) <= n and execution_log.count_actions_last_24h("race") == n, (max(counts), n)
+
+
+def check_request_filter():
+    from action import execution_log, log_segments
+
+    for i in range(300):
+        execution_log.append_record(
+            user_id="rf", request_id="rf-%d" % i, trace_id="", action_type="noop", result={"i": i}
+        )
+    assert execution_log.find_result_by_request_id("rf-7") == {"i": 7}
+
+    # new ids are answered by the filter: no record is read
+    reads = []
+    read_record_at = log_segments.read_record_at
+
+    def spy(*args):
+        reads.append(args)
+        return read_record_at(*args)
+
+    before = execution_log.request_filter_stats()
+    log_segments.read_record_at = spy
+    try:
+        for i in range(2000):
+            assert execution_log.find_result_by_request_id("rf-new-%d" % i) is None
+    finally:
+        log_segments.read_record_at = read_record_at
+    stats = execution_log.request_filter_stats()
+
+    assert not reads, reads[:5]
+    misses = stats["definite_misses"] - before["definite_misses"]
+    false_positives = stats["false_positives"] - before["false_positives"]
+    assert misses + false_positives == 2000 and misses >= 1900, stats
+    assert stats["items"] >= 300 and stats["maybe_hits"] >= 1, stats
+    assert set(stats) >= {"bits", "hashes", "capacity", "memory_bytes", "estimated_fp_rate", "observed_fp_rate"}
+
+
+def check_log_index_scan():
+    from action import execution_log, log_segments, log_writer
+    from storage.backend import get_storage
+
+    # ids older than the offset index are in the filter only: a hit scans
+    # the old segments without the index lock, a false positive scans once
+    rng = random.Random(20)
+    store = get_storage()
+    old = time.time() - 3 * 24 * 3600
+    for i in range(60):
+        store.append_log(dict(_log_entry(i, old + i, rng), request_id="old-%d" % i))
+    log_writer.get_writer().flush()
+
+    index = execution_log._INDEX
+    with index.lock:
+        index._reset()
+        index._build(use_snapshot=False)
+    assert "old-3" not in index.offsets and "old-3" in index.filter
+
+    held = []
+    iter_lines = log_segments.iter_lines
+
+    def spy(*args, **kwargs):
+        held.append(index.lock.locked())
+        return iter_lines(*args, **kwargs)
+
+    log_segments.iter_lines = spy
+    try:
+        assert execution_log.find_result_by_request_id("old-3") == {"status": "success", "i": 3}
+        assert held and not any(held)
+
+        index.filter.add("ghost")
+        assert index.lookup("ghost") is None
+        scans = len(held)
+        assert index.lookup("ghost") is None
+        assert len(held) == scans, "confirmed negative scanned again"
+        assert index.false_positives == 2
+    finally:
+        log_segments.iter_lines = iter_lines
+
+
+def check_log_query():
+    from action import execution_log, log_segments, log_writer
+    from storage.backend import get_storage
+
+    # seek_ts against a linear scan (uncompressed, sorted file)
+    rng = random.Random(19)
+    stamps = sorted(rng.uniform(0, 1000) for _ in range(300))
+    with open("sorted.jsonl", "wb") as f:
+        for ts in stamps:
+            f.write((json.dumps({"ts": ts}) + "\n").encode("utf-8"))
+    with open("sorted.jsonl", "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        lines = []
+        offset = 0
+        for raw in open("sorted.jsonl", "rb"):
+            lines.append((offset, json.loads(raw)["ts"]))
+            offset += len(raw)
+        for target in [-1.0, 0.0, 1001.0] + [rng.uniform(0, 1000) for _ in range(100)] + stamps[:20]:
+            expected = next((o for o, ts in lines if ts >= target), size)
+            assert log_segments.seek_ts(f, target, size) == expected, target
+            assert f.tell() == expected
+
+    # rotated (gzip) segments + active one: query() == filtering all records
+    store = get_storage()
+    now = time.time()
+    ts = now - 3 * 24 * 3600
+    for i in range(600):
+        ts += rng.random() * 850  # ~3 days up to now
+        store.append_log(_log_entry(i, min(ts, now) - rng.random() * 2, rng))  # skew < TS_SLACK
+    log_writer.get_writer().flush()
+
+    def compare(records, trials):
+        for _ in range(trials):
+            since = rng.choice([None, rng.uniform(now - 4 * 24 * 3600, now)])
+            until = rng.choice([None, rng.uniform(since or now - 3 * 24 * 3600, now + 10)])
+            user_id = rng.choice([None, "u1", "u3"])
+            action_type = rng.choice([None, "noop"])
+            expected = [
+                r for r in records
+                if (since is None or r["ts"] >= since) and (until is None or r["ts"] <= until)
+                and user_id in (None, r["user_id"]) and action_type in (None, r["action_type"])
+            ]
+            got = list(execution_log.query_records(since, until, user_id=user_id, action_type=action_type))
+            assert got == expected, (since, until, user_id, action_type, len(got), len(expected))
+
+    everything = list(execution_log.iter_records())
+    compare(everything, 80)
+
+    # ... and after compaction dropped the oldest segments
+    log_segments.RETENTION = 36 * 3600
+    assert log_segments.compact() > 0
+    compare(list(execution_log.iter_records()), 40)
+
+
+def check_log_ts_order():
+    from action import dispatcher, execution_log, registry
+
+    # a slow handler's record lands after faster ones: stamped at append,
+    # time-range reads (MIRABASE_LOG_TS_SLACK=0.05 here) still find it
+    _profile("ts_user")
+
+    def slow_handler(action):
+        time.sleep(0.6)
+        return _ok("slow")
+
+    registry.register("slow", slow_handler)
+    slow = threading.Thread(
+        target=dispatcher.dispatch, args=({"action_type": "slow"}, "ts_user", {"request_id": "ts-slow"})
+    )
+    slow.start()
+    for i in range(8):
+        dispatcher.dispatch({"action_type": "noop"}, "ts_user", {"request_id": "ts-%d" % i})
+        time.sleep(0.1)
+    slow.join()
+
+    everything = list(execution_log.iter_records())
+    assert len(everything) == 9
+    for rec in everything:
+        got = [r["request_id"] for r in execution_log.query_records(rec["ts"] - 0.01, rec["ts"] + 0.01)]
+        assert rec["request_id"] in got, (rec["request_id"], got)
+
+
+# ---------- ACTION LAYER ----------
+def _reference_permits(profile, action_type, now):
+    # the gate before compiled policies (user-021), kept as the reference
+    identity = profile.get("identity") or {}
+    if identity.get("status", "active") != "active":
+        return False
+    access = profile.get("access") or {}
+    allowed = access.get("allowed_actions", [])
+    denied = access.get("denied_actions", [])
+    if not isinstance(allowed, list) or not isinstance(denied, list):
+        return False
+
+    is_allowed = ("*" in allowed) or (action_type in allowed)
+    is_denied = ("*" in denied) or (action_type in denied)
+    temporal = profile.get("temporal")
+    if isinstance(temporal, dict):
+        temp_actions = temporal.get("temporary_actions", [])
+        valid_until = temporal.get("valid_until")
+        until_dt = None
+        if isinstance(valid_until, str) and valid_until:
+            try:
+                until_dt = datetime.fromisoformat(valid_until.replace("Z", "+00:00"))
+            except ValueError:
+                until_dt = None
+        if (until_dt is None or now <= until_dt) and isinstance(temp_actions, list) and action_type in temp_actions:
+            is_allowed = True
+    return is_allowed and not is_denied
+
+
+def check_access_policy():
+    from action.access_policy import compile_policy
+
+    rng = random.Random(8)
+    now = datetime.now(timezone.utc)
+    names = ["noop", "get_profile", "set_preference", "*", None, 3]
+
+    def action_list():
+        return rng.choice([[], rng.sample(names, rng.randrange(1, 4)), [["noop"]], "noop", None, {"noop": 1}])
+
+    def expiry():
+        return rng.choice([
+            None, "", "not a date", 17,
+            (now + timedelta(hours=1)).isoformat(),
+            (now - timedelta(hours=1)).isoformat().replace("+00:00", "Z"),
+        ])
+
+    for _ in range(3000):
+        profile = {}
+        if rng.random() < 0.9:
+            profile["identity"] = rng.choice([{}, {"status": "active"}, {"status": "disabled"}, None])
+        if rng.random() < 0.9:
+            profile["access"] = rng.choice([None, {}, {
+                "allowed_actions": action_list(),
+                "denied_actions": action_list(),
+                "daily_limit": rng.choice([-1, 0, 4, "4", None, True]),
+            }])
+        if rng.random() < 0.6:
+            profile["temporal"] = rng.choice([None, "x", {
+                "temporary_actions": action_list(),
+                "valid_until": expiry(),
+            }])
+
+        policy = compile_policy(profile)
+        for action_type in names:
+            expected = _reference_permits(profile, action_type, now)
+            assert policy.permits(action_type, now) == expected, (profile, action_type)
+
+        access = profile.get("access") or {}
+        limit = access.get("daily_limit", -1)
+        if policy.active:
+            assert policy.daily_limit == (limit if isinstance(limit, int) and limit >= 0 else None), profile
+
+
+def check_dispatch_many():
+    from action import dispatcher
+    from action.execution_log import find_result_by_request_id
+
+    _profile("dm_user")
+    actions = [
+        {"action_type": "noop", "context": {"request_id": "dm-1"}},
+        {"action_type": "no_such_action", "context": {"request_id": "dm-2"}},
+        {"action_type": "noop", "context": {"request_id": "dm-3"}},
+    ]
+    out = dispatcher.dispatch_many(actions, "dm_user", {})
+    assert [r["status"] for r in out] == ["success", "error"], out
+    assert find_result_by_request_id("dm-1") is not None
+    assert find_result_by_request_id("dm-3") is None
+
+    # randomized: same outcomes as dispatch() one by one, stopping at the first error
+    rng = random.Random(21)
+    for trial in range(40):
+        rules = {
+            "daily_limit": rng.choice([-1, 0, 1, 2, 3, 5]),
+            "denied_actions": rng.choice([[], ["noop"], ["get_profile"]]),
+        }
+        plan = [
+            (rng.choice(["noop", "noop", "get_profile", "no_such_action"]), rng.randrange(6))
+            for _ in range(rng.randrange(1, 8))
+        ]
+        batch_user, single_user = "dm%d_a" % trial, "dm%d_b" % trial
+        _profile(batch_user, **rules)
+        _profile(single_user, **rules)
+
+        batch = dispatcher.dispatch_many(
+            [{"action_type": t, "context": {"request_id": "%s-%d" % (batch_user, n)}} for t, n in plan],
+            batch_user,
+            {},
+        )
+        single = []
+        for t, n in plan:
+            single.append(dispatcher.dispatch({"action_type": t}, single_user, {"request_id": "%s-%d" % (single_user, n)}))
+            if single[-1].get("status") == "error":
+                break
+        assert [_outcome(r) for r in batch] == [_outcome(r) for r in single], (trial, plan, batch, single)
+
+
+def check_dispatch_async():
+    from action import dispatcher, registry
+    from action.execution_log import count_actions_last_24h
+
+    _profile("as_user", daily_limit=4)
+    release = threading.Event()
+    calls = []
+
+    def slow(action):
+        calls.append(1)
+        release.wait(5)
+        return _ok("done")
+
+    def boom(action):
+        raise RuntimeError("handler failed")
+
+    def bail(action):
+        raise SystemExit(3)
+
+    registry.register("slow", slow)
+    registry.register("boom", boom)
+    registry.register("bail", bail)
+
+    first = dispatcher.dispatch_async({"action_type": "slow"}, "as_user", {"request_id": "as-1"})
+    assert first["status"] == "pending" and first["payload"]["request_id"] == "as-1", first
+    assert dispatcher.get_status("as-1")["status"] == "pending"
+    retry = dispatcher.dispatch_async({"action_type": "slow"}, "as_user", {"request_id": "as-1"})
+    assert retry["status"] == "pending", retry
+    assert count_actions_last_24h("as_user") == 1
+
+    release.set()
+    _wait_for(lambda: dispatcher.get_status("as-1")["status"] != "pending")
+    assert dispatcher.get_status("as-1") == _ok("done")
+    assert calls == [1], calls
+    assert count_actions_last_24h("as_user") == 1  # the final record does not count again
+
+    dispatcher.dispatch_async({"action_type": "boom"}, "as_user", {"request_id": "as-2"})
+    _wait_for(lambda: dispatcher.get_status("as-2")["status"] != "pending")
+    assert _outcome(dispatcher.get_status("as-2")) == ("error", "Action failed", "failed")
+
+    # SystemExit out of the handler still closes the request
+    dispatcher.dispatch_async({"action_type": "bail"}, "as_user", {"request_id": "as-3"})
+    _wait_for(lambda: dispatcher.get_status("as-3")["status"] != "pending")
+    assert _outcome(dispatcher.get_status("as-3")) == ("error", "Action failed", "failed")
+
+    # daily_limit 4: as-1 .. as-4 pass, as-5 is blocked
+    assert dispatcher.dispatch({"action_type": "noop"}, "as_user", {"request_id": "as-4"})["status"] == "success"
+    blocked = dispatcher.dispatch_async({"action_type": "noop"}, "as_user", {"request_id": "as-5"})
+    assert _outcome(blocked)[2] == "blocked", blocked
+    assert dispatcher.get_status("as-5") is None
+
+
+def check_single_flight():
+    from action import dispatcher, registry
+
+    _profile("sf_user")
+    calls = []
+    release = threading.Event()
+
+    def slow(action):
+        calls.append(action["context"]["request_id"])
+        release.wait(5)
+        return _ok("slow %d" % len(calls))
+
+    registry.register("slow", slow)
+
+    # concurrent duplicates: one handler run, every caller gets its result
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(dispatcher.dispatch({"action_type": "slow"}, "sf_user", {"request_id": "sf-1"}))
+        )
+        for _ in range(8)
+    ]
+    threading.Timer(0.2, release.set).start()
+    _join(threads)
+    assert calls == ["sf-1"], calls
+    assert len(results) == 8 and all(r == results[0] for r in results), results
+
+    # a later duplicate is replayed from the log
+    again = dispatcher.dispatch({"action_type": "slow"}, "sf_user", {"request_id": "sf-1"})
+    assert again == results[0] and calls == ["sf-1"]
+
+    # batches claiming the same ids in opposite order must not deadlock
+    calls.clear()
+
+    def batch(ids):
+        actions = [{"action_type": "slow", "context": {"request_id": i}} for i in ids]
+        dispatcher.dispatch_many(actions, "sf_user", {})
+
+    _join([threading.Thread(target=batch, args=(ids,)) for ids in (["b1", "b2"], ["b2", "b1"]) * 4])
+    assert sorted(calls) == ["b1", "b2"], calls
+    assert not dispatcher._FLIGHTS
+
+
+def check_broken_handler():
+    from action import dispatcher, registry
+
+    _profile("bh_user")
+    registry.REGISTRY._table["broken"] = "action.handlers.no_such_module:handle"
+    for n in range(3):
+        assert registry.get_handler("broken") is None
+        out = dispatcher.dispatch({"action_type": "broken"}, "bh_user", {"request_id": "bh-%d" % n})
+        assert _outcome(out) == ("error", "Unknown action type", "blocked"), out
+    registry.register("broken", lambda action: _ok("fixed"))
+    assert dispatcher.dispatch({"action_type": "broken"}, "bh_user", {"request_id": "bh-ok"}) == _ok("fixed")
+
+
+RACE_CHECKS = [
+    # (name, check, extra environment)
+    ("STAGE_HOOKS", check_stage_hooks, {}),
+    ("PIPELINE_BATCH", check_pipeline_batch, {}),
+    ("LAZY_TURN_CONTEXT", check_lazy_context, {}),
+    ("CHRONO_MEMO", check_chrono_memo, {}),
+    ("TURN_CLOCK", check_turn_clock, {}),
+    ("STM_RING", check_stm_ring, {}),
+    ("STM_EVICTION", check_stm_eviction, {}),
+    ("STM_SIGNALS_EQUIVALENCE", check_stm_signals, {}),
+    ("LTM_FILE_CACHE", check_ltm_cache, {}),
+    ("LTM_SHARDS", check_ltm_shards, {}),
+    ("LTM_COPIES", check_ltm_copies, {}),
+    ("SQLITE_MATCHES_JSON", check_sqlite_backend, {}),
+    ("WRITE_BEHIND_READS", check_write_behind_reads, {}),
+    ("ATOMIC_WRITE_MODE", check_atomic_write_mode, {}),
+    ("PROFILE_CACHE", check_profile_cache, {}),
+    ("DAILY_COUNTS", check_daily_counts, {}),
+    ("LOG_SEGMENTS", check_log_segments, {"MIRABASE_LOG_SEGMENT_BYTES": "4000"}),
+    ("LOG_DURABILITY", check_log_durability, {}),
+    ("LOG_INDEX_QUEUE_RACE", check_log_index_race, {}),
+    ("REQUEST_FILTER", check_request_filter, {}),
+    ("LOG_INDEX_OLD_SEGMENTS", check_log_index_scan, {"MIRABASE_LOG_SEGMENT_BYTES": "2000"}),
+    ("LOG_QUERY", check_log_query, {"MIRABASE_LOG_SEGMENT_BYTES": "4000"}),
+    ("LOG_TS_ORDER", check_log_ts_order, {"MIRABASE_LOG_TS_SLACK": "0.05"}),
+    ("ACCESS_POLICY_EQUIVALENCE", check_access_policy, {}),
+    ("DISPATCH_MANY", check_dispatch_many, {}),
+    ("DISPATCH_ASYNC", check_dispatch_async, {}),
+    ("SINGLE_FLIGHT", check_single_flight, {}),
+    ("BROKEN_HANDLER", check_broken_handler, {}),
+]
+
+
+def run_checks():
+    print("\n=== MIRA BASE – CONCURRENCY / STORAGE CHECKS ===\n")
+
+    passed = 0
+
+    for name, _, env in RACE_CHECKS:
+        print(f"[CHECK] {name}")
+        with tempfile.TemporaryDirectory(prefix="mirabase-check-") as workdir:
+            try:
+                proc = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--check", name],
+                    cwd=workdir,
+                    env=dict(os.environ, **env),
+                    capture_output=True,
+                    text=True,
+                    timeout=600,
+                )
+                failed = proc.returncode != 0
+                output = proc.stdout + proc.stderr
+            except subprocess.TimeoutExpired:
+                failed, output = True, "timed out"
+
+        if failed:
+            print(" ❌ FAIL")
+            print("\n".join("   " + line for line in output.strip().splitlines()[-15:]))
+        else:
+            print(" ✅ PASS")
+            passed += 1
+
+        print("-" * 40)
+
+    print(f"\nRESULT: {passed}/{len(RACE_CHECKS)} checks passed\n")
+
+
+def run_check(name):
+    # child side of run_checks(): cwd is already the temp dir
+    checks = {check_name: check for check_name, check, _ in RACE_CHECKS}
+    try:
+        checks[name]()
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
 if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--check":
+        sys.exit(run_check(sys.argv[2]))
     run_tests()
+    run_checks()
@@ -0,0 +1,116 @@
+# turn_clock.py
+# =========================
+# MIRA BASE – TURN CLOCK
+# =========================
+#
+# Responsibilities:
+# - one UTC instant per turn (taken once, at turn start)
+# - cached ZoneInfo instances + cached local conversions
+# - injectable / freezable (reproducible runs, benchmarks)
+#
+# Usage:
+# - logic.run / run_pipeline / action.dispatcher activate a clock for the turn
+# - engines call current_clock() instead of datetime.now(...)
+# - outside an active turn current_clock() returns a fresh "now" clock
+#
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone, tzinfo
+from functools import lru_cache
+from typing import Dict, Iterator, Optional
+
+try:
+    from zoneinfo import ZoneInfo  # py>=3.9
+except Exception:  # pragma: no cover
+    ZoneInfo = None  # type: ignore
+
+
+@lru_cache(maxsize=128)
+def zone(tz_name: str) -> tzinfo:
+    """
+    Cached ZoneInfo lookup. Unknown tz -> raises (same as ZoneInfo()).
+    """
+    if ZoneInfo is None:
+        raise RuntimeError("zoneinfo not available")
+    return ZoneInfo(tz_name)
+
+
+class TurnClock:
+    __slots__ = ("utc", "_iso", "_local")
+
+    def __init__(self, utc: Optional[datetime] = None) -> None:
+        if utc is None:
+            utc = datetime.now(timezone.utc)
+        elif utc.tzinfo is None:
+            utc = utc.replace(tzinfo=timezone.utc)
+        else:
+            utc = utc.astimezone(timezone.utc)
+        self.utc = utc
+        self._iso: Optional[str] = None
+        self._local: Dict[str, datetime] = {}
+
+    def iso(self) -> str:
+        if self._iso is None:
+            self._iso = self.utc.isoformat()
+        return self._iso
+
+    def timestamp(self) -> float:
+        return self.utc.timestamp()
+
+    def minute(self) -> int:
+        return int(self.utc.timestamp() // 60)
+
+    def local(self, tz_name: str) -> datetime:
+        dt = self._local.get(tz_name)
+        if dt is None:
+            dt = self.utc.astimezone(zone(tz_name))
+            self._local[tz_name] = dt
+        return dt
+
+    def system_local(self) -> datetime:
+        # naive local time of the host (legacy datetime.now() fallback)
+        return self.utc.astimezone().replace(tzinfo=None)
+
+
+_ACTIVE: ContextVar[Optional[TurnClock]] = ContextVar("mirabase_turn_clock", default=None)
+
+
+def active_clock() -> Optional[TurnClock]:
+    return _ACTIVE.get()
+
+
+def current_clock() -> TurnClock:
+    clock = _ACTIVE.get()
+    return clock if clock is not None else TurnClock()
+
+
+@contextmanager
+def use_clock(clock: Optional[TurnClock] = None) -> Iterator[TurnClock]:
+    """
+    Activates `clock` (or keeps the already active one, or starts a new one).
+    Nested turns (run -> run_pipeline, batch -> turn) share the outer instant.
+    """
+    if clock is None:
+        clock = _ACTIVE.get() or TurnClock()
+    token = _ACTIVE.set(clock)
+    try:
+        yield clock
+    finally:
+        _ACTIVE.reset(token)
+
+
+def clock_from_context(context: Optional[Dict[str, object]]) -> Optional[TurnClock]:
+    """
+    context["clock"] may carry a TurnClock or a datetime (frozen instant).
+    """
+    if not isinstance(context, dict):
+        return None
+    value = context.get("clock")
+    if isinstance(value, TurnClock):
+        return value
+    if isinstance(value, datetime):
+        return TurnClock(value)
+    return None
@@ -0,0 +1,71 @@
+# turn_context.py
+# =========================
+# MIRA BASE – TURN CONTEXT (LAZY)
+# =========================
+#
+# Responsibilities:
+# - per-turn context dict for the pipeline
+# - expensive fields load on first access, memoized for the turn
+# - unused fields cost zero I/O
+#
+# Lazy fields:
+# - personal    -> ltm.load_ltm(user_id)
+# - profile     -> ltm.load_profile(user_id)
+# - recent_stm  -> stm.get_last(user_id, 5)
+# - stm_signals -> stm.get_signals(user_id) (rolling window aggregates)
+# - chrono      -> chrono_context.build_chrono_context({}, tz_name=timezone)
+#
+# Notes:
+# - still a dict (engines keep their isinstance(ctx, dict) checks)
+# - ctx[key] / ctx.get(key) trigger the load; `key in ctx`, iteration and
+#   copies only see fields that were already loaded or set
+#
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional
+
+from chrono_context import DEFAULT_TZ, build_chrono_context
+from ltm import load_ltm, load_profile
+from stm import get_last, get_signals
+
+Loader = Callable[["TurnContext"], Any]
+
+RECENT_STM_N = 5
+
+_DEFAULT_LOADERS: Dict[str, Loader] = {
+    "personal": lambda ctx: load_ltm(ctx["user_id"]),
+    "profile": lambda ctx: load_profile(ctx["user_id"]),
+    "recent_stm": lambda ctx: get_last(ctx["user_id"], RECENT_STM_N),
+    "stm_signals": lambda ctx: get_signals(ctx["user_id"]),
+    "chrono": lambda ctx: build_chrono_context({}, tz_name=ctx.get("timezone") or DEFAULT_TZ),
+}
+
+
+class TurnContext(dict):
+    __slots__ = ("_loaders",)
+
+    def __init__(self, *args: Any, loaders: Optional[Dict[str, Loader]] = None, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._loaders = _DEFAULT_LOADERS if not loaders else {**_DEFAULT_LOADERS, **loaders}
+
+    def __missing__(self, key: str) -> Any:
+        loader = self._loaders.get(key)
+        if loader is None:
+            raise KeyError(key)
+        value = loader(self)
+        self[key] = value
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        if key in self._loaders:
+            return self[key]
+        return default
+
+    def load(self, key: str) -> Any:
+        return self[key]
+
+    def is_loaded(self, key: str) -> bool:
+        return dict.__contains__(self, key)